@@ -6,8 +6,12 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
 
-from .const import DOMAIN, PLATFORMS
+from .const import CONF_DEVICE_ID, DOMAIN, PLATFORMS
 from .coordinator import TuyaScaleDataUpdateCoordinator
+from .dp_history import async_remove_history
+from .energy import async_remove_energy
+from .services import async_setup_services
+from .snapshot import async_remove_snapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,6 +41,49 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     def _elapsed() -> float:
         return asyncio.get_event_loop().time() - setup_started
 
+    # Local entry'ler: cihazın UDP duyurularını dinle (bkz. discovery.py)
+    # — IP'si değiştiyse ilk refresh'ten önce yeni adrese geçilir.
+    await coordinator.async_start_discovery()
+
+    # Warm start (bkz. snapshot.py): son bilinen durum kayıtlıysa
+    # entity'ler hemen ondan (stale) oluşturulur; canlı adımlar (device
+    # info, ilk refresh, MQTT) platformlar kurulduktan sonra arka planda.
+    warm = await coordinator.async_restore_snapshot()
+    if not warm:
+        await _async_cold_start(coordinator, _elapsed)
+
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
+
+    # DP değişim geçmişi (bkz. dp_history.py) — recorder'dan bağımsız,
+    # cihaz başına sabit boyutlu bir dosya.
+    await coordinator.async_start_history()
+    coordinator.async_start_snapshot()
+    async_setup_services(hass)
+
+    if not warm:
+        # MQTT (tuya_sharing) — tamamen opsiyonel, bkz. sharing_mqtt.py.
+        # Kullanıcı kurulumda User Code + QR onayı yapmadıysa (mevcut tüm
+        # kurulumlar dahil) coordinator._async_start_mqtt() hiçbir şey
+        # yapmadan hemen döner — davranış hiç değişmez. Model_mapping'in
+        # kesin dolu olduğu (get_device_model + first_refresh tamamlandığı)
+        # bu noktadan SONRA, arka planda (bloklamadan) başlatılıyor.
+        hass.loop.create_task(coordinator._async_start_mqtt())
+
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    if warm:
+        # Canlı kurulum + MQTT; unload'da HA bu task'ı iptal ediyor.
+        entry.async_create_background_task(
+            hass, coordinator.async_warm_start(), f"{DOMAIN}_warm_start_{entry.entry_id}"
+        )
+
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+
+    return True
+
+
+async def _async_cold_start(coordinator: TuyaScaleDataUpdateCoordinator, _elapsed) -> None:
+    """Snapshot yoksa: device info, model ve ilk refresh kurulumda beklenir."""
     try:
         async with asyncio.timeout(SETUP_TIMEOUT):
             # Önce device info'yu al
@@ -50,26 +97,24 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             await coordinator.async_config_entry_first_refresh()
             _LOGGER.debug("İlk refresh tamamlandı (%.1fsn)", _elapsed())
     except asyncio.TimeoutError as err:
+        await _async_abort_setup(coordinator)
         raise ConfigEntryNotReady(
             f"Tuya Heat Pump setup timed out after {SETUP_TIMEOUT}s "
             f"(device_id={coordinator.device_id}, elapsed={_elapsed():.1f}s) — will retry"
         ) from err
+    except Exception:
+        await _async_abort_setup(coordinator)
+        raise
 
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
-
-    # MQTT (tuya_sharing) — tamamen opsiyonel, bkz. sharing_mqtt.py.
-    # Kullanıcı kurulumda User Code + QR onayı yapmadıysa (mevcut tüm
-    # kurulumlar dahil) coordinator._async_start_mqtt() hiçbir şey
-    # yapmadan hemen döner — davranış hiç değişmez. Model_mapping'in
-    # kesin dolu olduğu (get_device_model + first_refresh tamamlandığı)
-    # bu noktadan SONRA, arka planda (bloklamadan) başlatılıyor.
-    hass.loop.create_task(coordinator._async_start_mqtt())
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
-
-    entry.async_on_unload(entry.add_update_listener(async_update_options))
-
-    return True
+async def _async_abort_setup(coordinator: TuyaScaleDataUpdateCoordinator) -> None:
+    """Kurulum başarısız: unload çağrılmayacak, paylaşılan LAN
+    kaynaklarından (discovery, connection manager) çık ve coordinator'ın
+    thread pool'u ile zamanlayıcılarını kapat — yoksa her
+    ConfigEntryNotReady denemesi bunları sızdırıyor."""
+    await coordinator.async_stop_local_transport()
+    coordinator.executor.shutdown()
+    coordinator.scheduler.shutdown()
 
 async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Update options.
@@ -98,6 +143,26 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         coordinator: TuyaScaleDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
         if coordinator.sharing_mqtt is not None:
             await coordinator.sharing_mqtt.async_stop()
+        await coordinator.async_stop_history()
+        await coordinator.async_stop_snapshot()
+        await coordinator.async_stop_local_transport()
+        coordinator.executor.shutdown()
+        coordinator.scheduler.shutdown()
         hass.data[DOMAIN].pop(entry.entry_id)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the entry's persisted state (snapshot, energy, DP history)."""
+    await async_remove_snapshot(hass, entry.entry_id)
+    await async_remove_energy(hass, entry.entry_id)
+    device_id = entry.data.get(CONF_DEVICE_ID)
+    # Geçmiş cihaz başına tutuluyor; aynı cihaz için başka bir entry
+    # varsa dosyalar onundur.
+    if device_id and not any(
+        other.data.get(CONF_DEVICE_ID) == device_id
+        for other in hass.config_entries.async_entries(DOMAIN)
+        if other.entry_id != entry.entry_id
+    ):
+        await async_remove_history(hass, device_id)
@@ -8,8 +8,9 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.config_entries import ConfigEntry
 
+from .bitmap import bitmap_binary_sensor_configs, bitmap_bit_is_set
 from .const import DOMAIN
-from .conversion import Conversion
+from .conversion import conversion_for
 from .coordinator import TuyaScaleDataUpdateCoordinator
 
 _LOGGER = logging.getLogger(__name__)
@@ -29,7 +30,14 @@ async def async_setup_entry(
     _LOGGER.info("Adding online status binary sensor")
     
     # Model mapping'den binary sensörleri al
-    binary_sensor_configs = coordinator.model_mapping.get("binary_sensors", {})
+    binary_sensor_configs = dict(coordinator.model_mapping.get("binary_sensors", {}))
+
+    # `bitmap_binary_sensors: True` olan bitmap sensörleri için bit başına
+    # bir problem binary sensörü — hepsi sensörün decoder'ını paylaşıyor.
+    for sensor_code, sensor_config in coordinator.model_mapping.get("sensors", {}).items():
+        if sensor_config.get("bitmap_binary_sensors"):
+            for bit_code, bit_config in bitmap_binary_sensor_configs(sensor_code, sensor_config).items():
+                binary_sensor_configs.setdefault(bit_code, bit_config)
     
     for sensor_code, sensor_config in binary_sensor_configs.items():
         lookup_code = sensor_config.get("code", sensor_code)
@@ -113,6 +121,7 @@ class TuyaHeatpumpBinarySensor(BinarySensorEntity):
         self._attr_name = config.get('name', sensor_code)
         self._attr_device_class = config.get('device_class')
         self._attr_has_entity_name = True
+        self._attr_entity_registry_enabled_default = config.get('entity_registry_enabled_default', True)
         
         # Device info
         self._attr_device_info = coordinator.device_info
@@ -141,7 +150,14 @@ class TuyaHeatpumpBinarySensor(BinarySensorEntity):
             
         raw_value = self.coordinator.data[lookup_code]['value']
 
-        conversion = Conversion(self._config.get('conversion', 'bool(value)'))
+        if "bitmap_bit" in self._config:
+            try:
+                return bitmap_bit_is_set(self._config, raw_value)
+            except (TypeError, ValueError) as err:
+                _LOGGER.warning("Bitmap decode failed for %s: %s", self._sensor_code, err)
+                return None
+
+        conversion = conversion_for(self._config, 'bool(value)')
         try:
             result = conversion.convert(raw_value)
             return bool(result)
@@ -166,9 +182,13 @@ class TuyaHeatpumpBinarySensor(BinarySensorEntity):
         lookup_code = self._lookup_code()
         attrs["tuya_code"] = lookup_code
         attrs["tuya_dp_id"] = self._config.get("dp_id")
+        if "bitmap_bit" in self._config:
+            attrs["bitmap_bit"] = self._config["bitmap_bit"]
 
         if self.coordinator.model_id:
             attrs["tuya_model_id"] = self.coordinator.model_id
+        if self.coordinator.is_stale(attrs.get("tuya_code")):
+            attrs["stale"] = True
 
         return attrs
 
@@ -0,0 +1,138 @@
+"""Fault/status bitmap decoding for Tuya `bitmap`-type DPs.
+
+Model files declare the bit → label table as plain data:
+
+    "fault": {
+        "dp_id": 15,
+        "code": "fault",
+        "name": "Fault Description",
+        "bitmap": {0: "E00", 1: "E01", 2: "E02", ...},
+        # optional:
+        "bitmap_ok": "OK",                 # text when no bit is set
+        "bitmap_binary_sensors": True,     # one problem binary sensor per bit
+    },
+
+and a binary sensor can test a single bit of the same DP with
+`"bitmap_bit": 3` instead of a `bool(value & 8)` conversion string.
+
+model_loader compiles each table once per model into a BitmapDecoder
+(stored on the entry as `_bitmap_decoder`), which precomputes one
+256-entry label table per byte of the bitmap and caches results per
+input integer — decoding a fault register is then a few tuple lookups,
+not a generator over a 30-item list parsed by eval() on every read.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_OK_LABEL = "OK"
+_SEPARATOR = ", "
+# Fault registers only ever take a handful of distinct values; the cap
+# just keeps a misbehaving DP from growing the cache without bound.
+_CACHE_LIMIT = 256
+
+
+class BitmapDecoder:
+    """Precomputed bit → label table for one bitmap DP of one model."""
+
+    def __init__(self, labels: dict[int, str], ok_label: str | None = DEFAULT_OK_LABEL) -> None:
+        self.labels = {int(bit): label for bit, label in labels.items()}
+        self.ok_label = ok_label
+        n_bytes = (max(self.labels) // 8 + 1) if self.labels else 0
+        # _byte_tables[k][b] = (bits, labels) active when byte k equals b
+        self._byte_tables: list[tuple[tuple[tuple[int, ...], tuple[str, ...]], ...]] = []
+        for k in range(n_bytes):
+            table = []
+            for byte in range(256):
+                bits = tuple(
+                    k * 8 + i for i in range(8)
+                    if byte & (1 << i) and (k * 8 + i) in self.labels
+                )
+                table.append((bits, tuple(self.labels[b] for b in bits)))
+            self._byte_tables.append(tuple(table))
+        self._cache: dict[int, tuple[frozenset[int], str | None]] = {}
+
+    def _decode(self, value: int) -> tuple[frozenset[int], str | None]:
+        cached = self._cache.get(value)
+        if cached is not None:
+            return cached
+        bits: list[int] = []
+        names: list[str] = []
+        for k, table in enumerate(self._byte_tables):
+            byte_bits, byte_names = table[(value >> (8 * k)) & 0xFF]
+            bits.extend(byte_bits)
+            names.extend(byte_names)
+        result = (frozenset(bits), _SEPARATOR.join(names) or self.ok_label)
+        if len(self._cache) >= _CACHE_LIMIT:
+            self._cache.clear()
+        self._cache[value] = result
+        return result
+
+    def describe(self, value: Any) -> str | None:
+        """Labels of all set bits joined with ', ', or the OK label."""
+        return self._decode(int(value))[1]
+
+    def active_bits(self, value: Any) -> frozenset[int]:
+        """Set bits that have a label in the table."""
+        return self._decode(int(value))[0]
+
+
+def compile_bitmaps(mapping: dict) -> None:
+    """Attach a BitmapDecoder to every entry that declares `bitmap`.
+
+    Binary sensors using `bitmap_bit` on the same code share the
+    sensor's decoder (and therefore its per-value cache).
+    """
+    decoders: dict[str, BitmapDecoder] = {}
+    for entity_type in ("sensors", "binary_sensors"):
+        for key, cfg in mapping.get(entity_type, {}).items():
+            if "bitmap" not in cfg:
+                continue
+            decoder = cfg.get("_bitmap_decoder")
+            if decoder is None:
+                try:
+                    decoder = BitmapDecoder(cfg["bitmap"], cfg.get("bitmap_ok", DEFAULT_OK_LABEL))
+                except (AttributeError, TypeError, ValueError) as err:
+                    _LOGGER.error("Invalid bitmap table for %s: %s", key, err)
+                    continue
+                cfg["_bitmap_decoder"] = decoder
+            decoders.setdefault(cfg.get("code", key), decoder)
+    for cfg in mapping.get("binary_sensors", {}).values():
+        if "bitmap_bit" in cfg and "_bitmap_decoder" not in cfg:
+            decoder = decoders.get(cfg.get("code"))
+            if decoder is not None:
+                cfg["_bitmap_decoder"] = decoder
+
+
+def bitmap_bit_is_set(config: dict, value: Any) -> bool:
+    """Binary-sensor side of `bitmap_bit`."""
+    bit = config["bitmap_bit"]
+    decoder: BitmapDecoder | None = config.get("_bitmap_decoder")
+    if decoder is not None and bit in decoder.labels:
+        return bit in decoder.active_bits(value)
+    return bool((int(value) >> bit) & 1)
+
+
+def bitmap_binary_sensor_configs(sensor_code: str, config: dict) -> dict[str, dict]:
+    """Per-bit binary sensor configs for a sensor with
+    `bitmap_binary_sensors: True`, all sharing the sensor's decoder."""
+    decoder: BitmapDecoder | None = config.get("_bitmap_decoder")
+    if decoder is None:
+        return {}
+    lookup_code = config.get("code", sensor_code)
+    name = config.get("name", sensor_code)
+    return {
+        f"{sensor_code}_bit{bit}": {
+            "dp_id": config.get("dp_id"),
+            "code": lookup_code,
+            "name": f"{name}: {label}",
+            "device_class": "problem",
+            "bitmap_bit": bit,
+            "_bitmap_decoder": decoder,
+            "entity_registry_enabled_default": False,
+        }
+        for bit, label in sorted(decoder.labels.items())
+    }
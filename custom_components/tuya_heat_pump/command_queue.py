@@ -0,0 +1,240 @@
+"""Local command pipeline: batched, paced, acknowledged writes.
+
+Every local send_command() used to get its own debounce task and its
+own set_value() frame under the socket lock. A scene or automation that
+sets mode, target temperature and a switch therefore cost three frames
+and three echoes. Success was only "set_value returned something"; a
+fixed 8 s sent-value override in the coordinator hid stale echoes.
+
+Writes now land in one per-device queue, keyed by DP, so a newer value
+for the same DP replaces the older one. Each write has a debounce
+delay: `window` by default (numbers, sliders), 0 for switches and
+selects. A DP becomes due that many seconds after its last write, and
+the queue is flushed as soon as any pending DP is due. Whatever is
+pending at that point goes out as a single control frame:
+set_multiple_values, or set_value for one DP. Deadlines live on the
+coordinator's Scheduler (scheduler.py), not on per-command tasks.
+
+Pacing: only one frame is in flight at a time, and consecutive frames
+are at least MIN_FRAME_GAP apart. Small Tuya MCUs drop or reorder
+commands that arrive back to back.
+
+Acknowledgement: every sent write is tracked until the device reports
+the written value back — in the reply to the frame itself, by push or
+by poll (confirm()). If that doesn't
+happen within ACK_TIMEOUT, the write is re-sent, up to MAX_ATTEMPTS
+sends in total. A failed send counts as an attempt too. After that the
+queue gives up and calls on_give_up(code), and the coordinator stops
+overriding the device's value. So the coordinator's sent-value override
+lasts exactly as long as a write is unconfirmed, rather than a fixed
+time.
+
+Write-to-echo latencies are kept in a small histogram (stats), which
+shows what a given unit can absorb.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from homeassistant.core import HomeAssistant, callback
+
+from .scheduler import Scheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+MIN_FRAME_GAP = 0.3
+ACK_TIMEOUT = 5.0
+MAX_ATTEMPTS = 3
+# Upper bounds (s) of the write-to-echo latency histogram buckets; the
+# last bucket counts everything slower.
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0)
+
+
+@dataclass
+class _Write:
+    code: str
+    dp_id: int
+    value: Any
+    due: float = 0.0
+    attempts: int = 0
+    sent_at: float = 0.0
+
+
+class LocalCommandQueue:
+    """Per-device write pipeline flushed as single multi-DP frames."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        scheduler: Scheduler,
+        name: str,
+        send: Callable[[dict[int, Any]], Awaitable[Any]],
+        window: float,
+        on_give_up: Callable[[str], None] | None = None,
+        matches: Callable[[str, Any, Any], bool] | None = None,
+    ) -> None:
+        self._hass = hass
+        self._scheduler = scheduler
+        self._flush_key = "commands.flush"
+        self._ack_key = "commands.ack"
+        self._name = name
+        self._send = send
+        self._on_give_up = on_give_up
+        # (code, sent, reported) → does the report confirm the write?
+        # Default: equality. Raw field writes only compare their bytes.
+        self._matches = matches or (lambda _code, sent, reported: sent == reported)
+        self.window = window
+        # dp_id → write not yet sent
+        self._pending: dict[int, _Write] = {}
+        self._send_lock = asyncio.Lock()
+        self._last_frame = 0.0
+        # code → write sent but not echoed yet
+        self.awaiting: dict[str, _Write] = {}
+        self.frames = 0
+        self.writes = 0
+        self.confirmed = 0
+        self.retries = 0
+        self.given_up = 0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @callback
+    def submit(self, code: str, dp_id: int, value: Any, delay: float | None = None) -> None:
+        """Queue a write, due `delay` s from now (default: the window)."""
+        now = time.monotonic()
+        self._pending[dp_id] = _Write(
+            code, dp_id, value, due=now + (self.window if delay is None else delay)
+        )
+        self.writes += 1
+        due = min(write.due for write in self._pending.values())
+        self._scheduler.schedule(self._flush_key, due - now, self._schedule_flush)
+
+    @callback
+    def _schedule_flush(self) -> None:
+        self._hass.async_create_task(self.async_flush())
+
+    async def async_flush(self) -> None:
+        """Send everything pending as one frame (paced)."""
+        self._scheduler.cancel(self._flush_key)
+        async with self._send_lock:
+            gap = self._last_frame + MIN_FRAME_GAP - time.monotonic()
+            if gap > 0:
+                await asyncio.sleep(gap)
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            dps = {dp_id: write.value for dp_id, write in pending.items()}
+            codes = ", ".join(f"{w.code}={w.value}" for w in pending.values())
+            # Tracked before sending: the reply to the frame usually
+            # echoes the written DPs and confirms them from inside _send.
+            now = time.monotonic()
+            for write in pending.values():
+                write.attempts += 1
+                write.sent_at = now
+                self.awaiting[write.code] = write
+            try:
+                result = await self._send(dps)
+            except Exception as err:
+                _LOGGER.error("[%s] Local write failed (%s): %s", self._name, codes, err)
+                result = None
+            self._last_frame = time.monotonic()
+            self.frames += 1
+            if result:
+                _LOGGER.info("✅ Local write sent (%d DP in one frame): %s", len(dps), codes)
+            else:
+                _LOGGER.warning("❌ Local write got no response: %s — waiting for echo", codes)
+            self._scheduler.schedule_earliest(self._ack_key, ACK_TIMEOUT, self._check_acks)
+
+    @callback
+    def _check_acks(self) -> None:
+        """Retry or give up writes the device hasn't echoed in time."""
+        now = time.monotonic()
+        resend = False
+        for code, write in list(self.awaiting.items()):
+            if now - write.sent_at < ACK_TIMEOUT:
+                continue
+            del self.awaiting[code]
+            if write.dp_id in self._pending:
+                continue  # a newer value for this DP is on its way anyway
+            if write.attempts < MAX_ATTEMPTS:
+                _LOGGER.info(
+                    "[%s] %s=%s not echoed after %.0fs — resending (attempt %d/%d)",
+                    self._name, code, write.value, ACK_TIMEOUT, write.attempts + 1, MAX_ATTEMPTS,
+                )
+                self._pending[write.dp_id] = write
+                self.retries += 1
+                resend = True
+            else:
+                _LOGGER.warning(
+                    "[%s] %s=%s never confirmed by the device after %d attempts",
+                    self._name, code, write.value, write.attempts,
+                )
+                self.given_up += 1
+                if self._on_give_up is not None:
+                    self._on_give_up(code)
+        if resend:
+            self._scheduler.schedule(self._flush_key, 0, self._schedule_flush)
+        if self.awaiting:
+            oldest = min(write.sent_at for write in self.awaiting.values())
+            self._scheduler.schedule(
+                self._ack_key, oldest + ACK_TIMEOUT - now, self._check_acks
+            )
+
+    def latest_value(self, code: str) -> tuple[bool, Any]:
+        """(True, value) of the newest write for `code` that is queued or
+        waiting for its echo; (False, None) if there is none."""
+        for write in self._pending.values():
+            if write.code == code:
+                return True, write.value
+        write = self.awaiting.get(code)
+        if write is not None:
+            return True, write.value
+        return False, None
+
+    @callback
+    def confirm(self, records: dict[str, dict]) -> list[str]:
+        """Match device records against sent writes.
+
+        Returns the codes whose latest write is now settled — confirmed
+        and with no newer write queued for the same DP.
+        """
+        settled = []
+        now = time.monotonic()
+        for code in records.keys() & self.awaiting.keys():
+            write = self.awaiting[code]
+            if not self._matches(code, write.value, records[code].get("value")):
+                continue  # stale echo — keep waiting
+            del self.awaiting[code]
+            self.confirmed += 1
+            latency = now - write.sent_at
+            self.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            _LOGGER.debug(
+                "[%s] %s=%s confirmed by the device after %.2fs",
+                self._name, code, write.value, latency,
+            )
+            if write.dp_id not in self._pending:
+                settled.append(code)
+        return settled
+
+    def cancel(self) -> None:
+        self._scheduler.cancel(self._flush_key)
+        self._scheduler.cancel(self._ack_key)
+        self._pending.clear()
+        self.awaiting.clear()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        labels = [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return {
+            "writes": self.writes,
+            "frames": self.frames,
+            "confirmed": self.confirmed,
+            "retries": self.retries,
+            "given_up": self.given_up,
+            "awaiting_echo": len(self.awaiting),
+            "echo_latency": dict(zip(labels, self.latency_histogram)),
+        }
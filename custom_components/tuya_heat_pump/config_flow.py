@@ -21,6 +21,11 @@ from .const import (
     CONF_IP,
     CONF_LOCAL_KEY,
     CONF_PROTOCOL,
+    CONF_PUSH_COALESCE_MS,
+    CONF_LAN_WORKER,
+    CONF_COMMAND_FLUSH_MS,
+    DEFAULT_COMMAND_FLUSH_MS,
+    DEFAULT_PUSH_COALESCE_MS,
     DEFAULT_SCAN_INTERVAL,
     REGIONS,
     DEFAULT_REGION,
@@ -29,8 +34,8 @@ from .const import (
     CONF_SHARING_TOKEN_INFO,
 )
 from .coordinator import TuyaScaleDataUpdateCoordinator
+from .protocol_probe import async_probe_protocol
 from .sharing_mqtt import SharingQRLogin
-import tinytuya
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -135,22 +140,33 @@ async def validate_input(hass: HomeAssistant, data: dict, connection_type: str)
         return {"title": f"Tuya Heat Pump ({data[CONF_DEVICE_ID]})"}
 
     else:
-        # Local validation
+        # Local validation: seçilen protokol öncelikli, ama tüm sürümler
+        # aynı anda deneniyor (bkz. protocol_probe.py) — yanlış seçim
+        # kullanıcıya timeout + elle yeniden deneme olarak dönmüyor.
         try:
-            device = tinytuya.Device(
-                dev_id=data[CONF_DEVICE_ID],
-                address=data[CONF_IP],
-                local_key=data[CONF_LOCAL_KEY],
-                version=float(data[CONF_PROTOCOL]),
+            found = await async_probe_protocol(
+                hass.async_add_executor_job,
+                data[CONF_DEVICE_ID],
+                data[CONF_IP],
+                data[CONF_LOCAL_KEY],
+                preferred=data.get(CONF_PROTOCOL),
             )
-            status = await hass.async_add_executor_job(device.status)
-            if not status or 'dps' not in status:
-                raise CannotConnect("Failed to get device status")
         except Exception as err:
             _LOGGER.error("Local validation error: %s", err)
             raise CannotConnect(f"Cannot connect to local device: {err}") from err
+        if found is None:
+            raise CannotConnect("No protocol version returned device status")
+        protocol, _ = found
+        if protocol != data.get(CONF_PROTOCOL):
+            _LOGGER.info(
+                "Device %s answers with protocol %s (selected %s) — using %s",
+                data[CONF_DEVICE_ID], protocol, data.get(CONF_PROTOCOL), protocol,
+            )
 
-        return {"title": f"Tuya Heat Pump Local ({data[CONF_DEVICE_ID]})"}
+        return {
+            "title": f"Tuya Heat Pump Local ({data[CONF_DEVICE_ID]})",
+            "protocol": protocol,
+        }
 
 
 class TuyaHeatpumpOptionsFlow(config_entries.OptionsFlow):
@@ -199,16 +215,17 @@ class TuyaHeatpumpOptionsFlow(config_entries.OptionsFlow):
         errors = {}
         
         if user_input is not None:
-            # Yerel cihaz bağlantısını doğrula
+            # Yerel cihaz bağlantısını doğrula (protokol sürümü otomatik
+            # bulunuyor, seçilen öncelikli — bkz. protocol_probe.py)
             try:
-                device = tinytuya.Device(
-                    dev_id=self._config_entry.data[CONF_DEVICE_ID],
-                    address=user_input[CONF_IP],
-                    local_key=user_input[CONF_LOCAL_KEY],
-                    version=float(user_input[CONF_PROTOCOL]),
+                found = await async_probe_protocol(
+                    self.hass.async_add_executor_job,
+                    self._config_entry.data[CONF_DEVICE_ID],
+                    user_input[CONF_IP],
+                    user_input[CONF_LOCAL_KEY],
+                    preferred=user_input[CONF_PROTOCOL],
                 )
-                status = await self.hass.async_add_executor_job(device.status)
-                if not status or 'dps' not in status:
+                if found is None:
                     errors["base"] = "cannot_connect"
                 else:
                     # Güncellemeleri kaydet
@@ -216,7 +233,7 @@ class TuyaHeatpumpOptionsFlow(config_entries.OptionsFlow):
                     updated_data.update({
                         CONF_IP: user_input[CONF_IP],
                         CONF_LOCAL_KEY: user_input[CONF_LOCAL_KEY],
-                        CONF_PROTOCOL: user_input[CONF_PROTOCOL],
+                        CONF_PROTOCOL: found[0],
                     })
                     
                     # ConfigEntry'i güncelle
@@ -225,8 +242,16 @@ class TuyaHeatpumpOptionsFlow(config_entries.OptionsFlow):
                         data=updated_data
                     )
                     
-                    # Options'a sadece gereksiz alanları ekle (boş olabilir)
-                    return self.async_create_entry(title="", data={})
+                    # Bağlantı dışı ayarlar options'ta
+                    return self.async_create_entry(title="", data={
+                        CONF_PUSH_COALESCE_MS: int(user_input.get(
+                            CONF_PUSH_COALESCE_MS, DEFAULT_PUSH_COALESCE_MS
+                        )),
+                        CONF_LAN_WORKER: user_input.get(CONF_LAN_WORKER, False),
+                        CONF_COMMAND_FLUSH_MS: int(user_input.get(
+                            CONF_COMMAND_FLUSH_MS, DEFAULT_COMMAND_FLUSH_MS
+                        )),
+                    })
             except Exception:
                 _LOGGER.exception("Local validation error in options")
                 errors["base"] = "cannot_connect"
@@ -251,6 +276,38 @@ class TuyaHeatpumpOptionsFlow(config_entries.OptionsFlow):
                             mode=selector.SelectSelectorMode.DROPDOWN
                         )
                     ),
+                    vol.Optional(
+                        CONF_PUSH_COALESCE_MS,
+                        default=self._config_entry.options.get(
+                            CONF_PUSH_COALESCE_MS, DEFAULT_PUSH_COALESCE_MS
+                        )
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=0,
+                            max=1000,
+                            step=10,
+                            unit_of_measurement="ms",
+                            mode=selector.NumberSelectorMode.BOX
+                        )
+                    ),
+                    vol.Optional(
+                        CONF_LAN_WORKER,
+                        default=self._config_entry.options.get(CONF_LAN_WORKER, False)
+                    ): selector.BooleanSelector(),
+                    vol.Optional(
+                        CONF_COMMAND_FLUSH_MS,
+                        default=self._config_entry.options.get(
+                            CONF_COMMAND_FLUSH_MS, DEFAULT_COMMAND_FLUSH_MS
+                        )
+                    ): selector.NumberSelector(
+                        selector.NumberSelectorConfig(
+                            min=0,
+                            max=5000,
+                            step=50,
+                            unit_of_measurement="ms",
+                            mode=selector.NumberSelectorMode.BOX
+                        )
+                    ),
                 }
             ),
             errors=errors,
@@ -389,6 +446,7 @@ class TuyaHeatpumpConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             full_data = {**self.user_data, **user_input}
             try:
                 info = await validate_input(self.hass, full_data, "local")
+                full_data[CONF_PROTOCOL] = info["protocol"]
                 await self.async_set_unique_id(full_data[CONF_DEVICE_ID])
                 
                 # Check if device is already configured
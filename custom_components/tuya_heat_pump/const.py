@@ -30,6 +30,17 @@ CONF_IP = "ip"
 CONF_LOCAL_KEY = "local_key"
 CONF_PROTOCOL = "protocol"
 PROTOCOL_OPTIONS = ["3.1", "3.3", "3.4", "3.5"]
+# Local push frames arriving within this window (ms) are merged into one
+# coordinator update. 0 = every frame is its own update (old behaviour).
+CONF_PUSH_COALESCE_MS = "push_coalesce_ms"
+DEFAULT_PUSH_COALESCE_MS = 50
+# Host the device's tinytuya connection in a separate worker process
+# (lan_worker.py) instead of HA's own process.
+CONF_LAN_WORKER = "lan_worker"
+# Local writes arriving within this window (ms) of each other are sent
+# together as one multi-DP frame (see command_queue.py).
+CONF_COMMAND_FLUSH_MS = "command_flush_ms"
+DEFAULT_COMMAND_FLUSH_MS = 1000
 
 # --- MQTT (tuya_sharing / Smart Life push) — tamamen opsiyonel ---
 # Bunların hiçbiri mevcut kullanıcıları etkilemez: CONF_USER_CODE
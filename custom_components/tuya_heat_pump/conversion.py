@@ -1,16 +1,222 @@
+"""Value conversions declared in model files.
+
+Most `conversion` strings are plain arithmetic on `value` (`value / 10`,
+`value - 40`, `(value - 32) * 5/9`, optionally behind a sentinel check
+like `None if value == -32700 else value / 10`). Those are recognized
+once, when the string is first seen, and executed as a short chain of
+arithmetic operations — no eval() per read. The chain keeps the exact
+operation order of the expression, so results are bit-for-bit what
+eval() would have produced. Anything else is compiled once and the code
+object is reused.
+
+Model entries may also skip the string and declare a linear conversion
+directly:
+
+    "scale": 0.1, "offset": -40, "precision": 1    # round(value * 0.1 - 40, 1)
+
+For linear conversions the inverse is derived automatically, so number
+entities don't need a hand-written `api_conversion` (see
+api_conversion_for).
+"""
+from __future__ import annotations
+
+import ast
+import operator
+from typing import Any, Callable
+
+_BUILTINS = {
+    "bool": bool,
+    "float": float,
+    "int": int,
+}
+
+_BINOPS: dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+# op → inverse op, for the automatically derived write conversion.
+_INVERSE = {
+    operator.add: operator.sub,
+    operator.sub: operator.add,
+    operator.mul: operator.truediv,
+    operator.truediv: operator.mul,
+}
+
+
+def _rsub(value, const):
+    return const - value
+
+
+def _rdiv(value, const):
+    return const / value
+
+
+def _number(node: ast.AST) -> float | int | None:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if (
+        isinstance(node, ast.UnaryOp)
+        and isinstance(node.op, ast.USub)
+        and isinstance(node.operand, ast.Constant)
+        and type(node.operand.value) in (int, float)
+    ):
+        return -node.operand.value
+    return None
+
+
+def _chain(node: ast.AST) -> list[tuple[Callable, Any]] | None:
+    """`value` combined with numeric constants by + - * /, each operation
+    involving `value` exactly once → list of (op, const) in evaluation
+    order. None for anything else."""
+    if isinstance(node, ast.Name) and node.id == "value":
+        return []
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        op = _BINOPS[type(node.op)]
+        right = _number(node.right)
+        if right is not None:
+            left = _chain(node.left)
+            return None if left is None else left + [(op, right)]
+        left_const = _number(node.left)
+        if left_const is not None:
+            inner = _chain(node.right)
+            if inner is None:
+                return None
+            if op in (operator.add, operator.mul):
+                return inner + [(op, left_const)]
+            return inner + [(_rsub if op is operator.sub else _rdiv, left_const)]
+        # `(value - 32) * 5/9` parses as ((value - 32) * 5) / 9, handled
+        # above; a constant sub-expression on the right (value * (5/9))
+        # would change rounding if folded, so it stays on the slow path.
+    return None
+
+
 class Conversion:
+    """A model-file conversion expression over `value`."""
+
+    _compiled: dict[str, tuple] = {}
+
     def __init__(self, conversion: str) -> None:
         self.conversion = conversion
+        compiled = self._compiled.get(conversion)
+        if compiled is None:
+            compiled = self._compile(conversion)
+            self._compiled[conversion] = compiled
+        # (chain or None, sentinel tuple or None, code object or None)
+        self._ops, self._sentinel, self._code = compiled
+
+    @staticmethod
+    def _compile(conversion: str) -> tuple:
+        try:
+            tree = ast.parse(conversion.strip(), mode="eval").body
+        except SyntaxError:
+            tree = None
+        sentinel = None
+        if (
+            isinstance(tree, ast.IfExp)
+            and isinstance(tree.test, ast.Compare)
+            and isinstance(tree.test.left, ast.Name)
+            and tree.test.left.id == "value"
+            and len(tree.test.ops) == 1
+            and isinstance(tree.test.ops[0], ast.Eq)
+            and _number(tree.test.comparators[0]) is not None
+            and isinstance(tree.body, ast.Constant)
+        ):
+            sentinel = (_number(tree.test.comparators[0]), tree.body.value)
+            tree = tree.orelse
+        ops = _chain(tree) if tree is not None else None
+        if ops is not None:
+            return tuple(ops), sentinel, None
+        return None, None, compile(conversion, "<conversion>", "eval")
+
+    @property
+    def is_linear(self) -> bool:
+        return self._ops is not None
+
+    def convert(self, value):
+        ops = self._ops
+        if ops is None:
+            return eval(self._code, {"value": value, "__builtins__": _BUILTINS})
+        sentinel = self._sentinel
+        if sentinel is not None and value == sentinel[0]:
+            return sentinel[1]
+        for op, const in ops:
+            value = op(value, const)
+        return value
+
+    def inverse(self) -> "InverseConversion | None":
+        """Write-side conversion for a linear read conversion, else None."""
+        if self._ops is None:
+            return None
+        return InverseConversion(
+            [(_INVERSE.get(op, op), const) for op, const in reversed(self._ops)]
+        )
+
+
+class LinearConversion:
+    """`scale` / `offset` / `precision` declared directly in a model entry."""
+
+    def __init__(self, scale: float = 1, offset: float = 0,
+                 precision: int | None = None) -> None:
+        self.scale = scale
+        self.offset = offset
+        self.precision = precision
+        self.conversion = f"value * {scale} + {offset}"
+
+    is_linear = True
 
     def convert(self, value):
-        return eval(
-            self.conversion,
-            {
-                "value": value,
-                "__builtins__": {
-                    "bool": bool,
-                    "float": float,
-                    "int": int,
-                },
-            },
+        result = value * self.scale + self.offset if self.scale != 1 or self.offset else value
+        if self.precision is not None:
+            return round(result, self.precision)
+        return result
+
+    def inverse(self) -> "InverseConversion":
+        ops: list[tuple[Callable, Any]] = []
+        if self.offset:
+            ops.append((operator.sub, self.offset))
+        if self.scale != 1:
+            ops.append((operator.truediv, self.scale))
+        return InverseConversion(ops)
+
+
+class InverseConversion:
+    """Derived HA value → API value conversion. Tuya `value` DPs are
+    integers on the wire, so a result within float noise of an integer
+    is sent as that integer."""
+
+    def __init__(self, ops: list[tuple[Callable, Any]]) -> None:
+        self._ops = ops
+
+    def convert(self, value):
+        for op, const in self._ops:
+            value = op(value, const)
+        if isinstance(value, float) and abs(value - round(value)) < 1e-6:
+            return int(round(value))
+        return value
+
+
+def conversion_for(config: dict, default: str = "value"):
+    """Read conversion for a model entry: `conversion` string if given,
+    otherwise declared scale/offset/precision, otherwise `default`."""
+    if "conversion" in config:
+        return Conversion(config["conversion"])
+    if any(key in config for key in ("scale", "offset", "precision")):
+        return LinearConversion(
+            config.get("scale", 1), config.get("offset", 0), config.get("precision")
         )
+    return Conversion(default)
+
+
+def api_conversion_for(config: dict):
+    """Write conversion for a model entry: explicit `api_conversion`, or
+    the inverse of a linear read conversion, or None (send as-is)."""
+    if (api_conversion := config.get("api_conversion")) is not None:
+        return Conversion(api_conversion)
+    if "conversion" not in config and not any(
+        key in config for key in ("scale", "offset", "precision")
+    ):
+        return None
+    return conversion_for(config).inverse()
@@ -6,11 +6,12 @@ import hmac
 import hashlib
 import requests
 import json
+import base64
 import asyncio
 import threading
 from datetime import datetime, timedelta
-from typing import Any
-from homeassistant.core import HomeAssistant
+from typing import Any, Callable
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
     UpdateFailed,
@@ -34,6 +35,9 @@ from .const import (
     CONF_IP,
     CONF_LOCAL_KEY,
     CONF_PROTOCOL,
+    CONF_PUSH_COALESCE_MS,
+    CONF_LAN_WORKER,
+    DEFAULT_PUSH_COALESCE_MS,
     ERROR_AUTH,
     ERROR_CONN,
     DEFAULT_NAME,
@@ -42,13 +46,59 @@ from .const import (
     CONF_USER_CODE,
     CONF_CACHED_ACCESS_TOKEN,
     CONF_CACHED_TOKEN_EXPIRES_AT,
+    CONF_COMMAND_FLUSH_MS,
+    DEFAULT_COMMAND_FLUSH_MS,
 )
 import tinytuya
-from .model_loader import load_model_mapping, async_load_model_mapping
-from .raw_codec import encode_raw_field
+from .command_queue import LocalCommandQueue
+from .conversion import conversion_for
+from .derived import DerivedValues
+from .discovery import DiscoveredDevice, TuyaDiscovery
+from .dp_history import DpHistory
+from .executor import DeviceExecutor
+from .lan_gateway import LanGateway
+from .lan_manager import LanConnectionManager
+from .model_loader import collect_required_codes, load_model_mapping, async_load_model_mapping
+from .protocol_probe import PROBE_DEADLINE, async_probe_protocol
+from .raw_codec import encode_raw_field, patch_raw_bytes, raw_bytes_match, raw_field_span
+from .scheduler import Scheduler
+from .snapshot import DpSnapshot, pack_records, unpack_records
 
 _LOGGER = logging.getLogger(__name__)
 
+# Per-call deadlines on the device executor (executor.py). requests has
+# its own 10s timeout; a tinytuya call can legitimately take a while
+# (lock wait + connection timeout × socket retries) — these are "this is
+# not coming back" limits, not expected durations.
+HTTP_DEADLINE = 20
+LOCAL_IO_DEADLINE = 30
+# Local polls failing in a row before the protocol version is re-probed,
+# and the minimum time between two probes.
+PROBE_AFTER_FAILURES = 3
+PROBE_INTERVAL = 600
+# Cloud writes have no echo tracking (unlike local ones, see
+# command_queue.py): their sent value overrides polled values this long.
+CLOUD_SENT_VALUE_TTL = 8.0
+# A write is followed by one refresh this many seconds later (after the
+# local debounce); several writes in a row share it.
+CLOUD_FOLLOWUP_REFRESH = 2.0
+LOCAL_FOLLOWUP_REFRESH = 3.0
+# Warm start (snapshot.py): canlı kurulum başarısız olursa arka planda
+# bu aralıklarla (backoff) tekrar deneniyor.
+WARM_START_RETRY_MIN = 30
+WARM_START_RETRY_MAX = 300
+# Snapshot'tan gelen ama canlı veride henüz görülmeyen DP'ler (raw ya da
+# sadece push ile gelen, seyrek değişen DP'ler) bu süre boyunca stale
+# olarak tutuluyor; süre dolana kadar bildirilmeyenler bırakılıyor.
+SNAPSHOT_STALE_GRACE = 24 * 3600
+
+def _same_value(a: Any, b: Any) -> bool:
+    """Equality for DP values that doesn't treat True as 1."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    return a == b
+
+
 def make_api_request(url: str, headers: dict, method: str = "GET", data: dict = None) -> requests.Response:
     """Make API request."""
     try:
@@ -117,6 +167,54 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
         # Sensor entities use this to resolve their raw source when the
         # model file doesn't specify `raw_source` explicitly.
         self.raw_code_by_dp_id = {}
+        # Cloud poll sadece modelin kullandığı kodları ister (?codes=...).
+        # API filtreyi reddederse bu oturum için tam sorguya dönülür.
+        self._cloud_codes_filter = True
+        # Son MQTT push'unun zamanı (ms) — hibrit modda filtreli poll
+        # push ile gelen kodları içermediği için online kontrolünde de
+        # sayılıyor.
+        self._last_mqtt_push_ms = 0
+        # "Raw source became available" event. Platforms whose raw-field
+        # entities couldn't be created at setup (payload not in the first
+        # poll yet) subscribe via async_add_raw_source_listener(); each raw
+        # dp_id is announced exactly once, the first time its payload shows
+        # up in self.data. The underlying coordinator listener only exists
+        # while somebody is still waiting — see raw_codec.watch_pending_raw_entities.
+        self._raw_source_listeners: list[Callable[[int, str], None]] = []
+        self._raw_source_unsub: Callable[[], None] | None = None
+        self._announced_raw_dp_ids: set[int] = set()
+        # code → (raw value, converted value). See get_converted_value().
+        self._converted_cache: dict[str, tuple[Any, Any]] = {}
+        # Derived sensor values over the model's DerivedGraph (derived.py).
+        # Rebuilt when model_mapping is replaced.
+        self._derived: DerivedValues | None = None
+        # code → dp_id for everything we know a dp_id for (model mapping,
+        # plus every property the cloud poll reports). Used by the DP
+        # history recorder, which is keyed by dp_id.
+        self._dp_id_by_code: dict[str, int] = {}
+        # On-disk DP history (see dp_history.py). Opened from __init__.py
+        # after the first refresh; _history_last holds the last recorded
+        # value per code so only actual changes are written.
+        self.history: DpHistory | None = None
+        self._history_last: dict[str, Any] = {}
+        self._history_unsub: Callable[[], None] | None = None
+        # Last-known state in HA storage (see snapshot.py). stale is True
+        # while entities show snapshot values and no live refresh has
+        # succeeded yet; _snapshot_records holds the restored records so
+        # the ones the device hasn't re-reported stay marked stale (and
+        # are dropped after SNAPSHOT_STALE_GRACE).
+        self.stale = False
+        self._snapshot: DpSnapshot | None = None
+        self._snapshot_records: dict[str, dict] = {}
+        self._snapshot_unsub: Callable[[], None] | None = None
+        # Listener dispatch bookkeeping (see "LISTENER DISPATCH" below).
+        # Optimistic updates only schedule a dispatch for the end of the
+        # current loop tick; a real dispatch in between (refresh result,
+        # push) absorbs it.
+        self._dispatch_handle: asyncio.Handle | None = None
+        self.dispatch_count = 0
+        self.update_cycle_count = 0
+        self.coalesced_dispatch_count = 0
         # Serializes raw-field writes: a read-modify-write on a raw DP
         # (fetch current payload → patch one field → send whole payload
         # back) must not race with another write to a different field
@@ -125,14 +223,68 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
         # per dp_id and writes are infrequent enough that the extra
         # serialization has no practical cost.
         self._raw_write_lock = asyncio.Lock()
-        self._listener_task = None
-        self._heartbeat_task = None
-        # Debounce için (local)
-        self._pending_commands = {}  # code → (value, task)
-        self._debounce_delay = 1.0   # 1 saniye
-        # Son gönderilen değer cache (geri alma sorunu için)
-        self._sent_value_cache = {}  # code → (value, timestamp)
-        self._cache_timeout = 8.0    # 8 saniye
+        # In-process local mode: pushes and heartbeats are served by the
+        # shared LanConnectionManager (lan_manager.py) once registered.
+        self._lan_manager: LanConnectionManager | None = None
+        # Debounce, sent-value expiry, push flush ve takip refresh'leri
+        # için tek zamanlayıcı (scheduler.py) — komut başına task yok.
+        self._scheduler = Scheduler(hass)
+        # Son gönderilen değer cache (geri alma sorunu için): code → value.
+        # Local'de kayıt komut kuyruğu yazımı onaylayana ya da vazgeçene
+        # kadar, cloud'da CLOUD_SENT_VALUE_TTL boyunca (scheduler) geçerli.
+        self._sent_value_cache: dict[str, Any] = {}
+        # Raw DP alan yazımları için aynı koruma, ama sadece yazılan byte
+        # aralıklarına: raw_source → {offset: bytes}. Blob'un geri kalanı
+        # (aynı status grubundaki canlı ölçümler) cihazdan gelmeye devam eder.
+        self._sent_raw_fields: dict[str, dict[int, bytes]] = {}
+        # Local push micro-batching: frames received within the window
+        # are merged into _push_buffer and applied as ONE data update
+        # (one copy of self.data, one listener dispatch). See _queue_push.
+        self._push_window = config_entry.options.get(
+            CONF_PUSH_COALESCE_MS, DEFAULT_PUSH_COALESCE_MS
+        ) / 1000
+        self._push_buffer: dict[str, dict] = {}
+        self.push_frame_count = 0
+        self.push_flush_count = 0
+        # Atlanan yazımlar: istenen değer zaten geçerli/bekleyen değerdi
+        self.suppressed_write_count = 0
+        # Mevcut değerden daha eski zaman damgalı (geç gelmiş) MQTT push'ları
+        self.stale_push_count = 0
+        # Blocking tinytuya / requests calls run on this device's own
+        # small thread pool instead of HA's shared executor; a call that
+        # hangs past its deadline marks the device degraded and gets the
+        # tinytuya.Device replaced (see _async_on_hung_call).
+        self._executor = DeviceExecutor(
+            hass, self.device_id[-8:], on_hung=self._async_on_hung_call
+        )
+        self.degraded = False
+        self._replacing_device = False
+        # Optional out-of-process LAN transport (lan_worker.py / lan_gateway.py).
+        self._use_lan_worker = (
+            self.connection_type != "cloud"
+            and config_entry.options.get(CONF_LAN_WORKER, False)
+        )
+        self._lan_gateway: LanGateway | None = None
+        # Local yazımlar: debounce + tek frame'de çoklu DP (command_queue.py)
+        self._command_queue = LocalCommandQueue(
+            hass, self._scheduler, self.device_id[-8:], self._async_local_set_values,
+            window=config_entry.options.get(
+                CONF_COMMAND_FLUSH_MS, DEFAULT_COMMAND_FLUSH_MS
+            ) / 1000,
+            on_give_up=self._async_write_given_up,
+            matches=self._write_matches,
+        )
+        # Yazımı cihaz tarafından hiç onaylanmamış kodlar: self.data'daki
+        # optimistic değer cihazın gerçek değeri değil, cihaz bu kodu
+        # tekrar bildirene kadar no-op kontrolünde kullanılmıyor.
+        self._failed_write_codes: set[str] = set()
+        self._unsub_discovery: Callable[[], None] | None = None
+        self._local_failures = 0
+        self._last_probe = 0.0
+        self._probe_task: asyncio.Task | None = None
+        # Son doğrulanamayan yayın (ip, monotonic): aynı adres
+        # PROBE_INTERVAL dolmadan tekrar denenmiyor.
+        self._rejected_announcement: tuple[str, float] | None = None
 
         self.device_info = DeviceInfo(
             identifiers={(DOMAIN, self.device_id)},
@@ -183,13 +335,20 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             self.ip = config_entry.data[CONF_IP]
             self.local_key = config_entry.data[CONF_LOCAL_KEY]
             self.protocol = float(config_entry.data.get(CONF_PROTOCOL, "3.4"))
+            # Discovery bu cihazı (önceki bir kurulum denemesinde) başka
+            # bir adreste gördüyse doğrudan oraya bağlan; entry.data
+            # async_start_discovery → _async_retarget ile güncellenecek.
+            seen = TuyaDiscovery.lookup(hass, self.device_id)
+            if seen is not None and seen.ip != self.ip:
+                _LOGGER.info("Device %s announced at %s (configured %s)", self.device_id, seen.ip, self.ip)
+                self.ip = seen.ip
             # tinytuya'nın kalıcı soketi thread-safe değil. status()/
-            # receive()/heartbeat()/set_value() hepsi async_add_executor_job
-            # ile ayrı thread'lerde çalışıyor (listener loop, heartbeat loop,
+            # receive()/heartbeat()/set_value() hepsi cihazın kendi
+            # executor'ünde (bkz. executor.py) ayrı thread'lerde çalışıyor (LAN connection manager,
             # periyodik poll, debounce'lı yazma) — bu kilit olmadan ikisi
             # aynı anda soketi kullanırsa cevap karışıp "No dps in status
             # response" gibi hatalara yol açıyor. Tüm local_device.* erişimi
-            # bu kilit üzerinden (_local_status/_local_receive/vb.) geçmeli.
+            # bu kilit üzerinden (_local_status/_local_set_values ve LanConnectionManager) geçmeli.
             #
             # ÖNEMLİ: kilit TIMEOUT'LU alınıyor (bkz. _LOCK_ACQUIRE_TIMEOUT).
             # tinytuya'nın receive()/status() çağrıları, cihaz offline'dayken
@@ -197,7 +356,7 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             # — bu tinytuya'nın bilinen bir davranışı (bkz. jasonacox/tinytuya
             # ve make-all/tuya-local issue tracker'larındaki "receive() hangs
             # when device offline" raporları; bir vakada HA core'da segfault'a
-            # bile yol açmış). Düz `with lock:` kullansaydık, _listen_loop'un
+            # bile yol açmış). Düz `with lock:` kullansaydık, push dinleyicisinin
             # donmuş bir receive() çağrısı kilidi sonsuza dek tutar, sonra
             # status()/set_value() gibi HER ŞEY de aynı kilidi bekleyip
             # sonsuza dek takılır — HAOS açılışının "tuya_heat_pump'ta
@@ -206,54 +365,68 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             # sorunu, Python'dan zorla iptal edilemez) ama YENİ çağrıların
             # o thread'in peşine takılıp aynı kaderi paylaşmasını engeller.
             self._local_socket_lock = threading.Lock()
-            try:
-                try:
-                    self.local_device = tinytuya.Device(
-                        dev_id=self.device_id,
-                        address=self.ip,
-                        local_key=self.local_key,
-                        version=self.protocol,
-                        persist=True,
-                        # Cihaz kapalı/erişilemezken TCP bağlantı denemesi
-                        # işletim sisteminin varsayılan (genelde 20-60+
-                        # saniye) timeout'unu bekleyebiliyor — bu da HA'nın
-                        # "Waiting for integrations to complete setup" ile
-                        # uzun süre takılmasına yol açıyor. Kısa bir
-                        # bağlantı timeout'u ile cihaz kapalıyken hata
-                        # hızlı gelir, HA'nın kendi retry/backoff mekanizması
-                        # normal hızında işler.
-                        connection_timeout=3,
-                    )
-                except TypeError:
-                    # Bu tinytuya sürümü connection_timeout kwarg'ını
-                    # desteklemiyor — onsuz devam et (eski davranış).
-                    self.local_device = tinytuya.Device(
-                        dev_id=self.device_id,
-                        address=self.ip,
-                        local_key=self.local_key,
-                        version=self.protocol,
-                        persist=True,
-                    )
-                self.local_device.set_socketPersistent(True)
-                self.local_device.set_socketNODELAY(True)
-                # Kısa bir okuma timeout'u: _listen_loop sürekli receive()
-                # çağırıyor ve bunu _local_socket_lock altında yapıyor.
-                # tinytuya'nın varsayılan timeout'u birkaç saniye olabilir —
-                # veri gelmediğinde receive() o süre boyunca kilidi elinde
-                # tutar, bu da status()/set_value() çağrılarını gereksiz
-                # bekletir. Kısa timeout, kilidi sık sık bırakıp diğer
-                # çağrılara fırsat vermesini sağlıyor.
+            self.local_device = None
+            if self._use_lan_worker:
+                # Soket bu process'te değil, lan_worker sürecinde açılıyor
+                # (bkz. lan_gateway.py) — ilk status() isteğinde bağlanılır.
+                _LOGGER.info("Local device %s will be served by the LAN worker process", self.device_id)
+            else:
                 try:
-                    self.local_device.set_socketTimeout(1)
-                except Exception:
-                    pass  # bu tinytuya sürümünde yoksa sessizce geç
-                _LOGGER.info("Local Tuya device initialized (Persistent Mode + NoDelay): %s", self.device_id)
-               
-                self.hass.loop.create_task(self._async_start_listener())
-               
-            except Exception as err:
-                _LOGGER.error("Failed to initialize TinyTuya device: %s", err)
-                self.local_device = None
+                    self.local_device = self._create_local_device()
+                    _LOGGER.info("Local Tuya device initialized (Persistent Mode + NoDelay): %s", self.device_id)
+                   
+                    self._async_start_listener()
+                   
+                except Exception as err:
+                    _LOGGER.error("Failed to initialize TinyTuya device: %s", err)
+                    self.local_device = None
+
+    def _create_local_device(self):
+        """Build the persistent tinytuya.Device for this entry.
+
+        Also used to REPLACE the device after a hung call (see
+        _async_on_hung_call): the stuck thread keeps the old object and
+        its socket, everything after it gets a fresh connection.
+        """
+        try:
+            device = tinytuya.Device(
+                dev_id=self.device_id,
+                address=self.ip,
+                local_key=self.local_key,
+                version=self.protocol,
+                persist=True,
+                # Cihaz kapalı/erişilemezken TCP bağlantı denemesi
+                # işletim sisteminin varsayılan (genelde 20-60+
+                # saniye) timeout'unu bekleyebiliyor — bu da HA'nın
+                # "Waiting for integrations to complete setup" ile
+                # uzun süre takılmasına yol açıyor. Kısa bir
+                # bağlantı timeout'u ile cihaz kapalıyken hata
+                # hızlı gelir, HA'nın kendi retry/backoff mekanizması
+                # normal hızında işler.
+                connection_timeout=3,
+            )
+        except TypeError:
+            # Bu tinytuya sürümü connection_timeout kwarg'ını
+            # desteklemiyor — onsuz devam et (eski davranış).
+            device = tinytuya.Device(
+                dev_id=self.device_id,
+                address=self.ip,
+                local_key=self.local_key,
+                version=self.protocol,
+                persist=True,
+            )
+        device.set_socketPersistent(True)
+        device.set_socketNODELAY(True)
+        # Kısa bir okuma timeout'u: LanConnectionManager soketi kendisi
+        # bloklamadan okuyor, ama status()/set_value() cevap beklerken
+        # _local_socket_lock'u tutuyor. tinytuya'nın varsayılan timeout'u
+        # birkaç saniye olabilir — cevap gelmeyen bir çağrı kilidi o
+        # süre boyunca elinde tutar ve push okumalarını bekletir.
+        try:
+            device.set_socketTimeout(1)
+        except Exception:
+            pass  # bu tinytuya sürümünde yoksa sessizce geç
+        return device
 
     # ============================================================================
     # YARDIMCI METODLAR
@@ -272,10 +445,34 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                 if raw_source is not None:
                     self.dp_mapping[config['dp_id']] = raw_source
                     self.raw_code_by_dp_id[config['dp_id']] = raw_source
+                    self._dp_id_by_code[raw_source] = config['dp_id']
                     continue
                 self.dp_mapping[config['dp_id']] = code
+                self._dp_id_by_code[code] = config['dp_id']
         _LOGGER.info("dp_mapping oluşturuldu - %d DP tanımlı", len(self.dp_mapping))
 
+    def _cloud_poll_codes(self) -> set[str] | None:
+        """Cloud poll'da istenecek DP kodları; None → filtresiz tam sorgu.
+
+        Model yüklenmemişse ya da raw_source'u yazılmamış bir raw field'ın
+        kaynağı henüz bilinmiyorsa tam sorgu gerekiyor — raw_code_by_dp_id
+        tam listedeki 'raw' tipli property'lerden dolduruluyor.
+        """
+        if not self.model_mapping or not self._cloud_codes_filter:
+            return None
+        for entity_type in ['sensors', 'binary_sensors', 'switches', 'numbers', 'selects', 'texts']:
+            for config in self.model_mapping.get(entity_type, {}).values():
+                if ('field_index' in config and 'dp_id' in config
+                        and not config.get('raw_source')
+                        and config['dp_id'] not in self.raw_code_by_dp_id):
+                    return None
+        codes = collect_required_codes(self.model_mapping, self.raw_code_by_dp_id)
+        mqtt = self.sharing_mqtt
+        if mqtt is not None and mqtt.connected:
+            # Hibrit MQTT: push ile gelen kodları poll'da tekrar istemiyoruz.
+            codes -= mqtt.covered_codes
+        return codes or None
+
     def _pending_raw_dp_ids(self) -> list[int]:
         """Model'de tanımlı raw dp_id'lerden, henüz self.data içinde
         karşılığı olmayanları döndürür. Local (LAN) bağlantıda bazı
@@ -290,6 +487,251 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             if code not in data
         ]
 
+    @callback
+    def async_add_raw_source_listener(
+        self, update_callback: Callable[[int, str], None]
+    ) -> Callable[[], None]:
+        """Register update_callback(dp_id, code) for raw DPs arriving later.
+
+        The callback fires once per raw dp_id, the first time its payload
+        is present in self.data. Returns an idempotent remove function;
+        when the last subscriber is removed the coordinator listener that
+        drives this goes away too, so nothing runs on later updates.
+        """
+        self._raw_source_listeners.append(update_callback)
+        if self._raw_source_unsub is None:
+            self._raw_source_unsub = self.async_add_listener(
+                self._async_announce_raw_sources
+            )
+
+        @callback
+        def remove_listener() -> None:
+            if update_callback in self._raw_source_listeners:
+                self._raw_source_listeners.remove(update_callback)
+            if not self._raw_source_listeners and self._raw_source_unsub is not None:
+                self._raw_source_unsub()
+                self._raw_source_unsub = None
+
+        return remove_listener
+
+    @callback
+    def _async_announce_raw_sources(self) -> None:
+        """Fire the raw-source event for raw DPs that just arrived.
+
+        Only dp_ids not announced yet are looked at — once every known raw
+        DP has shown up this is an empty set difference per update.
+        """
+        data = self.data
+        if not data:
+            return
+        unannounced = self.raw_code_by_dp_id.keys() - self._announced_raw_dp_ids
+        for dp_id in unannounced:
+            code = self.raw_code_by_dp_id[dp_id]
+            if code not in data:
+                continue
+            self._announced_raw_dp_ids.add(dp_id)
+            for listener in list(self._raw_source_listeners):
+                listener(dp_id, code)
+
+    # ============================================================================
+    # DP HISTORY
+    # ============================================================================
+
+    async def async_start_history(self) -> None:
+        """Open the on-disk DP history and start recording value changes."""
+        history = DpHistory(self.hass, self.device_id)
+        try:
+            await history.async_open()
+        except OSError as err:
+            _LOGGER.warning("DP history could not be opened (%s) — not recording", err)
+            return
+        self.history = history
+        self._record_history()
+        self._history_unsub = self.async_add_listener(self._record_history)
+
+    async def async_stop_history(self) -> None:
+        if self._history_unsub is not None:
+            self._history_unsub()
+            self._history_unsub = None
+        if self.history is not None:
+            await self.history.async_close()
+            self.history = None
+
+    @callback
+    def _record_history(self) -> None:
+        """Write every DP whose value changed since the last update."""
+        data = self.data
+        if not data or self.history is None:
+            return
+        last = self._history_last
+        now = time.time()
+        for code, record in data.items():
+            value = record.get('value')
+            if code in last:
+                previous = last[code]
+                if type(previous) is type(value) and previous == value:
+                    continue
+            dp_id = self._dp_id_by_code.get(code)
+            if dp_id is None:
+                continue
+            last[code] = value
+            timestamp = record.get('timestamp')
+            self.history.record(timestamp / 1000 if timestamp else now, dp_id, value)
+
+    # ============================================================================
+    # SNAPSHOT (warm startup, bkz. snapshot.py)
+    # ============================================================================
+
+    async def async_restore_snapshot(self) -> bool:
+        """Seed model, device metadata and data from the stored snapshot.
+
+        Only when the model id is cached in the entry too — then nothing
+        here touches the network. False: no usable snapshot, cold start.
+        """
+        self._snapshot = DpSnapshot(self.hass, self.config_entry.entry_id)
+        if not (
+            self.config_entry.data.get("cached_model_id")
+            and self.config_entry.data.get("cached_model_device_id") == self.device_id
+        ):
+            return False
+        stored = await self._snapshot.async_load()
+        if not stored or stored.get("device_id") != self.device_id:
+            return False
+        await self.get_device_model()  # config_entry cache'inden
+        if stored.get("model_id") != self.model_id:
+            return False
+
+        self.device_name = stored.get("device_name") or self.device_name
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, self.device_id)},
+            name=self.device_name,
+            manufacturer=DEFAULT_MANUFACTURER,
+            model=stored.get("model") or DEFAULT_MODEL,
+        )
+        for dp_id, code in (stored.get("raw_code_by_dp_id") or {}).items():
+            try:
+                self.raw_code_by_dp_id.setdefault(int(dp_id), code)
+            except ValueError:
+                continue
+        self.is_online = bool(stored.get("is_online", True))
+        self._previous_online = self.is_online
+        data = unpack_records(
+            stored["data"],
+            lambda ms: datetime.fromtimestamp(ms / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+        )
+        self.data = data
+        self._snapshot_records = dict(data)
+        self.stale = True
+        _LOGGER.info(
+            "Warm start: %d DP snapshot'tan yüklendi (%s), canlı veri arka planda bekleniyor",
+            len(data), self.device_name,
+        )
+        return True
+
+    async def async_warm_start(self) -> None:
+        """Live part of a snapshot start: what async_setup_entry would
+        have awaited, retried with backoff instead of ConfigEntryNotReady."""
+        snapshot_name = self.device_name
+        delay = WARM_START_RETRY_MIN
+        while True:
+            await self.get_device_info()
+            if self.device_name != snapshot_name:
+                # unique_id'ler cihaz adından türetiliyor: entity'ler eski
+                # adla kuruldu. Snapshot'a yeni adı yazıp entry'yi yeniden
+                # kur (bir sonraki warm start yeni adla başlar).
+                _LOGGER.info(
+                    "Warm start: cihaz adı değişmiş (%s → %s), entry yeniden yükleniyor",
+                    snapshot_name, self.device_name,
+                )
+                await self._snapshot.async_save(self._snapshot_data())
+                self.hass.async_create_task(
+                    self.hass.config_entries.async_reload(self.config_entry.entry_id)
+                )
+                return
+            await self.async_refresh()
+            if self.last_update_success:
+                break
+            _LOGGER.info("Warm start: canlı veri alınamadı, %d sn sonra tekrar denenecek", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARM_START_RETRY_MAX)
+        self._async_mark_live()
+        await self._async_start_mqtt()
+
+    @callback
+    def _async_mark_live(self) -> None:
+        """First live refresh after a snapshot start: clear the stale flag.
+
+        Raw ve sadece push ile gelen DP'ler ilk poll'da olmayabiliyor;
+        onları hemen silmek entity'leri unavailable yapıyordu. Tekrar
+        bildirilene kadar tek tek stale kalıyorlar (is_stale), grace
+        süresi dolunca hâlâ bildirilmeyenler bırakılıyor.
+        """
+        self._snapshot_records = {
+            code: record for code, record in self._snapshot_records.items()
+            if self._is_snapshot_record(code)
+        }
+        self.stale = False
+        if self._snapshot_records:
+            self._scheduler.schedule(
+                "snapshot.expire", SNAPSHOT_STALE_GRACE, self._async_expire_snapshot_records
+            )
+        self.async_update_listeners()
+
+    def _is_snapshot_record(self, code: str) -> bool:
+        record = self._snapshot_records.get(code)
+        return record is not None and (self.data or {}).get(code) is record
+
+    def is_stale(self, code: str | None = None) -> bool:
+        """Whether `code` (or, without one, the whole device) still shows
+        a snapshot value the device hasn't confirmed since startup."""
+        if self.stale:
+            return True
+        return code is not None and self._is_snapshot_record(code)
+
+    @callback
+    def _async_expire_snapshot_records(self) -> None:
+        gone = [code for code in self._snapshot_records if self._is_snapshot_record(code)]
+        self._snapshot_records = {}
+        if not gone:
+            return
+        for code in gone:
+            del self.data[code]
+        _LOGGER.info(
+            "Warm start: %d sn içinde bildirilmeyen %d DP bırakıldı (%s)",
+            SNAPSHOT_STALE_GRACE, len(gone), ", ".join(sorted(gone)),
+        )
+        self.async_update_listeners()
+
+    def async_start_snapshot(self) -> None:
+        """Persist the last known state on every update (coalesced)."""
+        if self._snapshot is None:
+            self._snapshot = DpSnapshot(self.hass, self.config_entry.entry_id)
+        self._snapshot_unsub = self.async_add_listener(self._schedule_snapshot_save)
+
+    async def async_stop_snapshot(self) -> None:
+        if self._snapshot_unsub is not None:
+            self._snapshot_unsub()
+            self._snapshot_unsub = None
+        if self._snapshot is not None and self.data and not self.stale:
+            await self._snapshot.async_save(self._snapshot_data())
+
+    @callback
+    def _schedule_snapshot_save(self) -> None:
+        if self.data and not self.stale:
+            self._snapshot.async_schedule_save(self._snapshot_data)
+
+    def _snapshot_data(self) -> dict[str, Any]:
+        return {
+            "device_id": self.device_id,
+            "device_name": self.device_name,
+            "model": (self.device_info or {}).get("model"),
+            "model_id": self.model_id,
+            "is_online": self.is_online,
+            "raw_code_by_dp_id": {str(dp_id): code for dp_id, code in self.raw_code_by_dp_id.items()},
+            "data": pack_records(self.data or {}),
+            "saved_at": time.time(),
+        }
+
     # ============================================================================
     # LOCAL LISTENER
     # ============================================================================
@@ -298,45 +740,302 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
 
     def _local_status(self):
         """Locked wrapper around local_device.status()."""
-        if not self._local_socket_lock.acquire(timeout=self._LOCK_ACQUIRE_TIMEOUT):
+        # Kilit ve cihaz bir kere okunuyor: takılan bir çağrıdan sonra
+        # _async_replace_local_device ikisini de değiştirebilir.
+        lock, device = self._local_socket_lock, self.local_device
+        if not lock.acquire(timeout=self._LOCK_ACQUIRE_TIMEOUT):
             raise TimeoutError(
                 "Local socket lock alınamadı (muhtemelen donmuş bir "
                 "receive()/status() çağrısı meşgul tutuyor)"
             )
         try:
-            return self.local_device.status()
+            return device.status()
         finally:
-            self._local_socket_lock.release()
-
-    def _local_receive(self):
-        """Locked wrapper around local_device.receive()."""
-        if not self._local_socket_lock.acquire(timeout=self._LOCK_ACQUIRE_TIMEOUT):
-            raise TimeoutError("Local socket lock alınamadı (receive)")
+            lock.release()
+
+    def _local_set_values(self, dps):
+        """Locked wrapper around local_device.set_value() /
+        set_multiple_values() — one control frame either way."""
+        lock, device = self._local_socket_lock, self.local_device
+        if not lock.acquire(timeout=self._LOCK_ACQUIRE_TIMEOUT):
+            raise TimeoutError(f"Local socket lock alınamadı (set dps {list(dps)})")
         try:
-            return self.local_device.receive()
+            if len(dps) == 1:
+                ((dp_id, value),) = dps.items()
+                return device.set_value(dp_id, value)
+            return device.set_multiple_values(dps)
         finally:
-            self._local_socket_lock.release()
-
-    def _local_heartbeat(self):
-        """Locked wrapper around local_device.heartbeat()."""
-        if not self._local_socket_lock.acquire(timeout=self._LOCK_ACQUIRE_TIMEOUT):
-            raise TimeoutError("Local socket lock alınamadı (heartbeat)")
+            lock.release()
+
+    @callback
+    def _async_on_hung_call(self, label: str) -> None:
+        """A blocking call blew its deadline on the device executor."""
+        if not self.degraded:
+            _LOGGER.warning(
+                "Device %s degraded: %s hung (%d hung thread(s))",
+                self.device_id, label, self._executor.hung_threads,
+            )
+        self.degraded = True
+        if self.connection_type != "cloud" and self.local_device is not None:
+            self.hass.async_create_task(self._async_replace_local_device())
+
+    async def _async_replace_local_device(self, reason: str = "after a hung call") -> None:
+        """Swap in a fresh tinytuya.Device (and lock) after a hung call
+        or an address change (see _async_retarget).
+
+        Takılan thread eski cihaz nesnesini ve onun kilidini elinde
+        tutmaya devam ediyor — onu kurtaramıyoruz, ama yeni bir kilit ve
+        yeni bir soketle sonraki çağrılar onun peşine takılmıyor.
+        LanConnectionManager cihazı/kilidi her seferinde _local_io_pair()
+        üzerinden okuduğu için yeni sokete kendiliğinden geçiyor.
+        """
+        if self._replacing_device:
+            return
+        self._replacing_device = True
         try:
-            return self.local_device.heartbeat()
+            device = await self._executor.run(
+                self._create_local_device, deadline=LOCAL_IO_DEADLINE,
+                label="tinytuya.Device()",
+            )
+            self._local_socket_lock = threading.Lock()
+            self.local_device = device
+            _LOGGER.info("Local device %s recreated %s", self.device_id, reason)
+            if self._lan_manager is None:
+                self._async_start_listener()
+        except Exception as err:
+            _LOGGER.warning("Could not recreate local device %s: %s", self.device_id, err)
         finally:
-            self._local_socket_lock.release()
+            self._replacing_device = False
 
-    def _local_set_value(self, dp_id, value):
-        """Locked wrapper around local_device.set_value()."""
-        if not self._local_socket_lock.acquire(timeout=self._LOCK_ACQUIRE_TIMEOUT):
-            raise TimeoutError(f"Local socket lock alınamadı (set_value dp {dp_id})")
-        try:
-            return self.local_device.set_value(dp_id, value)
-        finally:
-            self._local_socket_lock.release()
+    @callback
+    def _async_clear_degraded(self) -> None:
+        if self.degraded:
+            _LOGGER.info("Device %s responding again, no longer degraded", self.device_id)
+            self.degraded = False
+
+    @property
+    def executor(self) -> DeviceExecutor:
+        return self._executor
+
+    @property
+    def scheduler(self) -> Scheduler:
+        return self._scheduler
+
+    # --- Local transport: in-process tinytuya socket or the LAN worker ---
+
+    @property
+    def _local_ready(self) -> bool:
+        return self._use_lan_worker or self.local_device is not None
+
+    async def _async_lan_gateway(self) -> LanGateway:
+        if self._lan_gateway is None:
+            gateway = LanGateway.get(self.hass)
+            await gateway.async_add_device(
+                self.device_id, self.ip, self.local_key, self.protocol,
+                self._handle_local_push,
+            )
+            self._lan_gateway = gateway
+        return self._lan_gateway
+
+    async def _async_local_status(self):
+        if self._use_lan_worker:
+            gateway = await self._async_lan_gateway()
+            return await gateway.async_status(self.device_id, LOCAL_IO_DEADLINE)
+        return await self._executor.run(self._local_status, deadline=LOCAL_IO_DEADLINE)
+
+    async def _async_local_set_values(self, dps: dict[int, Any]):
+        if self._use_lan_worker:
+            gateway = await self._async_lan_gateway()
+            result = await gateway.async_set_values(self.device_id, dps, LOCAL_IO_DEADLINE)
+        else:
+            result = await self._executor.run(
+                self._local_set_values, dps, deadline=LOCAL_IO_DEADLINE,
+                label="set_values",
+            )
+        # set_value()'nun cevabı çoğu cihazda yazılan DP'lerin yankısı —
+        # push gibi işleyip yazımı hemen onaylıyoruz; yoksa onay bir
+        # sonraki poll'u bekliyor, ACK_TIMEOUT'ta gereksiz yeniden
+        # gönderim yapılıyor ve gecikme histogramı şişiyordu.
+        if isinstance(result, dict) and isinstance(result.get("dps"), dict):
+            self._handle_local_push(result["dps"])
+        return result
+
+    @callback
+    def _handle_local_push(self, dps: dict) -> None:
+        """A push frame from the device (LAN connection manager or LAN worker)."""
+        delta = self._dps_to_records(dps)
+        if delta:
+            self._settle_writes(delta)
+            self._queue_push(delta)
+
+    async def async_stop_local_transport(self) -> None:
+        # Bekleyen yazımlar kaybolmasın: taşıma kapanmadan gönder.
+        if self._local_ready:
+            await self._command_queue.async_flush()
+        self._command_queue.cancel()
+        if self._unsub_discovery is not None:
+            self._unsub_discovery()
+            self._unsub_discovery = None
+        if self._lan_manager is not None:
+            self._lan_manager.unregister(self.device_id)
+            self._lan_manager = None
+        if self._lan_gateway is not None:
+            await self._lan_gateway.async_remove_device(self.device_id)
+            self._lan_gateway = None
+
+    async def async_start_discovery(self) -> None:
+        """Follow this device's UDP announcements (see discovery.py)."""
+        if self.connection_type == "cloud" or self._unsub_discovery is not None:
+            return
+        discovery = await TuyaDiscovery.async_get(self.hass)
+        self._unsub_discovery = discovery.async_subscribe(
+            self.device_id, self._async_on_discovered
+        )
+
+    @callback
+    def _async_on_discovered(self, seen: DiscoveredDevice) -> None:
+        version_changed = seen.version is not None and float(seen.version) != self.protocol
+        if not (
+            seen.ip != self.ip or version_changed or seen.ip != self.config_entry.data.get(CONF_IP)
+        ):
+            return
+        if self._probe_task is not None and not self._probe_task.done():
+            return
+        if (
+            self._rejected_announcement is not None
+            and self._rejected_announcement[0] == seen.ip
+            and time.monotonic() - self._rejected_announcement[1] < PROBE_INTERVAL
+        ):
+            return
+        self._probe_task = self.hass.async_create_background_task(
+            self._async_verify_announcement(seen),
+            f"tuya_heat_pump verify {self.device_id}",
+        )
+
+    async def _async_verify_announcement(self, seen: DiscoveredDevice) -> None:
+        """Retarget only once the device answers at the announced address.
+
+        UDP yayınları kimlik doğrulamasız: ağdaki herhangi biri bu cihaz
+        adına yayın gönderip bağlantıyı ve CONF_IP'yi başka bir adrese
+        çevirebilirdi. Yeni adreste local_key ile bir status() cevabı
+        alınmadan hiçbir şey taşınmıyor ya da kaydedilmiyor.
+        """
+        found = await async_probe_protocol(
+            self._run_probe, self.device_id, seen.ip, self.local_key,
+            preferred=seen.version or self.config_entry.data.get(CONF_PROTOCOL),
+        )
+        if found is None:
+            _LOGGER.warning(
+                "Device %s announced %s, but doesn't answer there — ignoring",
+                self.device_id, seen.ip,
+            )
+            self._rejected_announcement = (seen.ip, time.monotonic())
+            return
+        self._rejected_announcement = None
+        await self._async_retarget(DiscoveredDevice(seen.ip, found[0], seen.last_seen))
+
+    async def _async_retarget(self, seen: DiscoveredDevice) -> None:
+        """Move the local connection to a verified IP/protocol and
+        persist it, so the next restart starts from the right address.
+
+        DHCP cihaza yeni bir IP verdiğinde eskiden coordinator offline
+        kalıyordu, ta ki kullanıcı entry'yi elle yeniden yapılandırana
+        kadar. Cihaz yeni adreste cevap verir vermez bağlantı oraya
+        taşınıyor. `seen` doğrulanmış olmalı (bir status() cevabı —
+        _async_verify_announcement / _async_probe_protocol). entry.data
+        yazımı bir kullanıcı ayar değişikliği değil — skip_next_reload
+        ile reload atlanıyor.
+        """
+        changes = {}
+        if seen.ip != self.config_entry.data.get(CONF_IP):
+            changes[CONF_IP] = seen.ip
+        if seen.version is not None and float(seen.version) != float(
+            self.config_entry.data.get(CONF_PROTOCOL, "3.4")
+        ):
+            changes[CONF_PROTOCOL] = seen.version
+        moved = seen.ip != self.ip or (
+            seen.version is not None and float(seen.version) != self.protocol
+        )
+        if moved:
+            _LOGGER.warning(
+                "Device %s now announces %s (protocol %s), was %s (protocol %s) — reconnecting",
+                self.device_id, seen.ip, seen.version or self.protocol, self.ip, self.protocol,
+            )
+            self.ip = seen.ip
+            if seen.version is not None:
+                self.protocol = float(seen.version)
+            if self._use_lan_worker:
+                if self._lan_gateway is not None:
+                    # Bir sonraki istek cihazı yeni adresle yeniden ekler.
+                    await self._lan_gateway.async_remove_device(self.device_id)
+                    self._lan_gateway = None
+            else:
+                await self._async_replace_local_device(f"for {seen.ip}")
+        if changes:
+            self.skip_next_reload = True
+            self.hass.config_entries.async_update_entry(
+                self.config_entry, data={**self.config_entry.data, **changes}
+            )
+        if moved and self.data is not None:
+            await self.async_request_refresh()
+
+    @callback
+    def _maybe_probe_protocol(self) -> None:
+        """Re-probe the protocol version after repeated local failures.
+
+        Firmware güncellemesi sonrası cihaz başka bir protokol sürümüyle
+        konuşmaya başlayabiliyor (3.3 → 3.4 gibi); o durumda her poll
+        aynı şekilde başarısız olur. Arka arkaya PROBE_AFTER_FAILURES
+        başarısızlıktan sonra (en fazla PROBE_INTERVAL'de bir) tüm
+        sürümler paralel deneniyor, cevap veren farklıysa
+        _async_retarget ile ona geçiliyor.
+        """
+        if (
+            self._local_failures < PROBE_AFTER_FAILURES
+            or (self._probe_task is not None and not self._probe_task.done())
+            or time.monotonic() - self._last_probe < PROBE_INTERVAL
+        ):
+            return
+        self._last_probe = time.monotonic()
+        self._probe_task = self.hass.async_create_background_task(
+            self._async_probe_protocol(), f"tuya_heat_pump probe {self.device_id}"
+        )
+
+    def _run_probe(self, func, *args):
+        return self._executor.run(
+            func, *args, deadline=PROBE_DEADLINE, label="protocol probe"
+        )
+
+    async def _async_probe_protocol(self) -> None:
+        found = await async_probe_protocol(
+            self._run_probe, self.device_id, self.ip, self.local_key,
+            preferred=self.config_entry.data.get(CONF_PROTOCOL),
+        )
+        if found is None:
+            _LOGGER.debug("Protocol probe for %s: no version answered", self.device_id)
+            return
+        version = found[0]
+        if float(version) != self.protocol:
+            await self._async_retarget(DiscoveredDevice(self.ip, version, time.time()))
+        else:
+            _LOGGER.debug("Protocol probe for %s: %s still answers", self.device_id, version)
+
+    def _local_io_pair(self):
+        """(device, lock) for the LAN connection manager — read fresh on
+        every use, so a replaced device is picked up automatically."""
+        return self.local_device, self._local_socket_lock
+
+    @callback
+    def _async_start_listener(self) -> None:
+        """Register with the shared LAN connection manager for instant
+        updates and heartbeats.
 
-    async def _async_start_listener(self):
-        """Start the background listener for instant updates.
+        Cihaz başına ayrı bir listener + heartbeat task'ı (ve 150 ms'de
+        bir executor'a giden receive()) yerine tüm local cihazlar tek bir
+        selector thread'ini ve tek bir heartbeat zamanlayıcısını paylaşıyor
+        — cihaz sayısı arttıkça task/executor yükü artmıyor. Bağlantı
+        koparsa manager backoff ile yeniden bağlanıyor; periyodik status()
+        poll'u her durumda bağımsız çalışmaya devam ediyor.
 
         Does NOT call self.async_refresh() here — __init__.py already
         triggers the coordinator's one official first refresh via
@@ -348,65 +1047,53 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
         some devices' local protocol handling — hence "No 'dps' in
         status response" showing up right after the lock was added.
         """
-        _LOGGER.info("Starting TinyTuya listener loop for %s", self.device_id)
-        self._listener_task = self.hass.loop.create_task(self._listen_loop())
-        self._heartbeat_task = self.hass.loop.create_task(self._heartbeat_loop())
-
-    async def _listen_loop(self):
-        """Loop to receive instant data from the device.
-
-        Push tabanlı anlık güncelleme sadece bir OPTİMİZASYON — asıl veri
-        kaynağı ayrı bir yerde çalışan periyodik status() poll'u (birkaç
-        dakikada bir), o zaten kendi başına çalışmaya devam ediyor. Bu
-        yüzden burada tekrar tekrar backoff ile uğraşmıyoruz: bağlantı
-        BİR KERE başarısız olursa bu döngü tamamen duruyor, bir daha
-        kendiliğinden denemiyor. Veri akışı kesilmez, sadece "anlık"
-        olmaktan çıkıp normal poll hızına döner. Entegrasyon yeniden
-        yüklenirse (reload/restart) taze bir deneme başlar.
+        _LOGGER.info("Registering %s with the LAN connection manager", self.device_id)
+        self._lan_manager = LanConnectionManager.get(self.hass)
+        self._lan_manager.register(self.device_id, self._local_io_pair, self._handle_local_push)
+
+    @callback
+    def _queue_push(self, delta: dict[str, dict]) -> None:
+        """Buffer one push frame's records; flush after the coalescing window.
+
+        Cihazlar tek bir mantıksal olayda (örn. mod değişimi → temp_set,
+        work_mode ve bir raw status grubu) arka arkaya birkaç frame
+        gönderiyor. Her frame'i ayrı ayrı uygulamak her seferinde
+        self.data'nın kopyalanması ve tüm entity'lerin state yazması
+        demekti. Pencere ilk frame'den itibaren sayılıyor (sonrakiler
+        uzatmıyor), yani gecikme en fazla bir pencere. Bizim gönderdiğimiz
+        bir komutun yankısı beklemeden hemen uygulanıyor — kullanıcı
+        tepkiyi bekliyor.
         """
-        while True:
-            try:
-                await asyncio.sleep(0.05)
-                data = await self.hass.async_add_executor_job(self._local_receive)
-                if data and 'dps' in data:
-                    _LOGGER.debug("Instant update received: %s", data['dps'])
-                    new_data = self._process_local_dps(data['dps'])
-                    if new_data:
-                        self._apply_sent_cache(new_data)
-                        # Bu push muhtemelen sadece DEĞİŞEN DP'leri içeriyor
-                        # (tam bir status() snapshot'ı değil). self.data'nın
-                        # üzerine tamamen yazmak (replace) yerine mevcut
-                        # verinin üstüne merge ediyoruz — yoksa henüz bu
-                        # push'ta yer almayan tüm diğer sensör/switch/text
-                        # değerleri anında kaybolurdu.
-                        merged = {**(self.data or {}), **new_data}
-                        self.async_set_updated_data(merged)
-                await asyncio.sleep(0.1)
-            except Exception as err:
-                _LOGGER.warning(
-                    "Local instant-update listener stopped after an error "
-                    "(%s) — will not retry automatically. Periodic polling "
-                    "continues normally; reload the integration to try "
-                    "instant updates again.", err,
-                )
-                return
+        self.push_frame_count += 1
+        self._push_buffer.update(delta)
+        is_echo = not (
+            self._sent_value_cache.keys().isdisjoint(delta)
+            and self._sent_raw_fields.keys().isdisjoint(delta)
+        )
+        if is_echo or self._push_window <= 0:
+            self._flush_push_buffer()
+        else:
+            self._scheduler.schedule_earliest(
+                "push.flush", self._push_window, self._flush_push_buffer
+            )
 
-    async def _heartbeat_loop(self):
-        """Loop to keep the connection alive. _listen_loop ile aynı
-        mantık: bağlantı bir kere başarısız olursa tamamen durur, tekrar
-        denemez — periyodik status() poll'u bağımsız çalışmaya devam
-        eder, bu döngü sadece kalıcı soketi canlı tutan bir optimizasyon."""
-        while True:
-            try:
-                if self.local_device:
-                    await self.hass.async_add_executor_job(self._local_heartbeat)
-                await asyncio.sleep(5)
-            except Exception as err:
-                _LOGGER.debug(
-                    "Heartbeat loop stopped after an error (%s) — will not "
-                    "retry automatically.", err,
-                )
-                return
+    def _take_push_buffer(self) -> dict[str, dict]:
+        """Return and clear buffered push records (cancels the pending flush)."""
+        self._scheduler.cancel("push.flush")
+        buffered, self._push_buffer = self._push_buffer, {}
+        return buffered
+
+    @callback
+    def _flush_push_buffer(self) -> None:
+        delta = self._take_push_buffer()
+        if not delta:
+            return
+        self.push_flush_count += 1
+        self._apply_sent_cache(delta)
+        # Push'lar sadece DEĞİŞEN DP'leri içeriyor (tam bir status()
+        # snapshot'ı değil) — self.data'nın üstüne merge ediyoruz, yoksa
+        # bu push'ta olmayan tüm diğer değerler kaybolurdu.
+        self.async_set_updated_data({**(self.data or {}), **delta})
 
     # ============================================================================
     # MQTT (tuya_sharing) — opsiyonel, bkz. sharing_mqtt.py
@@ -417,7 +1104,7 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
         yaptıysa) MQTT'yi başlatmayı dener. __init__.py'den, ilk refresh
         (dolayısıyla model_mapping'in dolu olması) garantilendikten
         SONRA çağrılmalı — SharingMQTT.async_start() model_mapping'e
-        muhtaç, local moddaki _listen_loop'un aksine bu raceyi tolere
+        muhtaç, local moddaki push dinleyicisinin aksine bu raceyi tolere
         edemez."""
         if self.connection_type != "cloud" or not self.config_entry.data.get(CONF_USER_CODE):
             return
@@ -428,21 +1115,23 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
         started = await self.sharing_mqtt.async_start()
         if started and self.sharing_mqtt.sufficient:
             # MQTT bu cihazın TÜM DP'lerini görebiliyor -> poll'a gerek yok.
-            self._mqtt_set_active(True)
+            # Henüz bağlanmadıysa poll'u bağlantı kurulunca
+            # SharingMQTT.async_connection_changed duraklatıyor.
+            if self.sharing_mqtt.connected:
+                self._mqtt_set_active(True)
         elif started:
             # MQTT bağlandı ama bu cihazın DP'lerinin bir kısmını/hiçbirini
             # göremiyor (senin ısı pompan gibi — sadece 'switch' görünüyor).
             # Poll'u KESİNLİKLE duraklatmıyoruz — aksi halde sensör gibi
             # MQTT'de hiç görünmeyen değerler asla güncellenmez, sonsuza
-            # dek bayat kalır. Push burada sadece "bir şey oldu, hemen
-            # tazele" bonus tetikleyicisi olarak kullanılmaya devam eder
-            # (bkz. SharingMQTT._on_push / _mqtt_trigger_refresh),
-            # normal periyodik poll ise hiç değişmeden aynen sürer.
+            # dek bayat kalır. Hibrit mod: görülen kodların push değeri
+            # doğrudan uygulanır, poll ve her push'un tetiklediği sorgu
+            # sadece görülmeyen kodları ister (bkz. _cloud_poll_codes,
+            # SharingMQTT._on_push / _mqtt_trigger_refresh).
             _LOGGER.info(
                 "MQTT bağlandı ama bu cihazın DP'lerini tam kapsamıyor — "
-                "periyodik poll (%s) duraklatılmadan devam ediyor, "
-                "push sadece ek tetikleyici olarak kullanılacak.",
-                self.update_interval,
+                "periyodik poll (%s) MQTT'nin görmediği %d kod için devam ediyor.",
+                self.update_interval, len(self.sharing_mqtt.uncovered_codes),
             )
         else:
             _LOGGER.info(
@@ -471,33 +1160,118 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
         """sharing_mqtt.py'den (zaten event loop thread'ine güvenli
         şekilde geçmiş olarak, call_soon_threadsafe ile) çağrılır — bu
         cihaz için MQTT'nin TÜM gerekli DP'leri kapsadığı doğrulanmış
-        (SharingMQTT._sufficient), yani gelen veriye doğrudan güvenilir."""
-        merged = {**(self.data or {}), **new_data}
-        self.async_set_updated_data(merged)
+        (SharingMQTT._sufficient), yani gelen veriye doğrudan güvenilir.
+        Hibrit modda sadece MQTT'nin kapsadığı kodlar buraya gelir.
+
+        Kayıtlar cihazın DP zaman damgasını taşıyor: mevcut kaydın cihaz
+        zaman damgasından (poll ya da daha yeni bir push) ESKİ olan push
+        gecikmiş bir MQTT mesajıdır ve atlanır. Karşılaştırma sadece
+        cihaz saatleri arasında — optimistic yazımlar ve sent-value
+        düzeltmeleri 'timestamp'i HA saatine çekiyor, 'device_timestamp'e
+        dokunmuyor. Kabul edilenler poll yolundaki kayıt şekline tamamlanır.
+        """
+        now_ms = int(time.time() * 1000)
+        self._last_mqtt_push_ms = now_ms
+        current = self.data or {}
+        accepted = {}
+        for code, push in new_data.items():
+            device_ts = push.get('timestamp')
+            existing = current.get(code)
+            known_ts = existing.get('device_timestamp') if existing else None
+            if device_ts and known_ts and device_ts < known_ts:
+                self.stale_push_count += 1
+                _LOGGER.debug(
+                    "Eski MQTT push atlandı: %s = %s (push %d ms, mevcut %d ms)",
+                    code, push.get('value'), device_ts, known_ts,
+                )
+                continue
+            timestamp = device_ts or now_ms
+            value = push.get('value')
+            accepted[code] = {
+                'value': value,
+                'timestamp': timestamp,
+                'device_timestamp': device_ts or known_ts,
+                'type': existing.get('type', '') if existing else type(value).__name__,
+                'last_update': datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S'),
+            }
+        if not accepted:
+            return
+        self._apply_sent_cache(accepted)
+        self.async_set_updated_data({**current, **accepted})
 
     async def _mqtt_trigger_refresh(self) -> None:
         """sharing_mqtt.py'den çağrılır — bu cihaz için MQTT'nin
-        gördüğü DP kümesi YETERSİZ, o yüzden push'un İÇERİĞİNE hiç
-        bakmadan, sadece "bir şey değişti" sinyali olarak alıp tam bir
-        API sorgusu tetikliyoruz."""
+        gördüğü DP kümesi YETERSİZ. Push "bir şey değişti" sinyali
+        olarak alınıp API sorgusu tetikleniyor; MQTT bağlıyken bu sorgu
+        sadece MQTT'nin görmediği kodları ister (bkz. _cloud_poll_codes).
+        Debouncer art arda gelen push'ları tek sorguda birleştiriyor."""
         await self.async_request_refresh()
 
+    @callback
+    def _settle_writes(self, records: dict) -> None:
+        """Device reported values: local writes it confirmed no longer
+        need the sent-value override."""
+        self._failed_write_codes.difference_update(records)
+        for code in self._command_queue.confirm(records):
+            self._drop_sent_value(code)
+
+    @callback
+    def _async_write_given_up(self, code: str) -> None:
+        self._drop_sent_value(code)
+        self._failed_write_codes.add(code)
+
+    @callback
+    def _remember_sent(self, code: str, value: Any,
+                       raw_fields: dict[int, bytes] | None, ttl: float | None) -> None:
+        """Protect a just-written value from stale device data.
+
+        raw_fields: raw DP alan yazımında sadece yazılan byte aralıkları
+        korunur. ttl None: kayıt yazım onaylanana/bırakılana kadar kalır.
+        """
+        if raw_fields is None:
+            self._sent_value_cache[code] = value
+            self._sent_raw_fields.pop(code, None)
+        else:
+            self._sent_raw_fields.setdefault(code, {}).update(raw_fields)
+        if ttl is None:
+            self._scheduler.cancel(("sent", code))
+        else:
+            self._scheduler.schedule(("sent", code), ttl, lambda: self._drop_sent_value(code))
+
+    @callback
+    def _drop_sent_value(self, code: str) -> None:
+        self._sent_value_cache.pop(code, None)
+        self._sent_raw_fields.pop(code, None)
+        self._scheduler.cancel(("sent", code))
+
+    def _write_matches(self, code: str, sent: Any, reported: Any) -> bool:
+        fields = self._sent_raw_fields.get(code)
+        if fields and code not in self._sent_value_cache:
+            return raw_bytes_match(reported, fields)
+        return sent == reported
+
     def _apply_sent_cache(self, new_data: dict):
-        """Gelen veride eski değer varsa, son gönderilen değeri zorla uygula."""
-        current_time = time.time()
-        for code, (sent_value, sent_time) in list(self._sent_value_cache.items()):
-            if current_time - sent_time > self._cache_timeout:
-                del self._sent_value_cache[code]
-                continue
-           
-            if code in new_data and new_data[code]['value'] != sent_value:
+        """Gelen veride eski değer varsa, son gönderilen değeri zorla uygula.
+
+        Süresi dolan kayıtları scheduler siliyor; burada sadece gelen
+        veriyle kesişen kodlara bakılıyor.
+        """
+        for code in self._sent_value_cache.keys() & new_data.keys():
+            sent_value = self._sent_value_cache[code]
+            if new_data[code]['value'] != sent_value:
                 _LOGGER.warning("Device returned old value (%s = %s), correcting from cache → %s",
                                 code, new_data[code]['value'], sent_value)
                 new_data[code]['value'] = sent_value
                 new_data[code]['timestamp'] = int(time.time() * 1000)
-
-    def _process_local_dps(self, dps: dict) -> dict:
-        """Helper to convert raw DPS to our data format."""
+        for code in self._sent_raw_fields.keys() & new_data.keys():
+            reported = new_data[code]['value']
+            patched = patch_raw_bytes(reported, self._sent_raw_fields[code])
+            if patched is not None and patched != reported:
+                _LOGGER.debug("Device returned old raw field bytes in %s, keeping the written fields", code)
+                new_data[code]['value'] = patched
+
+    def _dps_to_records(self, dps: dict) -> dict:
+        """Raw DPS → {code: record} for the mapped DPs in `dps` only."""
         data = {}
         current_ms = int(time.time() * 1000)
         current_str = datetime.fromtimestamp(current_ms / 1000).strftime('%Y-%m-%d %H:%M:%S')
@@ -515,12 +1289,6 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                     }
             except ValueError:
                 continue
-      
-        if self.data and isinstance(self.data, dict):
-            updated_data = dict(self.data)
-            updated_data.update(data)
-            return updated_data
-          
         return data
 
     # ============================================================================
@@ -570,10 +1338,11 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
           
             url = f"{self.api_endpoint}{TOKEN_PATH}"
           
-            response = await self.hass.async_add_executor_job(
+            response = await self._executor.run(
                 make_api_request,
                 url,
-                headers
+                headers,
+                deadline=HTTP_DEADLINE,
             )
           
             if response.status_code != 200:
@@ -650,10 +1419,11 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                 url = f"{self.api_endpoint}{path}"
                 _LOGGER.info("Getting device info from API...")
               
-                response = await self.hass.async_add_executor_job(
+                response = await self._executor.run(
                     make_api_request,
                     url,
-                    headers
+                    headers,
+                    deadline=HTTP_DEADLINE,
                 )
               
                 result = response.json()
@@ -731,10 +1501,11 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             url = f"{self.api_endpoint}{path}"
             _LOGGER.info("Cloud API'den model bilgisi alınıyor: %s", url)
           
-            response = await self.hass.async_add_executor_job(
+            response = await self._executor.run(
                 make_api_request,
                 url,
-                headers
+                headers,
+                deadline=HTTP_DEADLINE,
             )
           
             result = response.json()
@@ -783,16 +1554,30 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
     # KOMUT GÖNDERME
     # ============================================================================
 
-    async def send_command(self, code: str, value: Any, _retry: bool = True) -> bool:
+    async def send_command(self, code: str, value: Any, _retry: bool = True,
+                           debounce: float | None = None,
+                           _raw_fields: dict[int, bytes] | None = None) -> bool:
         """Send command to device - local için debounce ile en son değeri gönder.
 
+        debounce: local yazımın kuyrukta bekleme süresi (sn). None =
+        komut kuyruğunun penceresi (number/slider gibi art arda değişen
+        değerler); switch/select 0 veriyor — anında gider.
+
         _retry: dahili kullanım için. Cloud modda "token invalid" hatası
         alınırsa (kök neden artık _get_token()'daki expiry takibiyle
         düzeltildi, ama sunucu tarafında erken/manuel bir invalidation
         ihtimaline karşı savunma amaçlı), access_token'ı temizleyip TEK
         seferliğine tekrar dener — poll'daki (_async_update_data) aynı
         self-healing davranışın komut gönderme tarafındaki karşılığı.
+
+        İstenen değer cihazın zaten bildirdiği (ya da kuyrukta bekleyen)
+        değerle aynıysa hiçbir şey gönderilmez ve True döner — bkz.
+        _is_noop_write.
         """
+        if self._is_noop_write(code, value):
+            self.suppressed_write_count += 1
+            _LOGGER.debug("Write suppressed, %s is already %s", code, value)
+            return True
         try:
             if self.connection_type == "cloud":
                 # _get_token() artık expiry'yi kendi içinde kontrol ediyor,
@@ -821,12 +1606,13 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                 url = f"{self.api_endpoint}{path}"
                 _LOGGER.info("Cloud komut (v2.0) - ham değer: %s = %s", code, value)
               
-                response = await self.hass.async_add_executor_job(
+                response = await self._executor.run(
                     make_api_request,
                     url,
                     headers,
                     "POST",
-                    body_dict
+                    body_dict,
+                    deadline=HTTP_DEADLINE,
                 )
               
                 result = response.json()
@@ -837,7 +1623,7 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                     # cache'e yazıyoruz ki _apply_sent_cache (aşağıdaki
                     # poll'da çağrılıyor) Tuya cloud'un henüz yetişmediği
                     # bir "eski değer" döndürmesi durumunda bunu düzeltebilsin.
-                    self._sent_value_cache[code] = (value, time.time())
+                    self._remember_sent(code, value, _raw_fields, CLOUD_SENT_VALUE_TTL)
                     # Optimistic update: local moddaki ile aynı sebep —
                     # cihazdan/Tuya cloud'undan gerçek yankıyı beklemeden
                     # entity'ye YENİ değeri hemen yansıtıyoruz. Bu olmadan
@@ -851,9 +1637,8 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                     if self.data and code in self.data:
                         self.data[code]['value'] = value
                         self.data[code]['timestamp'] = int(time.time() * 1000)
-                        self.async_update_listeners()
-                    await asyncio.sleep(2)
-                    await self.async_request_refresh()
+                        self.async_schedule_dispatch()
+                    self.async_schedule_followup_refresh(CLOUD_FOLLOWUP_REFRESH)
                     return True
                 else:
                     error_msg = result.get('msg', 'Bilinmeyen hata')
@@ -865,12 +1650,14 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                         )
                         self.access_token = None
                         self._token_expires_at = 0.0
-                        return await self.send_command(code, value, _retry=False)
+                        return await self.send_command(
+                            code, value, _retry=False, debounce=debounce, _raw_fields=_raw_fields
+                        )
                     _LOGGER.error("❌ Cloud komut başarısız: %s = %s → %s", code, value, error_msg)
                     return False
                   
-            else:  # Local mod - DEBOUNCE
-                if not self.local_device:
+            else:  # Local mod - komut kuyruğu (debounce + çoklu DP frame)
+                if not self._local_ready:
                     _LOGGER.error("Local device not initialized")
                     return False
                
@@ -879,14 +1666,10 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                     _LOGGER.error("No dp_id mapping found for code: %s", code)
                     return False
                
-                # Mevcut bekleyen task varsa iptal et
-                if code in self._pending_commands:
-                    task = self._pending_commands[code][1]
-                    task.cancel()
-                    _LOGGER.debug("Önceki debounce iptal edildi: %s", code)
-               
-                # Son gönderilen değeri cache'e yaz
-                self._sent_value_cache[code] = (value, time.time())
+                # Son gönderilen değeri cache'e yaz — cihaz bu değeri
+                # yankılayana (ya da kuyruk tekrar denemelerden sonra
+                # vazgeçene) kadar eski değerli echo'lar bunu ezemez.
+                self._remember_sent(code, value, _raw_fields, None)
 
                 # Optimistic update: cihazdan echo/status beklemeden
                 # entity'lere YENİ değeri hemen göster. Bunu yapmazsak
@@ -900,30 +1683,17 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                 if self.data and code in self.data:
                     self.data[code]['value'] = value
                     self.data[code]['timestamp'] = int(time.time() * 1000)
-                    self.async_update_listeners()
-
-                # Yeni debounce task oluştur
-                async def delayed_send():
-                    await asyncio.sleep(self._debounce_delay)
-                    try:
-                        result = await self.hass.async_add_executor_job(
-                            self._local_set_value, dp_id, value
-                        )
-                        if result:
-                            _LOGGER.info("✅ Debounce sonrası başarılı: dp %s (%s) = %s", dp_id, code, value)
-                        else:
-                            _LOGGER.warning("❌ Debounce sonrası başarısız: dp %s", dp_id)
-                    except Exception as err:
-                        _LOGGER.error("Debounce gönderme hatası %s = %s: %s", code, value, err)
-                    finally:
-                        if code in self._pending_commands:
-                            del self._pending_commands[code]
+                    self.async_schedule_dispatch()
+
+                # Aynı DP'ye gelen daha yeni değer eskisinin yerini alır;
+                # pencere içinde biriken TÜM DP'ler tek frame'de gider.
+                delay = self._command_queue.window if debounce is None else debounce
+                self._command_queue.submit(code, dp_id, value, delay)
+                # Push etmeyen DP'lerin yankısı da bu poll'la gelir.
+                self.async_schedule_followup_refresh(delay + LOCAL_FOLLOWUP_REFRESH)
                
-                task = self.hass.loop.create_task(delayed_send())
-                self._pending_commands[code] = (value, task)
-               
-                _LOGGER.info("Local komut debounce beklemede: dp %s (%s) = %s (%.1f sn sonra gönderilecek)",
-                             dp_id, code, value, self._debounce_delay)
+                _LOGGER.info("Local komut kuyrukta: dp %s (%s) = %s (%.1f sn sonra gönderilecek)",
+                             dp_id, code, value, delay)
                
                 return True
                   
@@ -931,8 +1701,50 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             _LOGGER.error("Error sending command %s: %s", code, str(err))
             return False
 
+    def _is_noop_write(self, code: str, value: Any) -> bool:
+        """Would writing `value` to `code` change nothing?
+
+        Otomasyonların setpoint'leri birkaç dakikada bir yeniden yazması
+        yaygın; cihaz zaten o değerdeyken her seferinde imzalı bir cloud
+        isteği / local frame ve takip refresh'i gereksiz. Karşılaştırma
+        sırası: kuyrukta/yankı bekleyen en yeni yazım (varsa o kazanır —
+        farklı bir değer bekliyorsa geri almak için yazmak gerekir),
+        sonra cloud'un henüz yansıtmadığı gönderilmiş değer, sonra
+        self.data. Raw alan yazımları patch'lenmiş tam blob ile geliyor,
+        yani "alan zaten bu değerde" durumu da buraya düşüyor.
+
+        self.data'ya güvenilmeyen iki durum: warm start'ta snapshot'tan
+        gelen (cihazın henüz doğrulamadığı) kayıtlar ve son yazımı
+        onaylanmadan vazgeçilmiş kodlar (optimistic değer kalmış olabilir).
+        """
+        if self.connection_type != "cloud":
+            found, pending = self._command_queue.latest_value(code)
+            if found:
+                return _same_value(pending, value)
+        if code in self._sent_value_cache:
+            return _same_value(self._sent_value_cache[code], value)
+        if self.is_stale(code) or code in self._failed_write_codes:
+            return False
+        record = (self.data or {}).get(code)
+        return record is not None and _same_value(record.get('value'), value)
+
+    @callback
+    def async_schedule_followup_refresh(self, delay: float) -> None:
+        """One refresh `delay` s after the latest write.
+
+        Entity'ler eskiden her yazımdan hemen sonra kendileri
+        async_request_refresh() bekliyordu — local'de daha komut
+        gönderilmeden, cloud'da Tuya henüz yetişmeden. Art arda gelen
+        yazımlar artık tek bir (son yazımdan sonraki) refresh'i paylaşıyor.
+        """
+        self._scheduler.schedule(
+            "followup.refresh", delay,
+            lambda: self.hass.async_create_task(self.async_request_refresh()),
+        )
+
     async def send_raw_field_command(self, raw_source: str, field_index: int,
-                                       encoding: str, value) -> bool:
+                                       encoding: str, value,
+                                       debounce: float | None = None) -> bool:
         """Write a single field inside a raw-type DP.
 
         Tuya raw DPs are opaque byte blobs with no partial write — every
@@ -940,8 +1752,9 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
         read-modify-write: takes the most recently polled payload for
         `raw_source` from self.data, patches just this one field's bytes,
         and sends the full patched payload back through the existing
-        send_command() path (so cloud/local dispatch, debounce, and the
-        sent-value cache all keep working exactly as before).
+        send_command() path (so cloud/local dispatch and debounce keep
+        working exactly as before). Sent-value protection covers only
+        this field's bytes (see _remember_sent), not the whole blob.
 
         Returns False (does not raise) if the payload hasn't been read
         yet — the caller should surface that as "try again after the
@@ -954,24 +1767,95 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             )
             return False
 
-        current_b64 = self.data[raw_source].get('value')
-        new_b64 = encode_raw_field(current_b64, field_index, encoding, value)
-        if new_b64 is None:
-            _LOGGER.error(
-                "Cannot write raw field '%s' (field_index=%s, encoding=%s): encode failed",
-                raw_source, field_index, encoding,
+        async with self._raw_write_lock:
+            current_b64 = self.data[raw_source].get('value')
+            new_b64 = encode_raw_field(current_b64, field_index, encoding, value)
+            if new_b64 is None:
+                _LOGGER.error(
+                    "Cannot write raw field '%s' (field_index=%s, encoding=%s): encode failed",
+                    raw_source, field_index, encoding,
+                )
+                return False
+            offset, size = raw_field_span(field_index, encoding)
+            field_bytes = base64.b64decode(new_b64)[offset:offset + size]
+            return await self.send_command(
+                raw_source, new_b64, debounce=debounce, _raw_fields={offset: field_bytes}
             )
-            return False
 
-        async with self._raw_write_lock:
-            return await self.send_command(raw_source, new_b64)
+    # ============================================================================
+    # LISTENER DISPATCH
+    # ============================================================================
+    #
+    # Bir güncelleme döngüsü = tek bir listener dispatch'i. Eskiden
+    # _async_update_data online durumunu hesapladıktan sonra kendisi
+    # async_update_listeners() çağırıyor, sonra data'yı döndürüyordu —
+    # DataUpdateCoordinator da dönen data için listener'ları BİR KEZ DAHA
+    # çağırıyordu; yani her entity her poll'da iki kez state yazıyordu.
+    # Artık _async_update_data hiç dispatch yapmıyor: başarıda dönen data,
+    # hatada da DataUpdateCoordinator'ın kendi (başarılı → başarısız
+    # geçişindeki) tek dispatch'i is_online değişikliğini de taşıyor.
+    # Optimistic güncellemeler (send_command) aynı loop tick'i içinde
+    # birleştiriliyor ve araya gerçek bir dispatch girerse ona katılıyor.
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Dispatch to listeners, absorbing any scheduled optimistic dispatch."""
+        if self._dispatch_handle is not None:
+            self._dispatch_handle.cancel()
+            self._dispatch_handle = None
+            self.coalesced_dispatch_count += 1
+        self.dispatch_count += 1
+        super().async_update_listeners()
+
+    @callback
+    def async_set_updated_data(self, data) -> None:
+        """Push/MQTT path: one update cycle, one dispatch."""
+        self.update_cycle_count += 1
+        super().async_set_updated_data(data)
+
+    @callback
+    def async_schedule_dispatch(self) -> None:
+        """Request a listener dispatch at the end of the current loop tick.
+
+        Any number of calls within the same tick (several optimistic
+        writes, a write followed by a push) end up as one dispatch.
+        """
+        if self._dispatch_handle is not None:
+            self.coalesced_dispatch_count += 1
+            return
+        self._dispatch_handle = self.hass.loop.call_soon(self._async_flush_dispatch)
+
+    @callback
+    def _async_flush_dispatch(self) -> None:
+        self._dispatch_handle = None
+        self.async_update_listeners()
+
+    @property
+    def dispatch_stats(self) -> dict[str, Any]:
+        """Dispatch counters, for diagnostics."""
+        cycles = self.update_cycle_count
+        return {
+            "dispatches": self.dispatch_count,
+            "update_cycles": cycles,
+            "coalesced": self.coalesced_dispatch_count,
+            "dispatches_per_cycle": round(self.dispatch_count / cycles, 2) if cycles else None,
+        }
 
     # ============================================================================
     # VERİ GÜNCELLEME (POLL)
     # ============================================================================
 
     async def _async_update_data(self):
-        """Fetch data from Tuya API or local device (Manual Poll)."""
+        """Fetch data from Tuya API or local device (Manual Poll).
+
+        Listener'ları kendisi çağırmaz — bkz. LISTENER DISPATCH.
+        """
+        # Token yenileme / filtresiz sorguya dönüş _async_fetch_data'yı
+        # yeniden çağırıyor; döngü sayısı refresh başına bir kez artmalı.
+        self.update_cycle_count += 1
+        return await self._async_fetch_data()
+
+    async def _async_fetch_data(self):
         if self.connection_type == "cloud":
             try:
                 # _get_token() artık expiry'yi kendi içinde kontrol ediyor,
@@ -980,6 +1864,11 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                 await self._get_token()
                 t = str(int(time.time() * 1000))
                 path = DEVICE_DATA_PATH.format(device_id=self.device_id)
+                wanted = self._cloud_poll_codes()
+                if wanted:
+                    # Query de imzaya giriyor (Tuya: path?key=value,
+                    # key'e göre sıralı); kodlar URL-safe.
+                    path = f"{path}?codes={','.join(sorted(wanted))}"
                 sign = self._calculate_sign(t, path, self.access_token)
                
                 headers = {
@@ -992,22 +1881,22 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                
                 url = f"{self.api_endpoint}{path}"
                
-                response = await self.hass.async_add_executor_job(
+                response = await self._executor.run(
                     make_api_request,
                     url,
-                    headers
+                    headers,
+                    deadline=HTTP_DEADLINE,
                 )
                
                 if response.status_code == 401:
                     _LOGGER.warning("401 Unauthorized - token yenileniyor")
                     self.access_token = None
                     self._token_expires_at = 0.0
-                    return await self._async_update_data()
+                    return await self._async_fetch_data()
                
                 if response.status_code != 200:
                     self.is_online = False
                     _LOGGER.info("Online status değişti: OFFLINE (HTTP %s)", response.status_code)
-                    self.async_update_listeners()
                     raise UpdateFailed(f"HTTP error {response.status_code}")
                
                 result = response.json()
@@ -1016,10 +1905,13 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                     if 'token' in msg.lower():
                         self.access_token = None
                         self._token_expires_at = 0.0
-                        return await self._async_update_data()
+                        return await self._async_fetch_data()
+                    if wanted:
+                        _LOGGER.info("Kod filtreli sorgu reddedildi (%s) — tam sorguya dönülüyor", msg)
+                        self._cloud_codes_filter = False
+                        return await self._async_fetch_data()
                     self.is_online = False
                     _LOGGER.info("Online status değişti: OFFLINE (API error: %s)", msg)
-                    self.async_update_listeners()
                     raise UpdateFailed(f"API error: {msg}")
                
                 current_time = int(time.time() * 1000)
@@ -1027,6 +1919,8 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                
                 if properties:
                     latest_timestamp = max(prop.get('time', 0) for prop in properties)
+                    if wanted:
+                        latest_timestamp = max(latest_timestamp, self._last_mqtt_push_ms)
                     time_diff = current_time - latest_timestamp
                    
                     scan_interval_ms = self.update_interval.total_seconds() * 1000 if self.update_interval else 180000
@@ -1046,25 +1940,41 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                     _LOGGER.info("Online status değişti: %s", "ONLINE" if self.is_online else "OFFLINE")
                     self._previous_online = self.is_online
                
-                self.async_update_listeners()
-               
-                data = {}
+                for prop in properties:
+                    dp_id = prop.get('dp_id')
+                    if dp_id is not None:
+                        self._dp_id_by_code[prop['code']] = dp_id
+                        # Cache raw-type DPs so raw-field sensors can find
+                        # their source without an explicit `raw_source` in
+                        # the model file.
+                        if prop.get('type') == 'raw':
+                            self.raw_code_by_dp_id[dp_id] = prop['code']
+                # Modelin kullanmadığı property'ler için kayıt üretilmiyor
+                # (büyük, kullanılmayan raw DP'ler). Tam sorguda raw
+                # kaynaklar yukarıda çözüldükten sonra hesaplanıyor.
+                needed = wanted or (
+                    collect_required_codes(self.model_mapping, self.raw_code_by_dp_id)
+                    if self.model_mapping else None
+                )
+                fresh = {}
                 for prop in properties:
                     code = prop['code']
-                    data[code] = {
+                    if needed and code not in needed:
+                        continue
+                    fresh[code] = {
                         'value': prop.get('value'),
                         'timestamp': prop.get('time', 0),
+                        # Cihazın (cloud'un) zaman damgası; 'timestamp'
+                        # optimistic yazımda HA saatine çekilebiliyor.
+                        'device_timestamp': prop.get('time', 0),
                         'type': prop.get('type', ''),
                         'last_update': datetime.fromtimestamp(prop.get('time', 0) / 1000).strftime('%Y-%m-%d %H:%M:%S')
                     }
-                    # Cache raw-type DPs so raw-field sensors can find
-                    # their source without an explicit `raw_source` in
-                    # the model file.
-                    if prop.get('type') == 'raw':
-                        dp_id = prop.get('dp_id')
-                        if dp_id is not None:
-                            self.raw_code_by_dp_id[dp_id] = code
-                self._apply_sent_cache(data)
+                self._apply_sent_cache(fresh)
+                # Filtreli cevap sadece istenen kodları taşıyor — kalanlar
+                # (MQTT push'ları vs.) mevcut veriden korunuyor.
+                data = {**(self.data or {}), **fresh}
+                self._async_clear_degraded()
                 return data
                
             except Exception as err:
@@ -1072,16 +1982,15 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                 if self._previous_online != self.is_online:
                     _LOGGER.info("Online status değişti: OFFLINE (exception: %s)", err)
                     self._previous_online = self.is_online
-                self.async_update_listeners()
                 raise UpdateFailed(f"Error: {str(err)}")
       
         else:
-            if not self.local_device:
+            if not self._local_ready:
                 raise UpdateFailed("Local device not initialized")
 
             # Periyodik status() burada duruyor çünkü bazı DP'ler (örn.
             # basit ayar değişiklikleri) cihaz tarafından proaktif push
-            # edilmiyor — sadece _listen_loop'a güvenirsek o DP'lerin
+            # edilmiyor — sadece push'lara güvenirsek o DP'lerin
             # gösterilen değeri yazdıktan sonra hiç güncellenmez, eski
             # değerde "takılı" kalmış gibi görünür. Asıl "No dps" hatasının
             # kaynağı bu periyodik çağrının kendisi değildi — aynı anda İKİ
@@ -1089,19 +1998,18 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             # async_refresh çağrısı) tetiklenen çakışan ilk-refresh'ti; o
             # zaten kaldırıldı (bkz. _async_start_listener). Kilit ve kısa
             # socket timeout'la birlikte, düzenli tek tek gelen bu
-            # sorgular artık _listen_loop ile çakışmıyor.
+            # sorgular artık push dinleyicisiyle çakışmıyor.
             try:
-                status = await self.hass.async_add_executor_job(self._local_status)
+                status = await self._async_local_status()
               
                 if not status or 'dps' not in status:
                     _LOGGER.warning("No 'dps' in status response - retrying once")
                     await asyncio.sleep(1.0)
-                    status = await self.hass.async_add_executor_job(self._local_status)
+                    status = await self._async_local_status()
                   
                     if not status or 'dps' not in status:
                         self.is_online = False
                         _LOGGER.info("Online status değişti: OFFLINE (local status başarısız)")
-                        self.async_update_listeners()
                         raise UpdateFailed("No 'dps' in local status response after retry")
               
                 self.is_online = True
@@ -1109,10 +2017,18 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                     _LOGGER.info("Online status değişti: ONLINE")
                     self._previous_online = self.is_online
                
-                self.async_update_listeners()
-               
-                data = self._process_local_dps(status['dps'])
+                # Henüz uygulanmamış push'lar self.data'dan yeni, bu
+                # status() cevabı ise ikisinden de yeni: sıra buna göre.
+                polled = self._dps_to_records(status['dps'])
+                self._settle_writes(polled)
+                data = {
+                    **(self.data or {}),
+                    **self._take_push_buffer(),
+                    **polled,
+                }
                 self._apply_sent_cache(data)
+                self._async_clear_degraded()
+                self._local_failures = 0
                 return data
           
             except Exception as err:
@@ -1120,7 +2036,8 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                 if self._previous_online != self.is_online:
                     _LOGGER.info("Online status değişti: OFFLINE (local exception: %s)", err)
                     self._previous_online = self.is_online
-                self.async_update_listeners()
+                self._local_failures += 1
+                self._maybe_probe_protocol()
                 raise UpdateFailed(f"Local error: {str(err)}")
 
     # ============================================================================
@@ -1141,6 +2058,12 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
                 return dp_id
         return None
 
+    @property
+    def history_codes(self) -> dict[int, str]:
+        """DP ID → code for the DPs the history records (model + cloud'dan
+        öğrenilenler; export_history servisi kullanıyor)."""
+        return {dp_id: code for code, dp_id in self._dp_id_by_code.items()}
+
     def get_tuya_dp_info(self, code: str) -> dict:
         """Code için tam DP bilgilerini döndürür."""
         dp_id = self.get_dp_id(code)
@@ -1149,11 +2072,66 @@ class TuyaScaleDataUpdateCoordinator(DataUpdateCoordinator):
             "dp_id": dp_id,
         }
 
+    def get_converted_value(self, code: str, config: dict | None = None) -> Any:
+        """Return the `conversion`-applied value of a plain sensor code.
+
+        Memoized per raw value: the conversion only runs again when the
+        DP's raw value actually changes, so every reader (the sensor
+        itself, calculated power, the energy accumulator) shares one
+        evaluation per update. On a conversion error the raw value is
+        returned, like the sensor platform always did.
+        """
+        if not self.data or code not in self.data:
+            return None
+        raw_value = self.data[code]['value']
+        cached = self._converted_cache.get(code)
+        # type() check: 1 == True, but conversions can tell them apart.
+        if cached is not None and type(cached[0]) is type(raw_value) and cached[0] == raw_value:
+            return cached[1]
+        if config is None:
+            config = (self.model_mapping or {}).get("sensors", {}).get(code, {})
+        decoder = config.get('_bitmap_decoder')
+        try:
+            if decoder is not None:
+                result = decoder.describe(raw_value)
+            else:
+                result = conversion_for(config).convert(raw_value)
+        except Exception as err:
+            _LOGGER.warning("Conversion failed for %s: %s", code, err)
+            result = raw_value
+        self._converted_cache[code] = (raw_value, result)
+        return result
+
+    def get_derived_value(self, code: str) -> Any:
+        """Value of a derived sensor (see derived.py), None if the model
+        declares no such expression or an input is unavailable."""
+        graph = (self.model_mapping or {}).get("_derived_graph")
+        if graph is None:
+            return None
+        if self._derived is None or self._derived.graph is not graph:
+            self._derived = DerivedValues(graph, self)
+        return self._derived.value(code)
+
+    def is_derived(self, code: str) -> bool:
+        graph = (self.model_mapping or {}).get("_derived_graph")
+        return graph is not None and code in graph.nodes
+
     @property
     def extra_tuya_info(self) -> dict:
-        """Tüm entity'lerde kullanılabilecek genel Tuya bilgileri."""
+        """Genel Tuya bilgileri ve çalışma sayaçları (diagnostics.py)."""
         return {
             "model_id": self.model_id,
             "connection_type": self.connection_type,
             "device_id": self.device_id,
+            "dispatch": self.dispatch_stats,
+            "push_frames": self.push_frame_count,
+            "push_flushes": self.push_flush_count,
+            "suppressed_writes": self.suppressed_write_count,
+            "stale_pushes": self.stale_push_count,
+            "degraded": self.degraded,
+            "executor": self._executor.stats,
+            "commands": self._command_queue.stats,
+            "lan_manager": self._lan_manager.stats if self._lan_manager else None,
+            "lan_worker_restarts": self._lan_gateway.restarts if self._lan_gateway else None,
+            "mqtt": self.sharing_mqtt.stats if self.sharing_mqtt else None,
         }
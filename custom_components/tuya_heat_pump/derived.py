@@ -0,0 +1,232 @@
+"""Derived sensors: values computed from other DPs' converted values.
+
+A model file declares them next to the DP sensors:
+
+    "calculated_total_power": {
+        "code": "calculated_total_power",
+        "name": "Total Power (3-Phase)",
+        "unit": "W",
+        "derived": "voltage_current * cur_current + bv * b_cur + cv * c_cur",
+        "precision": 2,
+    },
+    "cop": {
+        "code": "cop",
+        "derived": "(outlet_temp - inlet_temp) * flow * 69.8 / calculated_power",
+        "precision": 2,
+    },
+
+Names in the expression are sensor codes, read through
+coordinator.get_converted_value() (so with the sensor's conversion
+applied), or other derived codes. The usual `abs`, `min`, `max`,
+`round`, `float`, `int` are available. An input that is missing or not
+a number makes the result None, as does any arithmetic error (x / 0).
+
+model_loader compiles all expressions of a model once into a
+DerivedGraph (dependency order, cycle check). Each coordinator keeps a
+DerivedValues cache over that graph: when a source DP changes, only the
+derived values downstream of it are marked dirty, and each is
+recomputed at most once — on the next read — no matter how many
+entities (the power sensor, the energy accumulator, ...) read it.
+
+`calculated_power` without an explicit expression keeps its historical
+meaning, ac_vol × ac_curr rounded to 2 decimals.
+"""
+from __future__ import annotations
+
+import ast
+import logging
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .coordinator import TuyaScaleDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+LEGACY_POWER_CODE = "calculated_power"
+LEGACY_POWER_EXPRESSION = "ac_vol * ac_curr"
+LEGACY_POWER_PRECISION = 2
+
+_FUNCTIONS = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "float": float,
+    "int": int,
+}
+
+
+class DerivedNode:
+    """One compiled derived expression."""
+
+    __slots__ = ("code", "expression", "inputs", "precision", "_code")
+
+    def __init__(self, code: str, expression: str, precision: int | None = None) -> None:
+        tree = ast.parse(expression.strip(), mode="eval")
+        self.code = code
+        self.expression = expression
+        self.inputs: tuple[str, ...] = tuple(sorted({
+            node.id for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and node.id not in _FUNCTIONS
+        }))
+        self.precision = precision
+        self._code = compile(tree, f"<derived {code}>", "eval")
+
+    def evaluate(self, values: dict[str, Any]) -> float | None:
+        if any(values.get(name) is None for name in self.inputs):
+            return None
+        try:
+            result = eval(self._code, {"__builtins__": _FUNCTIONS}, values)
+        except (ArithmeticError, TypeError, ValueError) as err:
+            _LOGGER.debug("Derived %s not computable: %s", self.code, err)
+            return None
+        if isinstance(result, bool) or not isinstance(result, (int, float)):
+            return result
+        result = float(result)
+        if self.precision is not None:
+            result = round(result, self.precision)
+        return result
+
+
+class DerivedGraph:
+    """All derived expressions of one model, in dependency order."""
+
+    def __init__(self, nodes: dict[str, DerivedNode]) -> None:
+        self.nodes = nodes
+        # Topological order; nodes that are part of a cycle, or depend on
+        # one, are dropped.
+        order: list[str] = []
+        state: dict[str, int] = {}  # 1 = visiting, 2 = done, 3 = failed
+
+        def visit(code: str, path: tuple[str, ...]) -> bool:
+            if state.get(code) == 2:
+                return True
+            if state.get(code) == 3:
+                return False
+            if state.get(code) == 1:
+                _LOGGER.error("Derived sensor cycle: %s", " → ".join(path + (code,)))
+                return False
+            state[code] = 1
+            ok = all(
+                visit(dep, path + (code,))
+                for dep in nodes[code].inputs if dep in nodes
+            )
+            state[code] = 2 if ok else 3
+            if ok:
+                order.append(code)
+            return ok
+
+        for code in nodes:
+            visit(code, ())
+        dropped = set(nodes) - set(order)
+        if dropped:
+            _LOGGER.error(
+                "Derived sensors dropped (cycle or depends on one): %s",
+                ", ".join(sorted(dropped)),
+            )
+        for code in dropped:
+            del nodes[code]
+        self.order: tuple[str, ...] = tuple(order)
+
+        # DP code → every derived code that (transitively) depends on it,
+        # in evaluation order.
+        dependents: dict[str, set[str]] = {}
+        for code in self.order:
+            for dep in nodes[code].inputs:
+                dependents.setdefault(dep, set()).add(code)
+        position = {code: i for i, code in enumerate(self.order)}
+        self.leaves: tuple[str, ...] = tuple(
+            sorted(dep for dep in dependents if dep not in nodes)
+        )
+        self.downstream: dict[str, tuple[str, ...]] = {}
+        for leaf in self.leaves:
+            reached: set[str] = set()
+            stack = list(dependents[leaf])
+            while stack:
+                code = stack.pop()
+                if code not in reached:
+                    reached.add(code)
+                    stack.extend(dependents.get(code, ()))
+            self.downstream[leaf] = tuple(sorted(reached, key=position.__getitem__))
+
+
+def compile_derived(mapping: dict) -> None:
+    """Build the model's DerivedGraph (stored as mapping["_derived_graph"])."""
+    sensors = mapping.get("sensors", {})
+    nodes: dict[str, DerivedNode] = {}
+    for key, cfg in sensors.items():
+        expression = cfg.get("derived")
+        precision = cfg.get("precision")
+        if expression is None and key == LEGACY_POWER_CODE:
+            expression = LEGACY_POWER_EXPRESSION
+            precision = LEGACY_POWER_PRECISION
+        if expression is None:
+            continue
+        try:
+            nodes[key] = DerivedNode(key, expression, precision)
+        except SyntaxError as err:
+            _LOGGER.error("Invalid derived expression for %s: %s", key, err)
+    # The energy sensor integrates `power_source` (calculated_power by
+    # default) even when no power sensor entity is declared.
+    energy = sensors.get("total_energy")
+    if energy is not None:
+        source = energy.get("power_source", LEGACY_POWER_CODE)
+        if source == LEGACY_POWER_CODE and source not in nodes:
+            nodes[source] = DerivedNode(source, LEGACY_POWER_EXPRESSION, LEGACY_POWER_PRECISION)
+    mapping["_derived_graph"] = DerivedGraph(nodes) if nodes else None
+
+
+class DerivedValues:
+    """Per-coordinator cache of derived values over a DerivedGraph."""
+
+    def __init__(self, graph: DerivedGraph, coordinator: TuyaScaleDataUpdateCoordinator) -> None:
+        self.graph = graph
+        self._coordinator = coordinator
+        self._leaf_raw: dict[str, Any] = {}
+        self._values: dict[str, Any] = {}
+        self._dirty: set[str] = set(graph.order)
+        self.recomputes = 0
+
+    def _sync(self) -> None:
+        """Mark derived values dirty whose source DPs changed since the
+        last read. Compares raw values, so in-place optimistic updates of
+        coordinator.data are picked up too."""
+        data = self._coordinator.data or {}
+        for leaf in self.graph.leaves:
+            record = data.get(leaf)
+            raw = record.get("value") if record else None
+            previous = self._leaf_raw.get(leaf, _MISSING)
+            if previous is _MISSING or type(previous) is not type(raw) or previous != raw:
+                self._leaf_raw[leaf] = raw
+                self._dirty.update(self.graph.downstream[leaf])
+
+    def _input(self, name: str) -> Any:
+        if name in self.graph.nodes:
+            return self._values.get(name)
+        coordinator = self._coordinator
+        if not coordinator.data or name not in coordinator.data:
+            return None
+        value = coordinator.get_converted_value(name)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        return value
+
+    def value(self, code: str) -> Any:
+        if code not in self.graph.nodes:
+            return None
+        self._sync()
+        if self._dirty:
+            # Recompute in dependency order, so inputs that are derived
+            # themselves are already fresh.
+            for name in self.graph.order:
+                if name in self._dirty:
+                    node = self.graph.nodes[name]
+                    self._values[name] = node.evaluate(
+                        {dep: self._input(dep) for dep in node.inputs}
+                    )
+                    self.recomputes += 1
+            self._dirty.clear()
+        return self._values.get(code)
+
+
+_MISSING = object()
@@ -0,0 +1,52 @@
+"""Diagnostics for Tuya Heat Pump config entries.
+
+Collects the coordinator's runtime counters (coordinator.extra_tuya_info:
+dispatches per update cycle, push coalescing, suppressed writes, hung
+executor threads, write-to-echo latency, MQTT link health) together with
+the redacted entry and the current DP records, so a "Download
+diagnostics" from the device page is enough to judge how a unit behaves.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    CONF_ACCESS_ID,
+    CONF_ACCESS_KEY,
+    CONF_CACHED_ACCESS_TOKEN,
+    CONF_LOCAL_KEY,
+    CONF_SHARING_TOKEN_INFO,
+    CONF_USER_CODE,
+    DOMAIN,
+)
+from .coordinator import TuyaScaleDataUpdateCoordinator
+
+TO_REDACT = {
+    CONF_ACCESS_ID,
+    CONF_ACCESS_KEY,
+    CONF_CACHED_ACCESS_TOKEN,
+    CONF_LOCAL_KEY,
+    CONF_SHARING_TOKEN_INFO,
+    CONF_USER_CODE,
+}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: TuyaScaleDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "online": coordinator.is_online,
+        "stale": coordinator.stale,
+        "stats": coordinator.extra_tuya_info,
+        "data": coordinator.data,
+    }
@@ -0,0 +1,176 @@
+"""Passive UDP discovery of local Tuya devices.
+
+Tuya devices announce themselves every few seconds with a UDP broadcast:
+port 6666 (protocol 3.1, plain), 6667 (3.2–3.4, encrypted with a fixed
+key) and 7000 (3.5). The payload carries the device id (`gwId`), its
+current IP and protocol version — the same data tinytuya.deviceScan()
+collects in test/tuya_dps_explorer.py.
+
+One listener per HA instance (hass.data[DATA_DISCOVERY]) keeps a
+device_id → DiscoveredDevice(ip, version, last_seen) table. Local
+coordinators subscribe with their device id and are told as soon as a
+broadcast shows a different IP or protocol (DHCP moved the unit, a
+firmware update changed its protocol), so they re-target the connection
+instead of staying offline until the user reconfigures the entry.
+
+Listening is passive: nothing is ever sent. Ports another integration
+already holds without SO_REUSEPORT are skipped with a debug log.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import tinytuya
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import Event, HomeAssistant, callback
+
+from .const import DOMAIN, PROTOCOL_OPTIONS
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_DISCOVERY = f"{DOMAIN}_discovery"
+DISCOVERY_PORTS = (6666, 6667, 7000)
+
+
+@dataclass
+class DiscoveredDevice:
+    ip: str
+    version: str | None
+    last_seen: float
+
+
+def _decode(data: bytes) -> dict | None:
+    """Broadcast payload → dict, or None if it isn't a Tuya announcement."""
+    try:
+        payload = tinytuya.decrypt_udp(data)
+    except Exception:  # malformed / foreign packet on the same port
+        return None
+    if isinstance(payload, bytes):
+        payload = payload.decode(errors="ignore")
+    try:
+        result = json.loads(payload)
+    except (TypeError, ValueError):
+        return None
+    return result if isinstance(result, dict) else None
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, discovery: TuyaDiscovery) -> None:
+        self._discovery = discovery
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        payload = _decode(data)
+        if payload is not None:
+            self._discovery.async_seen(payload, addr[0])
+
+
+class TuyaDiscovery:
+    """Integration-wide broadcast listener and device address table."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self.devices: dict[str, DiscoveredDevice] = {}
+        self._subscribers: dict[str, Callable[[DiscoveredDevice], None]] = {}
+        self._transports: list[asyncio.DatagramTransport] = []
+        self._unsub_stop: Callable[[], None] | None = None
+
+    @classmethod
+    async def async_get(cls, hass: HomeAssistant) -> TuyaDiscovery:
+        discovery = hass.data.get(DATA_DISCOVERY)
+        if discovery is None:
+            discovery = hass.data[DATA_DISCOVERY] = cls(hass)
+            await discovery._async_start()
+        return discovery
+
+    @staticmethod
+    def lookup(hass: HomeAssistant, device_id: str) -> DiscoveredDevice | None:
+        """Last announcement of device_id seen by a running listener, if any."""
+        discovery = hass.data.get(DATA_DISCOVERY)
+        return discovery.devices.get(device_id) if discovery is not None else None
+
+    async def _async_start(self) -> None:
+        loop = asyncio.get_running_loop()
+        for port in DISCOVERY_PORTS:
+            try:
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _Protocol(self),
+                    local_addr=("0.0.0.0", port),
+                    reuse_port=True,
+                    allow_broadcast=True,
+                )
+            except (OSError, ValueError) as err:
+                _LOGGER.debug("Discovery: cannot listen on UDP %d: %s", port, err)
+                continue
+            self._transports.append(transport)
+        if self._transports:
+            _LOGGER.debug("Discovery listening on %d UDP port(s)", len(self._transports))
+        else:
+            _LOGGER.warning("Discovery: no UDP port available, IP changes won't be followed")
+        self._unsub_stop = self._hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, self._async_on_hass_stop
+        )
+
+    @callback
+    def _async_on_hass_stop(self, _event: Event) -> None:
+        # A plain lambda isn't recognised as a callback and would be run
+        # in the executor, closing the transports off the event loop.
+        self._async_stop()
+
+    @callback
+    def _async_stop(self) -> None:
+        self._unsub_stop = None
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+        if self._hass.data.get(DATA_DISCOVERY) is self:
+            self._hass.data.pop(DATA_DISCOVERY)
+
+    @callback
+    def async_seen(self, payload: dict, source_ip: str) -> None:
+        device_id = payload.get("gwId") or payload.get("devId")
+        if not device_id:
+            return
+        ip = payload.get("ip") or source_ip
+        version = payload.get("version")
+        if version is not None and str(version) not in PROTOCOL_OPTIONS:
+            version = None
+        else:
+            version = str(version) if version is not None else None
+        previous = self.devices.get(device_id)
+        entry = DiscoveredDevice(ip, version or (previous.version if previous else None), time.time())
+        self.devices[device_id] = entry
+        if previous is not None and (previous.ip, previous.version) == (entry.ip, entry.version):
+            return
+        subscriber = self._subscribers.get(device_id)
+        if subscriber is not None:
+            subscriber(entry)
+
+    @callback
+    def async_subscribe(self, device_id: str,
+                        on_change: Callable[[DiscoveredDevice], None]) -> Callable[[], None]:
+        """Call on_change(entry) whenever device_id's IP or version changes.
+
+        If the device was already seen, on_change runs right away with
+        the known entry — the caller compares it with what it uses.
+        """
+        self._subscribers[device_id] = on_change
+        known = self.devices.get(device_id)
+        if known is not None:
+            on_change(known)
+
+        @callback
+        def _unsubscribe() -> None:
+            if self._subscribers.get(device_id) is on_change:
+                del self._subscribers[device_id]
+            if not self._subscribers:
+                if self._unsub_stop is not None:
+                    self._unsub_stop()
+                self._async_stop()
+
+        return _unsubscribe
@@ -0,0 +1,306 @@
+"""Per-device on-disk DP history (fixed-size ring buffer).
+
+Keeps the recent evolution of every mapped DP (e.g. how
+`compressor_strength` or a fault register changed over the last hour)
+without pushing each raw field through the HA recorder. Every value
+change becomes one fixed-size record in a memory-mapped file, so a
+write is a struct.pack_into on a mmap — cheap enough for high-rate
+local pushes — and the file never grows past `capacity` records.
+
+File layout (little-endian):
+    header  : magic "THPH", version u16, record size u16,
+              capacity u32, head u32 (next slot), count u32, 12 pad bytes
+    records : timestamp f64, dp_id u16, kind u8, 5 pad bytes, value 8 bytes
+
+The 8-byte value slot holds ints/floats/bools directly. Strings (most
+notably base64 raw payloads, which repeat a lot) are stored once in a
+side table keyed by an 8-byte hash, and the record only carries the
+hash — see _BLOB_KINDS.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from functools import partial
+from typing import Any, Callable, Iterable
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 65536  # 1.5 MiB per device at 24 bytes/record
+
+_MAGIC = b"THPH"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHIII12x")
+_RECORD = struct.Struct("<dHB5x8s")
+
+_KIND_NONE = 0
+_KIND_BOOL = 1
+_KIND_INT = 2
+_KIND_FLOAT = 3
+_KIND_STR = 4
+_KIND_JSON = 5
+_BLOB_KINDS = (_KIND_STR, _KIND_JSON)
+
+_INT64 = struct.Struct("<q")
+_FLOAT64 = struct.Struct("<d")
+
+BLOB_STORAGE_VERSION = 1
+# New blobs are written at most BLOB_SAVE_DELAY seconds after they first
+# appear: a save is scheduled only if none is pending, so a raw DP that
+# changes on every push can't keep pushing the write back.
+BLOB_SAVE_DELAY = 120
+
+
+def _blob_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+def _history_path(hass: HomeAssistant, device_id: str) -> str:
+    return hass.config.path(".storage", f"{DOMAIN}_history_{device_id}.bin")
+
+
+def _blob_store(hass: HomeAssistant, device_id: str) -> Store:
+    return Store(hass, BLOB_STORAGE_VERSION, f"{DOMAIN}.history_blobs.{device_id}")
+
+
+async def async_remove_history(hass: HomeAssistant, device_id: str) -> None:
+    """Delete a device's ring file and blob store (config entry removed)."""
+    def _remove() -> None:
+        try:
+            os.remove(_history_path(hass, device_id))
+        except FileNotFoundError:
+            pass
+
+    await hass.async_add_executor_job(_remove)
+    await _blob_store(hass, device_id).async_remove()
+
+
+class DpHistory:
+    """Memory-mapped ring buffer of (timestamp, dp_id, value) records."""
+
+    def __init__(self, hass: HomeAssistant, device_id: str,
+                 capacity: int = DEFAULT_CAPACITY) -> None:
+        self._hass = hass
+        self.device_id = device_id
+        self.capacity = capacity
+        self.path = _history_path(hass, device_id)
+        self._file = None
+        self._mm: mmap.mmap | None = None
+        self._head = 0
+        self._count = 0
+        # hash (hex) → original string, persisted alongside the ring.
+        self._blobs: dict[str, str] = {}
+        # hash (hex) → number of ring records pointing at it. Kept up to
+        # date on every write, so unreferenced blobs are dropped as soon
+        # as their last record is overwritten instead of by a full scan
+        # of the ring on each save.
+        self._blob_refs: dict[str, int] = {}
+        self._blob_save_pending = False
+        self._blob_store: Store = _blob_store(hass, device_id)
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+
+    async def async_open(self) -> None:
+        self._blobs = await self._blob_store.async_load() or {}
+        await self._hass.async_add_executor_job(self._open)
+
+    def _open(self) -> None:
+        size = _HEADER.size + self.capacity * _RECORD.size
+        exists = os.path.exists(self.path)
+        self._file = open(self.path, "r+b" if exists else "w+b")
+        reset = True
+        if exists and os.path.getsize(self.path) == size:
+            header = _HEADER.unpack(self._file.read(_HEADER.size))
+            magic, version, record_size, capacity, head, count = header
+            if (magic, version, record_size, capacity) == (
+                _MAGIC, _VERSION, _RECORD.size, self.capacity
+            ) and head < capacity and count <= capacity:
+                self._head, self._count = head, count
+                reset = False
+        if reset:
+            # New file, older format or a different capacity: start over.
+            self._file.truncate(size)
+            self._head = self._count = 0
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        if reset:
+            self._write_header()
+        # One scan at open (in the executor); record() keeps it current.
+        refs: dict[str, int] = {}
+        for _, _, kind, slot in self._iter_records():
+            if kind in _BLOB_KINDS:
+                key = slot.hex()
+                refs[key] = refs.get(key, 0) + 1
+        self._blob_refs = refs
+        self._blobs = {k: v for k, v in self._blobs.items() if k in refs}
+
+    async def async_close(self) -> None:
+        if self._mm is None:
+            return
+        self._blob_save_pending = False
+        await self._blob_store.async_save(self._blobs_to_save())
+        await self._hass.async_add_executor_job(self._close)
+
+    def _close(self) -> None:
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+        self._mm = None
+        self._file = None
+
+    def _write_header(self) -> None:
+        _HEADER.pack_into(
+            self._mm, 0, _MAGIC, _VERSION, _RECORD.size,
+            self.capacity, self._head, self._count,
+        )
+
+    # ------------------------------------------------------------------
+    # write
+    # ------------------------------------------------------------------
+
+    def record(self, timestamp: float, dp_id: int, value: Any) -> None:
+        """Append one value change. Oldest record is overwritten when full."""
+        if self._mm is None:
+            return
+        kind, slot = self._encode(value)
+        offset = _HEADER.size + self._head * _RECORD.size
+        old_kind, old_slot = None, None
+        if self._count == self.capacity:
+            _, _, old_kind, old_slot = _RECORD.unpack_from(self._mm, offset)
+        _RECORD.pack_into(self._mm, offset, timestamp, dp_id, kind, slot)
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        self._write_header()
+        # New reference first: overwriting a record with the same blob
+        # must not drop it.
+        if kind in _BLOB_KINDS:
+            key = slot.hex()
+            self._blob_refs[key] = self._blob_refs.get(key, 0) + 1
+        if old_kind in _BLOB_KINDS:
+            self._release_blob(old_slot.hex())
+
+    def _encode(self, value: Any) -> tuple[int, bytes]:
+        if value is None:
+            return _KIND_NONE, bytes(8)
+        if isinstance(value, bool):
+            return _KIND_BOOL, _INT64.pack(int(value))
+        if isinstance(value, int) and -(2 ** 63) <= value < 2 ** 63:
+            return _KIND_INT, _INT64.pack(value)
+        if isinstance(value, float):
+            return _KIND_FLOAT, _FLOAT64.pack(value)
+        if isinstance(value, str):
+            kind, text = _KIND_STR, value
+        else:
+            kind, text = _KIND_JSON, json.dumps(value, separators=(",", ":"), default=str)
+        digest = _blob_hash(text)
+        key = digest.hex()
+        if key not in self._blobs:
+            self._blobs[key] = text
+            self._schedule_blob_save()
+        return kind, digest
+
+    def _release_blob(self, key: str) -> None:
+        refs = self._blob_refs.get(key, 0) - 1
+        if refs > 0:
+            self._blob_refs[key] = refs
+            return
+        self._blob_refs.pop(key, None)
+        if self._blobs.pop(key, None) is not None:
+            self._schedule_blob_save()
+
+    def _schedule_blob_save(self) -> None:
+        if self._blob_save_pending:
+            return
+        self._blob_save_pending = True
+        self._blob_store.async_delay_save(self._blobs_for_delayed_save, BLOB_SAVE_DELAY)
+
+    def _blobs_for_delayed_save(self) -> dict[str, str]:
+        self._blob_save_pending = False
+        return self._blobs_to_save()
+
+    def _blobs_to_save(self) -> dict[str, str]:
+        # A copy: the store serializes it off the event loop.
+        return dict(self._blobs)
+
+    # ------------------------------------------------------------------
+    # read
+    # ------------------------------------------------------------------
+
+    def _iter_records(self, ring: tuple[bytes, int, int] | None = None
+                      ) -> Iterable[tuple[float, int, int, bytes]]:
+        """Records oldest → newest, of the live map or of a (buffer,
+        head, count) copy."""
+        if ring is None:
+            if self._mm is None:
+                return
+            ring = (self._mm, self._head, self._count)
+        buf, head, count = ring
+        start = (head - count) % self.capacity
+        for i in range(count):
+            index = (start + i) % self.capacity
+            yield _RECORD.unpack_from(buf, _HEADER.size + index * _RECORD.size)
+
+    @staticmethod
+    def _decode(kind: int, slot: bytes, blobs: dict[str, str]) -> Any:
+        if kind == _KIND_BOOL:
+            return bool(_INT64.unpack(slot)[0])
+        if kind == _KIND_INT:
+            return _INT64.unpack(slot)[0]
+        if kind == _KIND_FLOAT:
+            return _FLOAT64.unpack(slot)[0]
+        if kind in _BLOB_KINDS:
+            text = blobs.get(slot.hex())
+            if text is None or kind == _KIND_STR:
+                return text
+            return json.loads(text)
+        return None
+
+    def query_job(self, start: float | None = None, end: float | None = None,
+                  dp_ids: Iterable[int] | None = None) -> Callable[[], list[dict[str, Any]]]:
+        """Records with start <= timestamp <= end (epoch seconds), oldest
+        first — as a job for the executor.
+
+        Scanning the full ring (and json.loads on blobs) is too slow for
+        the event loop, but record() keeps writing to the map meanwhile.
+        The ring and blob table are copied here, on the loop, and the
+        returned callable only reads the copies.
+        """
+        if self._mm is None:
+            return list
+        ring = (bytes(self._mm), self._head, self._count)
+        blobs = dict(self._blobs)
+        return partial(self._query, ring, blobs, start, end, dp_ids)
+
+    def _query(self, ring: tuple[bytes, int, int], blobs: dict[str, str],
+               start: float | None, end: float | None,
+               dp_ids: Iterable[int] | None) -> list[dict[str, Any]]:
+        wanted = set(dp_ids) if dp_ids else None
+        result = []
+        for timestamp, dp_id, kind, slot in self._iter_records(ring):
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp > end:
+                continue
+            if wanted is not None and dp_id not in wanted:
+                continue
+            result.append({
+                "timestamp": timestamp,
+                "dp_id": dp_id,
+                "value": self._decode(kind, slot, blobs),
+            })
+        return result
+
+    @property
+    def count(self) -> int:
+        return self._count
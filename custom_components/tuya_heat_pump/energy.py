@@ -0,0 +1,145 @@
+"""Energy accumulator behind the calculated `total_energy` sensor.
+
+Integrates a power reading (W) into a running total (Wh) sample by
+sample, as coordinator updates arrive. Two things the old in-entity
+integration got wrong are handled here:
+
+  - Gaps: if updates stop (device offline, cloud outage) the next
+    sample would otherwise multiply the last known power by the whole
+    outage. The interval is capped at `max_gap` seconds instead. A
+    restart is a gap nothing was measured in at all, so only the total
+    is restored and integration starts a fresh segment.
+  - Persistence: the total is saved to HA storage (throttled writes)
+    rather than relying only on RestoreEntity, which is written at
+    shutdown and lost on a crash.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+INTEGRATION_LEFT = "left"
+INTEGRATION_TRAPEZOIDAL = "trapezoidal"
+INTEGRATION_METHODS = (INTEGRATION_LEFT, INTEGRATION_TRAPEZOIDAL)
+
+# Longest interval (seconds) a single sample pair may cover. Local pushes
+# arrive every few seconds and cloud polls every few minutes, so anything
+# far beyond that means updates actually stopped.
+DEFAULT_MAX_GAP = 900
+
+STORAGE_VERSION = 1
+# Storage writes are throttled: a sample schedules a write SAVE_DELAY
+# seconds out unless one is already scheduled, so there is at most one
+# write per SAVE_DELAY no matter how often samples come in. (Re-arming
+# Store.async_delay_save on every sample would push the write back
+# forever on a busy device.)
+SAVE_DELAY = 60
+
+
+class EnergyAccumulator:
+    """Running power → energy integral with capped gaps and persistence."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        method: str = INTEGRATION_LEFT,
+        max_gap: float = DEFAULT_MAX_GAP,
+    ) -> None:
+        if method not in INTEGRATION_METHODS:
+            _LOGGER.warning(
+                "Unknown integration_method %s, falling back to %s",
+                method, INTEGRATION_LEFT,
+            )
+            method = INTEGRATION_LEFT
+        self._store: Store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.energy.{entry_id}")
+        self.method = method
+        self.max_gap = float(max_gap)
+        self.total_wh = 0.0
+        self._last_power: float | None = None
+        self._last_time: datetime | None = None
+        self._save_pending = False
+
+    async def async_load(self) -> bool:
+        """Load the persisted accumulator. Returns False if nothing was saved."""
+        stored = await self._store.async_load()
+        if not stored:
+            return False
+        try:
+            self.total_wh = float(stored["total_wh"])
+        except (KeyError, TypeError, ValueError) as err:
+            _LOGGER.warning("Ignoring unreadable energy storage: %s", err)
+            return False
+        # The pre-shutdown sample isn't restored: integrating it up to the
+        # first new sample would book power for time nothing was measured.
+        self._last_power = None
+        self._last_time = None
+        return True
+
+    def restore_total(self, total_wh: float) -> None:
+        """Seed the total from somewhere else (RestoreEntity fallback)."""
+        self.total_wh = total_wh
+
+    def add_sample(self, power_w: float | None, now: datetime) -> float:
+        """Feed one power sample; returns the Wh added by it.
+
+        A None sample (no voltage/current available) breaks the integral —
+        nothing is integrated across it in either direction.
+        """
+        increment = 0.0
+        if (
+            power_w is not None
+            and self._last_power is not None
+            and self._last_time is not None
+        ):
+            seconds = (now - self._last_time).total_seconds()
+            if seconds > self.max_gap:
+                _LOGGER.debug(
+                    "Energy sample gap %.0fs exceeds max_gap, capping at %.0fs",
+                    seconds, self.max_gap,
+                )
+                seconds = self.max_gap
+            if seconds > 0:
+                if self.method == INTEGRATION_TRAPEZOIDAL:
+                    average = (self._last_power + power_w) / 2.0
+                else:
+                    average = self._last_power
+                if average > 0:
+                    increment = average * seconds / 3600.0
+                    self.total_wh += increment
+        self._last_power = power_w
+        self._last_time = now
+        return increment
+
+    def _data_to_save(self) -> dict[str, Any]:
+        return {"total_wh": self.total_wh}
+
+    def _data_for_delayed_save(self) -> dict[str, Any]:
+        self._save_pending = False
+        return self._data_to_save()
+
+    def async_schedule_save(self) -> None:
+        """Persist within SAVE_DELAY; calls while a write is pending are no-ops."""
+        if self._save_pending:
+            return
+        self._save_pending = True
+        self._store.async_delay_save(self._data_for_delayed_save, SAVE_DELAY)
+
+    async def async_save(self) -> None:
+        """Persist immediately (entity removal / shutdown)."""
+        # async_save cancels a pending delayed write.
+        self._save_pending = False
+        await self._store.async_save(self._data_to_save())
+
+
+async def async_remove_energy(hass: HomeAssistant, entry_id: str) -> None:
+    """Delete the stored accumulator of a removed config entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.energy.{entry_id}").async_remove()
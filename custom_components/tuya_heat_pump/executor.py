@@ -0,0 +1,141 @@
+"""Dedicated, bounded thread pool for one device's blocking I/O.
+
+tinytuya calls (status/receive/heartbeat/set_value) and the cloud
+`requests` calls are blocking, and a tinytuya socket call can hang
+forever despite its own timeouts when the device drops off the network
+(see the comment above `_local_socket_lock` in coordinator.py). On
+Home Assistant's shared executor every such hang permanently takes a
+worker away from the rest of HA.
+
+Each coordinator runs its blocking calls here instead:
+
+  - a small, named pool per device ("tuya_heat_pump_<device>_N" in
+    thread dumps), so a misbehaving heat pump can only ever tie up its
+    own threads;
+  - every call has a deadline. A call that exceeds it is reported to
+    the owner (on_hung), which marks the device degraded and replaces
+    the tinytuya.Device, and the caller gets a TimeoutError straight
+    away instead of waiting on the stuck thread;
+  - a thread stuck in a call can't be killed, so it is counted as hung
+    until the call returns (if ever). Once every worker is hung the
+    pool is replaced so new calls still run, and past MAX_HUNG_THREADS
+    new calls are refused outright — the leak stays bounded;
+  - pools are HA's InterruptibleThreadPoolExecutor. Plain
+    ThreadPoolExecutor workers are joined at interpreter exit, so one
+    hung call would block HA from shutting down. On shutdown, threads
+    still stuck are given a bounded join and then interrupted.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util.executor import InterruptibleThreadPoolExecutor
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+# Total threads this device may have stuck in calls before we stop
+# handing it new ones.
+MAX_HUNG_THREADS = 8
+
+
+class DeviceExecutor:
+    """Bounded per-device executor with per-call deadlines."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        name: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        on_hung: Callable[[str], None] | None = None,
+    ) -> None:
+        self._hass = hass
+        self._name = name
+        self._max_workers = max_workers
+        self._on_hung = on_hung
+        self._pool = self._new_pool()
+        # Calls past their deadline that haven't returned yet, per pool.
+        self._hung: dict[asyncio.Future, InterruptibleThreadPoolExecutor] = {}
+        self.hung_total = 0
+        self.pool_restarts = 0
+        self._closed = False
+
+    def _new_pool(self) -> InterruptibleThreadPoolExecutor:
+        return InterruptibleThreadPoolExecutor(
+            max_workers=self._max_workers,
+            thread_name_prefix=f"tuya_heat_pump_{self._name}",
+        )
+
+    @property
+    def hung_threads(self) -> int:
+        return len(self._hung)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hung_threads": self.hung_threads,
+            "hung_total": self.hung_total,
+            "pool_restarts": self.pool_restarts,
+        }
+
+    async def run(self, func: Callable[..., Any], *args: Any,
+                  deadline: float, label: str | None = None) -> Any:
+        """Run func(*args) on the device pool; TimeoutError after `deadline` s."""
+        if self._closed:
+            raise RuntimeError("Device executor is shut down")
+        if len(self._hung) >= MAX_HUNG_THREADS:
+            raise TimeoutError(
+                f"{len(self._hung)} calls still hung on this device — refusing new ones"
+            )
+        pool = self._pool
+        future = asyncio.get_running_loop().run_in_executor(pool, func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), deadline)
+        except asyncio.TimeoutError:
+            label = label or getattr(func, "__name__", "call")
+            self._mark_hung(future, pool, label, deadline)
+            raise TimeoutError(f"{label} exceeded its {deadline:.0f}s deadline") from None
+
+    def _mark_hung(self, future: asyncio.Future, pool: InterruptibleThreadPoolExecutor,
+                   label: str, deadline: float) -> None:
+        self._hung[future] = pool
+        self.hung_total += 1
+        future.add_done_callback(self._release_hung)
+        _LOGGER.warning(
+            "[%s] %s still running after %.0fs — treating its thread as hung "
+            "(%d hung now)", self._name, label, deadline, len(self._hung),
+        )
+        hung_in_pool = sum(1 for p in self._hung.values() if p is pool)
+        if pool is self._pool and hung_in_pool >= self._max_workers:
+            # Every worker of the current pool is stuck; new calls would
+            # only queue behind them. Start a fresh pool and let the old
+            # one's threads finish (or not) on their own.
+            _LOGGER.warning("[%s] all workers hung, replacing thread pool", self._name)
+            self._pool = self._new_pool()
+            self.pool_restarts += 1
+            pool.shutdown(join_threads_or_timeout=False)
+        if self._on_hung is not None:
+            self._on_hung(label)
+
+    def _release_hung(self, future: asyncio.Future) -> None:
+        if self._hung.pop(future, None) is not None:
+            _LOGGER.info("[%s] a hung call finally returned (%d still hung)",
+                         self._name, len(self._hung))
+
+    def shutdown(self) -> None:
+        """Stop accepting calls; running ones are not waited for."""
+        self._closed = True
+        self._pool.shutdown(join_threads_or_timeout=False)
+        pools = {self._pool, *self._hung.values()}
+        if self._hung:
+            # Joining (and then interrupting) stuck threads takes up to
+            # EXECUTOR_SHUTDOWN_TIMEOUT; don't do that on the event loop.
+            self._hass.async_add_executor_job(_join_or_interrupt, pools)
+
+
+def _join_or_interrupt(pools: set[InterruptibleThreadPoolExecutor]) -> None:
+    for pool in pools:
+        pool.join_threads_or_timeout()
@@ -0,0 +1,262 @@
+"""HA side of the optional out-of-process LAN worker (lan_worker.py).
+
+With the `lan_worker` local option enabled, a coordinator doesn't open
+its own tinytuya socket. Instead one worker process per HA instance
+hosts the connections of every such device; this module spawns and
+supervises it and multiplexes the devices over a single Unix socket.
+
+Supervision: if the process exits, or a request to it misses its
+deadline (a tinytuya call stuck inside the worker), the worker is
+killed and started again, and every registered device is re-added.
+In-flight requests fail with an error the coordinator already handles
+like any other local I/O failure (the next poll retries). Restarts are
+serialized: a lost connection and a missed deadline noticed at the same
+time lead to one restart, not two racing ones.
+
+The Unix socket lives in a private directory (tempfile.mkdtemp, mode
+0700), so other local users can neither connect to the worker nor
+plant a file at its path.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+from .lan_worker import encode_frame, read_frame
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_LAN_GATEWAY = f"{DOMAIN}_lan_gateway"
+WORKER_PATH = os.path.join(os.path.dirname(__file__), "lan_worker.py")
+CONNECT_TIMEOUT = 10
+RESTART_BACKOFF_MAX = 60
+
+
+class LanGateway:
+    """Spawns the LAN worker and routes requests/pushes for all devices."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        # Private directory for the worker socket, created on first start.
+        self._socket_dir: str | None = None
+        # dev_id → (add message, push callback)
+        self._devices: dict[str, tuple[dict, Callable[[dict], None]]] = {}
+        self._process: asyncio.subprocess.Process | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._stderr_task: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._req_ids = itertools.count(1)
+        self._start_lock = asyncio.Lock()
+        self._restart_task: asyncio.Task | None = None
+        self._backoff = 1.0
+        self._stopping = False
+        self.restarts = 0
+
+    @classmethod
+    def get(cls, hass: HomeAssistant) -> LanGateway:
+        gateway = hass.data.get(DATA_LAN_GATEWAY)
+        if gateway is None:
+            gateway = hass.data[DATA_LAN_GATEWAY] = cls(hass)
+        return gateway
+
+    # ------------------------------------------------------------------
+    # Process lifecycle
+    # ------------------------------------------------------------------
+
+    @property
+    def _socket_path(self) -> str:
+        assert self._socket_dir is not None
+        return os.path.join(self._socket_dir, "lan_worker.sock")
+
+    async def _async_ensure_running(self) -> None:
+        async with self._start_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._stopping = False
+            if self._socket_dir is None:
+                self._socket_dir = await self._hass.async_add_executor_job(
+                    lambda: tempfile.mkdtemp(prefix=f"{DOMAIN}_")
+                )
+            # -P: don't put the script's directory (this package) first
+            # on sys.path — our select.py would shadow the stdlib module.
+            # PYTHONPATH: HA may have installed tinytuya somewhere only
+            # its own sys.path knows about (deps dir).
+            env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)}
+            self._process = await asyncio.create_subprocess_exec(
+                sys.executable, "-P", WORKER_PATH, self._socket_path,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+            )
+            self._stderr_task = self._hass.async_create_background_task(
+                self._pipe_stderr(self._process), "tuya_heat_pump lan worker log"
+            )
+            deadline = asyncio.get_running_loop().time() + CONNECT_TIMEOUT
+            while True:
+                try:
+                    reader, self._writer = await asyncio.open_unix_connection(self._socket_path)
+                    break
+                except OSError:
+                    if asyncio.get_running_loop().time() > deadline or self._process.returncode is not None:
+                        await self._async_kill()
+                        raise ConnectionError("LAN worker did not come up")
+                    await asyncio.sleep(0.2)
+            _LOGGER.info("LAN worker started (pid %s)", self._process.pid)
+            self._reader_task = self._hass.async_create_background_task(
+                self._read_loop(reader), "tuya_heat_pump lan worker reader"
+            )
+            for message, _ in self._devices.values():
+                self._writer.write(encode_frame(message))
+
+    async def _pipe_stderr(self, process: asyncio.subprocess.Process) -> None:
+        assert process.stderr is not None
+        while line := await process.stderr.readline():
+            _LOGGER.debug("lan_worker: %s", line.decode(errors="replace").rstrip())
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                message = await read_frame(reader)
+                op = message.get("op")
+                if op == "push":
+                    entry = self._devices.get(message.get("id"))
+                    if entry is not None:
+                        entry[1](message.get("dps") or {})
+                elif op == "reply":
+                    future = self._pending.pop(message.get("req"), None)
+                    if future is not None and not future.done():
+                        if message.get("ok"):
+                            future.set_result(message.get("result"))
+                        else:
+                            future.set_exception(RuntimeError(message.get("error")))
+        except asyncio.CancelledError:
+            # _async_kill: whoever killed the worker takes care of it.
+            self._fail_pending(ConnectionError("LAN worker stopped"))
+            raise
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as err:
+            if not self._stopping:
+                _LOGGER.warning("LAN worker connection lost: %s", err)
+        self._fail_pending(ConnectionError("LAN worker connection lost"))
+        if not self._stopping:
+            self._schedule_restart()
+
+    def _fail_pending(self, err: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(err)
+
+    async def _async_kill(self) -> None:
+        reader_task, self._reader_task = self._reader_task, None
+        if reader_task is not None and reader_task is not asyncio.current_task():
+            reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            process.kill()
+            with contextlib.suppress(Exception):
+                await process.wait()
+
+    @callback
+    def _schedule_restart(self) -> None:
+        """Start a restart unless one is already running."""
+        if self._stopping or (self._restart_task is not None and not self._restart_task.done()):
+            return
+        self._restart_task = self._hass.async_create_background_task(
+            self._async_restart(), "tuya_heat_pump lan worker restart"
+        )
+
+    async def _async_restart(self) -> None:
+        """Kill and respawn the worker, re-adding every device."""
+        self.restarts += 1
+        await self._async_kill()
+        while self._devices and not self._stopping:
+            delay, self._backoff = self._backoff, min(self._backoff * 2, RESTART_BACKOFF_MAX)
+            _LOGGER.warning("Restarting LAN worker in %.0fs", delay)
+            await asyncio.sleep(delay)
+            try:
+                await self._async_ensure_running()
+            except Exception as err:
+                _LOGGER.error("LAN worker restart failed: %s", err)
+                continue
+            self._backoff = 1.0
+            return
+
+    async def _async_stop(self) -> None:
+        self._stopping = True
+        restart_task, self._restart_task = self._restart_task, None
+        if restart_task is not None and restart_task is not asyncio.current_task():
+            restart_task.cancel()
+        await self._async_kill()
+        self._hass.data.pop(DATA_LAN_GATEWAY, None)
+        socket_dir, self._socket_dir = self._socket_dir, None
+        if socket_dir is not None:
+            await self._hass.async_add_executor_job(
+                lambda: shutil.rmtree(socket_dir, ignore_errors=True)
+            )
+
+    # ------------------------------------------------------------------
+    # Device API (used by the coordinator)
+    # ------------------------------------------------------------------
+
+    async def async_add_device(self, dev_id: str, ip: str, local_key: str,
+                               version: float, on_push: Callable[[dict], None]) -> None:
+        message = {"op": "add", "id": dev_id, "ip": ip, "key": local_key, "version": version}
+        running = self._writer is not None and not self._writer.is_closing()
+        self._devices[dev_id] = (message, on_push)
+        if running:
+            self._writer.write(encode_frame(message))
+        else:
+            # Starting the worker sends the add of every registered device.
+            await self._async_ensure_running()
+
+    async def async_remove_device(self, dev_id: str) -> None:
+        if self._devices.pop(dev_id, None) is None:
+            return
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(encode_frame({"op": "remove", "id": dev_id}))
+        if not self._devices:
+            await self._async_stop()
+
+    async def async_request(self, message: dict[str, Any], deadline: float) -> Any:
+        """Send a request and wait for its reply; a missed deadline
+        restarts the worker (a stuck tinytuya call inside it)."""
+        await self._async_ensure_running()
+        req = next(self._req_ids)
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[req] = future
+        assert self._writer is not None
+        self._writer.write(encode_frame({**message, "req": req}))
+        try:
+            return await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError:
+            self._pending.pop(req, None)
+            _LOGGER.warning(
+                "LAN worker: %s for %s missed its %.0fs deadline — restarting worker",
+                message.get("op"), message.get("id"), deadline,
+            )
+            self._schedule_restart()
+            raise TimeoutError(f"LAN worker {message.get('op')} timed out") from None
+
+    async def async_status(self, dev_id: str, deadline: float) -> Any:
+        return await self.async_request({"op": "status", "id": dev_id}, deadline)
+
+    async def async_set_values(self, dev_id: str, dps: dict[int, Any], deadline: float) -> Any:
+        return await self.async_request(
+            {"op": "set", "id": dev_id, "dps": {str(k): v for k, v in dps.items()}},
+            deadline,
+        )
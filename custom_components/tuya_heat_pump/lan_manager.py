@@ -0,0 +1,308 @@
+"""Integration-wide connection manager for in-process local devices.
+
+Every local config entry used to run its own listener task (a receive()
+round-trip through the executor every ~150 ms, even when the device had
+nothing to say) plus its own heartbeat task. With many local units that
+is a constant stream of executor hops that grows with the number of
+devices.
+
+Instead, one manager thread serves all of them:
+
+  - a single selector over every device's persistent tinytuya socket.
+    A readable socket is drained without blocking by a per-device
+    lan_worker.FrameReader, so a partial frame, or one that a concurrent
+    status() already consumed, never parks the shared thread in a
+    blocking receive(). The decoded DPS is handed to the owning
+    coordinator on the event loop (call_soon_threadsafe);
+  - heartbeats for all devices on one timer heap, sent with nowait so
+    the reply is picked up by the selector like any other frame;
+  - devices without a connected socket (offline, just created, or
+    replaced after a hung call — see coordinator._async_replace_local_device)
+    are (re)connected on a small separate pool with backoff, so one
+    unreachable unit's connect timeout never stalls the shared thread.
+
+Coordinators keep their own lock and tinytuya.Device; the manager only
+borrows them (via the getter given to register) for the duration of a
+non-blocking read or heartbeat, using the same acquire timeout rules.
+A socket whose lock is busy is taken out of the selector until the lock
+is free again: the selector is level-triggered, so leaving it in would
+wake the thread over and over for as long as the other call runs.
+
+Push updates are an optimization on top of the periodic status() poll,
+so errors here are logged at debug level and retried later.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import selectors
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util.executor import InterruptibleThreadPoolExecutor
+
+from .const import DOMAIN
+from .lan_worker import FrameReader
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_LAN_MANAGER = f"{DOMAIN}_lan_manager"
+HEARTBEAT_INTERVAL = 5
+RECONNECT_BACKOFF_MIN = 5
+RECONNECT_BACKOFF_MAX = 120
+# The manager thread never waits long for a device lock: if a status()
+# or set_value() holds it, that call reads the pending frame itself.
+LOCK_TIMEOUT = 0.2
+# How often a paused socket (lock held elsewhere) checks whether the
+# lock is free again.
+PAUSE_POLL = 0.1
+
+
+@dataclass
+class _Managed:
+    key: str
+    getter: Callable[[], tuple[Any, threading.Lock]]
+    on_push: Callable[[dict], None]
+    sock: Any = None
+    connecting: bool = False
+    backoff: float = RECONNECT_BACKOFF_MIN
+    retry_at: float = 0.0
+    removed: bool = False
+    # Unregistered from the selector while another call holds the lock.
+    paused: bool = False
+    heartbeats: int = field(default=0)
+    reader: FrameReader = field(default_factory=FrameReader)
+
+
+class LanConnectionManager:
+    """One selector thread for all in-process local device sockets."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self._devices: dict[str, _Managed] = {}
+        self._selector = selectors.DefaultSelector()
+        self._waker_r, self._waker_w = socket.socketpair()
+        self._waker_r.setblocking(False)
+        self._selector.register(self._waker_r, selectors.EVENT_READ, None)
+        self._timers: list[tuple[float, int, str]] = []
+        self._timer_seq = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = False
+        # Interruptible: a connect stuck in tinytuya must not keep HA
+        # from exiting (see executor.py).
+        self._connect_pool = InterruptibleThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="tuya_heat_pump_lan_connect"
+        )
+        self.frames = 0
+
+    @classmethod
+    def get(cls, hass: HomeAssistant) -> LanConnectionManager:
+        manager = hass.data.get(DATA_LAN_MANAGER)
+        if manager is None:
+            manager = hass.data[DATA_LAN_MANAGER] = cls(hass)
+        return manager
+
+    # ------------------------------------------------------------------
+    # Registration (event loop side)
+    # ------------------------------------------------------------------
+
+    def register(self, key: str, getter: Callable[[], tuple[Any, threading.Lock]],
+                 on_push: Callable[[dict], None]) -> None:
+        with self._lock:
+            self._devices[key] = _Managed(key, getter, on_push)
+            self._schedule(key, 0)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="tuya_heat_pump_lan_manager", daemon=True
+                )
+                self._thread.start()
+        self._wake()
+
+    def unregister(self, key: str) -> None:
+        with self._lock:
+            entry = self._devices.pop(key, None)
+            if entry is not None:
+                entry.removed = True
+            if not self._devices:
+                self._stop = True
+        self._wake()
+        if self._stop:
+            # A stopped manager is not reused; the next register() goes
+            # through get() and starts a fresh one.
+            self._connect_pool.shutdown(join_threads_or_timeout=False)
+            self._hass.async_add_executor_job(
+                self._connect_pool.join_threads_or_timeout
+            )
+            if self._hass.data.get(DATA_LAN_MANAGER) is self:
+                self._hass.data.pop(DATA_LAN_MANAGER)
+
+    def _wake(self) -> None:
+        try:
+            self._waker_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _schedule(self, key: str, delay: float) -> None:
+        self._timer_seq += 1
+        heapq.heappush(self._timers, (time.monotonic() + delay, self._timer_seq, key))
+
+    # ------------------------------------------------------------------
+    # Manager thread
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        _LOGGER.debug("LAN connection manager started")
+        try:
+            while True:
+                with self._lock:
+                    if self._stop:
+                        return
+                    devices = list(self._devices.values())
+                    next_due = self._timers[0][0] if self._timers else None
+                for entry in devices:
+                    self._sync_socket(entry)
+                timeout = 1.0 if next_due is None else max(0.0, min(1.0, next_due - time.monotonic()))
+                if any(entry.paused for entry in devices):
+                    timeout = min(timeout, PAUSE_POLL)
+                for key, _ in self._selector.select(timeout):
+                    if key.data is None:
+                        try:
+                            while self._waker_r.recv(256):
+                                pass
+                        except (BlockingIOError, OSError):
+                            pass
+                        continue
+                    self._read(key.data)
+                self._run_timers()
+        finally:
+            for key in list(self._selector.get_map().values()):
+                if key.data is not None:
+                    self._selector.unregister(key.fileobj)
+            self._selector.close()
+            self._waker_r.close()
+            self._waker_w.close()
+            _LOGGER.debug("LAN connection manager stopped")
+
+    def _sync_socket(self, entry: _Managed) -> None:
+        """Track socket replacement (reconnects, device recreation)."""
+        try:
+            device, lock = entry.getter()
+        except Exception:
+            device = lock = None
+        sock = getattr(device, "socket", None) if device is not None else None
+        if sock is entry.sock:
+            if entry.paused and sock is not None and not lock.locked():
+                self._resume(entry)
+            return
+        entry.paused = False
+        if entry.sock is not None:
+            try:
+                self._selector.unregister(entry.sock)
+            except (KeyError, ValueError, OSError):
+                pass
+        entry.sock = None
+        if sock is not None:
+            try:
+                self._selector.register(sock, selectors.EVENT_READ, entry)
+                entry.sock = sock
+                entry.backoff = RECONNECT_BACKOFF_MIN
+            except (KeyError, ValueError, OSError):
+                pass
+
+    def _pause(self, entry: _Managed) -> None:
+        try:
+            self._selector.unregister(entry.sock)
+        except (KeyError, ValueError, OSError):
+            pass
+        entry.paused = True
+
+    def _resume(self, entry: _Managed) -> None:
+        entry.paused = False
+        try:
+            self._selector.register(entry.sock, selectors.EVENT_READ, entry)
+        except (KeyError, ValueError, OSError):
+            entry.sock = None  # picked up again by the next _sync_socket
+
+    def _read(self, entry: _Managed) -> None:
+        device, lock = entry.getter()
+        if not lock.acquire(blocking=False):
+            # status()/set_value() owns the socket and reads the frame;
+            # re-armed by _sync_socket once the lock is free.
+            self._pause(entry)
+            return
+        try:
+            pushes = entry.reader.read(device)
+        finally:
+            lock.release()
+        for dps in pushes:
+            self.frames += 1
+            self._hass.loop.call_soon_threadsafe(entry.on_push, dps)
+
+    def _run_timers(self) -> None:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._timers or self._timers[0][0] > now:
+                    return
+                _, _, key = heapq.heappop(self._timers)
+                entry = self._devices.get(key)
+            if entry is None:
+                continue
+            if entry.sock is None:
+                self._connect_later(entry, now)
+            else:
+                self._heartbeat(entry)
+            with self._lock:
+                if not entry.removed:
+                    self._schedule(key, HEARTBEAT_INTERVAL)
+
+    def _heartbeat(self, entry: _Managed) -> None:
+        device, lock = entry.getter()
+        if not lock.acquire(timeout=LOCK_TIMEOUT):
+            return  # busy: something else is talking to it anyway
+        try:
+            device.heartbeat(nowait=True)
+            entry.heartbeats += 1
+        except Exception as err:
+            _LOGGER.debug("LAN heartbeat failed for %s: %s", entry.key, err)
+        finally:
+            lock.release()
+
+    def _connect_later(self, entry: _Managed, now: float) -> None:
+        if entry.connecting or now < entry.retry_at:
+            return
+        entry.connecting = True
+
+        def _connect() -> None:
+            try:
+                device, lock = entry.getter()
+                if lock.acquire(timeout=4):
+                    try:
+                        # A heartbeat is the cheapest call that opens
+                        # the persistent socket.
+                        device.heartbeat()
+                    finally:
+                        lock.release()
+            except Exception as err:
+                _LOGGER.debug("LAN connect failed for %s: %s", entry.key, err)
+            finally:
+                if getattr(entry.getter()[0], "socket", None) is None:
+                    entry.retry_at = time.monotonic() + entry.backoff
+                    entry.backoff = min(entry.backoff * 2, RECONNECT_BACKOFF_MAX)
+                entry.connecting = False
+                self._wake()
+
+        self._connect_pool.submit(_connect)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "devices": len(self._devices),
+            "connected": sum(1 for e in self._devices.values() if e.sock is not None),
+            "frames": self.frames,
+        }
@@ -0,0 +1,375 @@
+"""Out-of-process LAN worker: hosts the tinytuya connections of all
+local devices outside the Home Assistant process.
+
+lan_gateway.py starts it as
+
+    python lan_worker.py <unix socket path>
+
+and talks to it over that socket. The integration also imports this
+module for the pieces both sides share: the frame helpers
+(encode_frame/read_frame, used by lan_gateway.py) and FrameReader (used
+by lan_manager.py). It depends only on the standard library and
+tinytuya, so it runs with the same interpreter HA uses.
+
+Pushed frames are read by the worker's event loop itself: every
+device's socket is watched with add_reader and drained without blocking
+by a FrameReader. Pool threads are only used for requests (status, set)
+and heartbeats, never to sit in receive() waiting for a push.
+
+A tinytuya call that hangs (see the comment above `_local_socket_lock`
+in coordinator.py) can't be cancelled in-process. Here it only ties up
+a thread of this worker; the gateway notices the missed deadline and
+restarts the whole worker, which costs a reconnect of the LAN devices
+and nothing in HA.
+
+Protocol: every frame is a 4-byte big-endian length followed by that
+many bytes of UTF-8 JSON, one object per frame.
+
+  HA → worker
+    {"op": "add", "id": dev_id, "ip": ..., "key": ..., "version": 3.4}
+    {"op": "remove", "id": dev_id}
+    {"op": "status", "id": dev_id, "req": n}
+    {"op": "set", "id": dev_id, "dps": {"101": 45}, "req": n}
+    {"op": "ping", "req": n}
+
+  worker → HA
+    {"op": "reply", "req": n, "ok": true, "result": ...}
+    {"op": "reply", "req": n, "ok": false, "error": "..."}
+    {"op": "push", "id": dev_id, "dps": {...}}
+
+The worker exits when the HA side closes the connection.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tinytuya
+
+_LOGGER = logging.getLogger("tuya_heat_pump.lan_worker")
+
+HEADER = struct.Struct(">I")
+MAX_FRAME = 1 << 20
+LOCK_ACQUIRE_TIMEOUT = 4
+HEARTBEAT_INTERVAL = 5
+# Bytes of an unfinished frame are kept this long; after that they are
+# assumed to belong to a reply a request read itself and are dropped.
+PARTIAL_FRAME_TIMEOUT = 2.0
+# A readable socket whose lock is held by a request is looked at again
+# after this long (the reader is level-triggered; retrying at once spins).
+BUSY_RETRY = 0.05
+_FRAME_PREFIXES = (tinytuya.PREFIX_55AA_BIN, tinytuya.PREFIX_6699_BIN)
+_MAX_HEADER_LEN = 18  # 6699 header; 55AA is 16
+
+
+def encode_frame(message: dict) -> bytes:
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict:
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_FRAME:
+        raise ValueError(f"frame too large: {length}")
+    return json.loads(await reader.readexactly(length))
+
+
+class FrameReader:
+    """Non-blocking reader for unsolicited frames on a persistent
+    tinytuya socket.
+
+    tinytuya's receive() blocks until a whole frame arrives. A push
+    reader that only knows "the socket is readable" can't afford that:
+    the bytes may be half a frame, or a concurrent status() may already
+    have consumed them. read() takes whatever is buffered in the kernel,
+    keeps incomplete frames for the next call and decodes complete ones
+    the way tinytuya's _receive() does.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = b""
+        self.since = 0.0
+
+    def read(self, device: tinytuya.Device) -> list[dict]:
+        """DPS of every complete pushed frame; the caller holds the
+        device lock. A closed or broken socket is closed on the device
+        so its owner reconnects."""
+        try:
+            chunk = device.socket.recv(4096, socket.MSG_DONTWAIT)
+        except (BlockingIOError, InterruptedError):
+            return []  # already consumed by whoever held the lock
+        except (AttributeError, OSError) as err:
+            _LOGGER.debug("receive failed for %s: %s", device.id, err)
+            chunk = b""
+        if not chunk:
+            self.buffer = b""
+            device.close()
+            return []
+        now = time.monotonic()
+        if self.buffer and now - self.since > PARTIAL_FRAME_TIMEOUT:
+            self.buffer = b""
+        if not self.buffer:
+            self.since = now
+        self.buffer += chunk
+        return self._decode(device)
+
+    def _decode(self, device: tinytuya.Device) -> list[dict]:
+        pushes = []
+        buf = self.buffer
+        while buf:
+            start = min(
+                (i for i in (buf.find(p) for p in _FRAME_PREFIXES) if i >= 0),
+                default=-1,
+            )
+            if start < 0:
+                # Keep a possible prefix split across reads, drop the rest.
+                buf = buf[-3:]
+                break
+            buf = buf[start:]
+            try:
+                header = tinytuya.parse_header(buf)
+            except tinytuya.DecodeError:
+                if len(buf) < _MAX_HEADER_LEN:
+                    break  # header not complete yet
+                buf = buf[4:]  # corrupt header: resync on the next prefix
+                continue
+            if len(buf) < header.total_length:
+                break
+            frame, buf = buf[:header.total_length], buf[header.total_length:]
+            hmac_key = device.local_key if device.version >= 3.4 else None
+            try:
+                msg = tinytuya.unpack_message(frame, header=header, hmac_key=hmac_key)
+                data = device._process_message(msg)
+            except (tinytuya.DecodeError, ValueError, TypeError, struct.error) as err:
+                _LOGGER.debug("Dropping undecodable frame from %s: %s", device.id, err)
+                continue
+            if data and "dps" in data:
+                pushes.append(data["dps"])
+        self.buffer = buf
+        return pushes
+
+
+class WorkerDevice:
+    """One persistent tinytuya connection, with the same locking rules
+    as the in-process coordinator."""
+
+    def __init__(self, dev_id: str, ip: str, key: str, version: float) -> None:
+        self.dev_id = dev_id
+        self.lock = threading.Lock()
+        try:
+            self.device = tinytuya.Device(
+                dev_id=dev_id, address=ip, local_key=key, version=version,
+                persist=True, connection_timeout=3,
+            )
+        except TypeError:
+            self.device = tinytuya.Device(
+                dev_id=dev_id, address=ip, local_key=key, version=version,
+                persist=True,
+            )
+        self.device.set_socketPersistent(True)
+        self.device.set_socketNODELAY(True)
+        try:
+            self.device.set_socketTimeout(1)
+        except Exception:
+            pass
+        self.reader = FrameReader()
+        # Socket currently registered with the event loop, if any.
+        self.watched: socket.socket | None = None
+        self.resume: asyncio.TimerHandle | None = None
+        self.closed = False
+        self.tasks: list[asyncio.Task] = []
+
+    def locked(self, method: str, *args, **kwargs):
+        if not self.lock.acquire(timeout=LOCK_ACQUIRE_TIMEOUT):
+            raise TimeoutError(f"socket lock busy ({method})")
+        try:
+            return getattr(self.device, method)(*args, **kwargs)
+        finally:
+            self.lock.release()
+
+    def close(self) -> None:
+        self.closed = True
+        for task in self.tasks:
+            task.cancel()
+        if self.resume is not None:
+            self.resume.cancel()
+            self.resume = None
+        try:
+            self.device.close()
+        except Exception:
+            pass
+
+
+class Worker:
+    def __init__(self) -> None:
+        self.devices: dict[str, WorkerDevice] = {}
+        # Threads are cheap here: a hung one only hurts this process.
+        self.pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="lan_worker")
+        self.writer: asyncio.StreamWriter | None = None
+        self.done = asyncio.Event()
+
+    def send(self, message: dict) -> None:
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(encode_frame(message))
+
+    async def call(self, dev: WorkerDevice, method: str, *args, **kwargs):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.pool, functools.partial(dev.locked, method, *args, **kwargs)
+            )
+        finally:
+            # Any call may have (re)connected or dropped the socket.
+            self.watch(dev)
+
+    def watch(self, dev: WorkerDevice) -> None:
+        """Keep the event loop watching the device's current socket."""
+        if dev.resume is not None:
+            return  # paused while a request holds the lock
+        sock = None if dev.closed else dev.device.socket
+        if sock is dev.watched:
+            return
+        self.unwatch(dev)
+        if sock is not None:
+            try:
+                asyncio.get_running_loop().add_reader(sock, self.on_readable, dev)
+                dev.watched = sock
+            except (ValueError, OSError) as err:
+                _LOGGER.debug("can't watch socket of %s: %s", dev.dev_id, err)
+
+    def unwatch(self, dev: WorkerDevice) -> None:
+        if dev.watched is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(dev.watched)
+            except (ValueError, OSError):
+                pass
+            dev.watched = None
+
+    def on_readable(self, dev: WorkerDevice) -> None:
+        if not dev.lock.acquire(blocking=False):
+            # A request owns the socket and reads its own reply.
+            self.unwatch(dev)
+            dev.resume = asyncio.get_running_loop().call_later(
+                BUSY_RETRY, self._resume_watch, dev
+            )
+            return
+        try:
+            pushes = dev.reader.read(dev.device)
+        finally:
+            dev.lock.release()
+        for dps in pushes:
+            self.send({"op": "push", "id": dev.dev_id, "dps": dps})
+        self.watch(dev)
+
+    def _resume_watch(self, dev: WorkerDevice) -> None:
+        dev.resume = None
+        self.watch(dev)
+
+    async def heartbeat(self, dev: WorkerDevice) -> None:
+        while True:
+            try:
+                # Connected: send only, the reply is read by on_readable.
+                # Not connected: a regular heartbeat opens the socket.
+                await self.call(dev, "heartbeat", nowait=dev.device.socket is not None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                _LOGGER.debug("heartbeat failed for %s: %s", dev.dev_id, err)
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def handle(self, message: dict) -> None:
+        op = message.get("op")
+        req = message.get("req")
+        try:
+            if op == "add":
+                dev_id = message["id"]
+                if dev_id in self.devices:
+                    self.remove(self.devices.pop(dev_id))
+                dev = WorkerDevice(dev_id, message["ip"], message["key"], float(message["version"]))
+                dev.tasks = [asyncio.create_task(self.heartbeat(dev))]
+                self.devices[dev_id] = dev
+                result = None
+            elif op == "remove":
+                dev = self.devices.pop(message["id"], None)
+                if dev is not None:
+                    self.remove(dev)
+                result = None
+            elif op == "status":
+                result = await self.call(self.devices[message["id"]], "status")
+            elif op == "set":
+                dev = self.devices[message["id"]]
+                dps = {int(k): v for k, v in message["dps"].items()}
+                if len(dps) == 1:
+                    ((dp_id, value),) = dps.items()
+                    result = await self.call(dev, "set_value", dp_id, value)
+                else:
+                    result = await self.call(dev, "set_multiple_values", dps)
+            elif op == "ping":
+                result = "pong"
+            else:
+                raise ValueError(f"unknown op {op!r}")
+        except Exception as err:
+            if req is not None:
+                self.send({"op": "reply", "req": req, "ok": False, "error": f"{type(err).__name__}: {err}"})
+            return
+        if req is not None:
+            self.send({"op": "reply", "req": req, "ok": True, "result": result})
+
+    def remove(self, dev: WorkerDevice) -> None:
+        self.unwatch(dev)
+        dev.close()
+
+    async def serve_client(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> None:
+        if self.writer is not None:
+            writer.close()  # one HA process per worker
+            return
+        self.writer = writer
+        try:
+            while True:
+                message = await read_frame(reader)
+                asyncio.create_task(self.handle(message))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.done.set()
+
+
+async def main(path: str) -> None:
+    worker = Worker()
+    if os.path.exists(path):
+        os.unlink(path)
+    # The socket must never exist with looser permissions, not even
+    # between bind() and a chmod(). (lan_gateway also puts it in a
+    # private directory.)
+    umask = os.umask(0o077)
+    try:
+        server = await asyncio.start_unix_server(worker.serve_client, path)
+    finally:
+        os.umask(umask)
+    async with server:
+        await worker.done.wait()
+    for dev in worker.devices.values():
+        worker.remove(dev)
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+    # Hung tinytuya threads must not keep the process alive.
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        stream=sys.stderr, level=logging.INFO,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    asyncio.run(main(sys.argv[1]))
@@ -4,11 +4,53 @@ import importlib
 from typing import Dict, Any
 from homeassistant.core import HomeAssistant
 
+from .bitmap import compile_bitmaps
+from .derived import compile_derived
+
 _LOGGER = logging.getLogger(__name__)
 
 # Cache for loaded models
 _MODEL_CACHE = {}
 
+
+def _compile_mapping(mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """Model yüklenirken bir kere yapılan derleme adımları (bitmap
+    tabloları, derived sensör grafiği) — entity'ler okuma sırasında
+    tekrar hesaplamasın."""
+    compile_bitmaps(mapping)
+    compile_derived(mapping)
+    return mapping
+
+
+def collect_required_codes(mapping: Dict[str, Any],
+                           raw_code_by_dp_id: Dict[int, str] = None) -> set:
+    """Model dosyasının GERÇEKTEN ihtiyaç duyduğu Tuya DP kodlarının
+    tam kümesini çıkarır (raw field'larda raw_source, düzlerde code/key).
+    dp_id'si olmayan (hesaplanmış/sanal) entry'ler hariç tutulur.
+
+    raw_source'u yazılmamış raw field'lar için kaynak kod, verilmişse
+    raw_code_by_dp_id üzerinden dp_id ile bulunur; derived sensörlerin
+    girdileri de eklenir (onlar da self.data'dan okunuyor).
+    """
+    raw_code_by_dp_id = raw_code_by_dp_id or {}
+    codes: set = set()
+    for entity_type in ("sensors", "binary_sensors", "switches", "numbers", "selects", "texts"):
+        for key, cfg in mapping.get(entity_type, {}).items():
+            if "dp_id" not in cfg:
+                continue
+            raw_source = cfg.get("raw_source")
+            if not raw_source and "field_index" in cfg:
+                raw_source = raw_code_by_dp_id.get(cfg["dp_id"])
+            if raw_source:
+                codes.add(raw_source)
+            else:
+                codes.add(cfg.get("code", key))
+    graph = mapping.get("_derived_graph")
+    if graph is not None:
+        for node in graph.nodes.values():
+            codes.update(dep for dep in node.inputs if dep not in graph.nodes)
+    return codes
+
 async def async_load_model_mapping(hass: HomeAssistant, model_id: str = None) -> Dict[str, Any]:
     """Load model mapping based on model ID - ASYNC VERSION."""
     # Default model ID if not provided
@@ -46,7 +88,7 @@ async def async_load_model_mapping(hass: HomeAssistant, model_id: str = None) ->
             }
             
             # Cache it
-            _MODEL_CACHE[model_id] = mapping
+            _MODEL_CACHE[model_id] = _compile_mapping(mapping)
             _LOGGER.info("✅ Model mapping loaded: %s", model_id)
             
             return mapping
@@ -101,7 +143,7 @@ def load_model_mapping(model_id: str = None) -> Dict[str, Any]:
                 }
                 
                 _LOGGER.debug("Sync model mapping loaded: %s", model_id)
-                return mapping
+                return _compile_mapping(mapping)
                 
             except ImportError:
                 # models/default.py yok
@@ -123,7 +165,7 @@ def load_model_mapping(model_id: str = None) -> Dict[str, Any]:
             }
             
             _LOGGER.debug("Sync model mapping loaded: %s", model_id)
-            return mapping
+            return _compile_mapping(mapping)
             
         except ImportError:
             # Model not found, try default
@@ -142,7 +184,7 @@ def load_model_mapping(model_id: str = None) -> Dict[str, Any]:
                 }
                 
                 _LOGGER.debug("Sync default mapping loaded for: %s", model_id)
-                return mapping
+                return _compile_mapping(mapping)
                 
             except ImportError:
                 # Nothing found
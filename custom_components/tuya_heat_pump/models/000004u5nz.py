@@ -265,6 +265,9 @@ SENSOR_TYPES = {
         "icon": "mdi:flash",
         "device_class": "power",
         "state_class": "measurement",
+        # Faz başına V × I toplamı (derived.py)
+        "derived": "voltage_current * cur_current + bv * b_cur + cv * c_cur",
+        "precision": 2,
     },
     "countdown_left": {  # Bu sensör olmalı (ro)
         "dp_id": 14,
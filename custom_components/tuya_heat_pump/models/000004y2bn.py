@@ -25,25 +25,23 @@ SENSOR_TYPES = {
         "code": "fault",
         "name": "Fault Description",
         "icon": "mdi:alert-circle",
-        "conversion": (
-            "', '.join(n for b, n in ["
-            "(1,'P01 - Water Tank Lower Temp Sensor Fault'),"
-            "(2,'P02 - Water Tank Upper Temp Sensor Fault'),"
-            "(4,'P03 - Coil Temp Sensor Fault'),"
-            "(8,'P04 - Suction Gas Temp Sensor Fault'),"
-            "(16,'P05 - Ambient Temp Sensor Fault'),"
-            "(32,'P06 - Winter Anti-Freeze Protection'),"
-            "(64,'E01 - High Pressure Protection'),"
-            "(128,'E02 - Low Pressure Protection'),"
-            "(256,'E03 - Overheat Protection'),"
-            "(512,'E08 - Communication Fault'),"
-            "(1024,'EA8 - MCU RAM Fault'),"
-            "(2048,'EA9 - MCU ROM Fault'),"
-            "(4096,'P08 - Reserved'),"
-            "(8192,'P09 - Reserved'),"
-            "(16384,'P07 - Compressor Operating Limit Protection')"
-            "] if value & b) or 'OK'"
-        ),
+        "bitmap": {
+            0: "P01 - Water Tank Lower Temp Sensor Fault",
+            1: "P02 - Water Tank Upper Temp Sensor Fault",
+            2: "P03 - Coil Temp Sensor Fault",
+            3: "P04 - Suction Gas Temp Sensor Fault",
+            4: "P05 - Ambient Temp Sensor Fault",
+            5: "P06 - Winter Anti-Freeze Protection",
+            6: "E01 - High Pressure Protection",
+            7: "E02 - Low Pressure Protection",
+            8: "E03 - Overheat Protection",
+            9: "E08 - Communication Fault",
+            10: "EA8 - MCU RAM Fault",
+            11: "EA9 - MCU ROM Fault",
+            12: "P08 - Reserved",
+            13: "P09 - Reserved",
+            14: "P07 - Compressor Operating Limit Protection",
+        },
     },
 }
 
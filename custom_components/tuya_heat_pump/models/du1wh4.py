@@ -29,40 +29,38 @@ SENSOR_TYPES = {
         "code": "fault",
         "name": "Fault Alarm",
         "icon": "mdi:alert-circle",
-        "conversion": (
-            "', '.join(n for b, n in ["
-            "(1,'Er03 - Water Flow Failure'),"
-            "(2,'Er04 - Antifreeze Protection'),"
-            "(4,'Er05 - High Pressure Fault'),"
-            "(8,'Er06 - Low Pressure Fault'),"
-            "(16,'Er09 - Communication Failure'),"
-            "(32,'Er10 - Frequency Conversion Module Communication Failure'),"
-            "(64,'Er12 - Exhaust Temperature Too High Protection'),"
-            "(128,'Er14 - Water Tank Temperature Sensor Fault'),"
-            "(256,'Er15 - Water Inlet Temperature Sensor Fault'),"
-            "(512,'Er16 - Evaporator Coil Temperature Sensor Fault'),"
-            "(1024,'Er18 - Exhaust Temperature Sensor Fault'),"
-            "(2048,'Er20 - Frequency Conversion Module Abnormal Protection'),"
-            "(4096,'Er21 - Ambient Temperature Sensor Fault'),"
-            "(8192,'Er23 - Cooling Outlet Water Temperature Supercooling Protection'),"
-            "(16384,'Er26 - Heat Sink Temperature Sensor Fault'),"
-            "(32768,'Er27 - Outlet Water Temperature Sensor Fault'),"
-            "(65536,'Er29 - Return Gas Temperature Sensor Fault'),"
-            "(131072,'Er32 - Heating Outlet Water Temperature Too High Protection'),"
-            "(262144,'Er33 - Coil Temperature Too High'),"
-            "(524288,'Er34 - Frequency Conversion Module Temperature Too High'),"
-            "(1048576,'Er42 - Cooling Coil Temperature Sensor Failure'),"
-            "(2097152,'Er62 - Economizer Inlet Temperature Sensor Fault'),"
-            "(4194304,'Er63 - Economizer Outlet Temperature Sensor Fault'),"
-            "(8388608,'Er64 - DC Fan 1 Fault'),"
-            "(16777216,'Er66 - DC Fan 2 Fault'),"
-            "(33554432,'Er67 - Low Pressure Switch Failure'),"
-            "(67108864,'Er68 - High Pressure Switch Failure'),"
-            "(134217728,'Er69 - Low Pressure Protection'),"
-            "(268435456,'Er70 - High Pressure Protection'),"
-            "(536870912,'Er73 - Compressor Discharge Overcurrent Protection')"
-            "] if value & b) or 'OK'"
-        ),
+        "bitmap": {
+            0: "Er03 - Water Flow Failure",
+            1: "Er04 - Antifreeze Protection",
+            2: "Er05 - High Pressure Fault",
+            3: "Er06 - Low Pressure Fault",
+            4: "Er09 - Communication Failure",
+            5: "Er10 - Frequency Conversion Module Communication Failure",
+            6: "Er12 - Exhaust Temperature Too High Protection",
+            7: "Er14 - Water Tank Temperature Sensor Fault",
+            8: "Er15 - Water Inlet Temperature Sensor Fault",
+            9: "Er16 - Evaporator Coil Temperature Sensor Fault",
+            10: "Er18 - Exhaust Temperature Sensor Fault",
+            11: "Er20 - Frequency Conversion Module Abnormal Protection",
+            12: "Er21 - Ambient Temperature Sensor Fault",
+            13: "Er23 - Cooling Outlet Water Temperature Supercooling Protection",
+            14: "Er26 - Heat Sink Temperature Sensor Fault",
+            15: "Er27 - Outlet Water Temperature Sensor Fault",
+            16: "Er29 - Return Gas Temperature Sensor Fault",
+            17: "Er32 - Heating Outlet Water Temperature Too High Protection",
+            18: "Er33 - Coil Temperature Too High",
+            19: "Er34 - Frequency Conversion Module Temperature Too High",
+            20: "Er42 - Cooling Coil Temperature Sensor Failure",
+            21: "Er62 - Economizer Inlet Temperature Sensor Fault",
+            22: "Er63 - Economizer Outlet Temperature Sensor Fault",
+            23: "Er64 - DC Fan 1 Fault",
+            24: "Er66 - DC Fan 2 Fault",
+            25: "Er67 - Low Pressure Switch Failure",
+            26: "Er68 - High Pressure Switch Failure",
+            27: "Er69 - Low Pressure Protection",
+            28: "Er70 - High Pressure Protection",
+            29: "Er73 - Compressor Discharge Overcurrent Protection",
+        },
     },
     "intemp": {
         "dp_id": 101,
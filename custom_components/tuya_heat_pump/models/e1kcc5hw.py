@@ -268,6 +268,9 @@ SENSOR_TYPES = {
         "icon": "mdi:flash",
         "device_class": "power",
         "state_class": "measurement",
+        # Faz başına V × I toplamı (derived.py)
+        "derived": "voltage_current * cur_current + bv * b_cur + cv * c_cur",
+        "precision": 2,
     },
 }
 
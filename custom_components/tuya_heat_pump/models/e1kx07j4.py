@@ -38,17 +38,38 @@ SENSOR_TYPES = {
         "code": "fault",
         "name": "Fault Description",
         "icon": "mdi:alert-circle",
-        "conversion": (
-            "', '.join(n for b, n in ["
-            "(1,'E00'),(2,'E01'),(4,'E02'),(8,'E06'),(16,'E04'),(32,'E05'),"
-            "(64,'E07'),(128,'E08'),(256,'E09'),(512,'E10'),(1024,'E11'),"
-            "(2048,'E12'),(4096,'E13'),(8192,'E14'),(16384,'E16'),(32768,'E18'),"
-            "(65536,'E19'),(131072,'E20'),(262144,'E21'),(524288,'E22'),"
-            "(1048576,'E23'),(2097152,'E31'),(4194304,'E33'),(8388608,'E34'),"
-            "(16777216,'E35'),(33554432,'E27'),(67108864,'E25'),(134217728,'E24'),"
-            "(268435456,'E37'),(536870912,'E38')"
-            "] if value & b) or 'OK'"
-        ),
+        "bitmap": {
+            0: "E00",
+            1: "E01",
+            2: "E02",
+            3: "E06",
+            4: "E04",
+            5: "E05",
+            6: "E07",
+            7: "E08",
+            8: "E09",
+            9: "E10",
+            10: "E11",
+            11: "E12",
+            12: "E13",
+            13: "E14",
+            14: "E16",
+            15: "E18",
+            16: "E19",
+            17: "E20",
+            18: "E21",
+            19: "E22",
+            20: "E23",
+            21: "E31",
+            22: "E33",
+            23: "E34",
+            24: "E35",
+            25: "E27",
+            26: "E25",
+            27: "E24",
+            28: "E37",
+            29: "E38",
+        },
     },
     # Extra Fault Description (dp_id: 199) — second, separate fault bitmap
     # ("额外故障组" / extra fault group), same decode approach as above.
@@ -57,18 +78,38 @@ SENSOR_TYPES = {
         "code": "extra_fault",
         "name": "Extra Fault Description",
         "icon": "mdi:alert-circle-outline",
-        "conversion": (
-            "', '.join(n for b, n in ["
-            "(1,'E15'),(2,'E39'),(4,'E40'),(8,'E51'),(16,'E41'),(32,'E42'),"
-            "(64,'E43'),(128,'E44'),(256,'E49'),(512,'E50'),(1024,'E30'),"
-            "(2048,'E_25_1'),(4096,'E_25_2'),(8192,'E_25_3'),(16384,'E_25_4'),"
-            "(32768,'E_25_5'),(65536,'E_25_6'),(131072,'E_25_7'),(262144,'E_25_8'),"
-            "(524288,'E_25_9'),(1048576,'E_25_10'),(2097152,'E_25_11'),"
-            "(4194304,'E_25_12'),(8388608,'E_25_13'),(16777216,'E_25_14'),"
-            "(33554432,'E_25_15'),(67108864,'E_25_16'),(134217728,'E53'),"
-            "(268435456,'E52'),(536870912,'E54')"
-            "] if value & b) or 'OK'"
-        ),
+        "bitmap": {
+            0: "E15",
+            1: "E39",
+            2: "E40",
+            3: "E51",
+            4: "E41",
+            5: "E42",
+            6: "E43",
+            7: "E44",
+            8: "E49",
+            9: "E50",
+            10: "E30",
+            11: "E_25_1",
+            12: "E_25_2",
+            13: "E_25_3",
+            14: "E_25_4",
+            15: "E_25_5",
+            16: "E_25_6",
+            17: "E_25_7",
+            18: "E_25_8",
+            19: "E_25_9",
+            20: "E_25_10",
+            21: "E_25_11",
+            22: "E_25_12",
+            23: "E_25_13",
+            24: "E_25_14",
+            25: "E_25_15",
+            26: "E_25_16",
+            27: "E53",
+            28: "E52",
+            29: "E54",
+        },
     },
     # ECO Timer Slot (dp_id: 105) — read-only; which of the 4 scheduled
     # ECO timer slots is currently selected/active ("null" = none).
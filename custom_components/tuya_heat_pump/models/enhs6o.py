@@ -30,22 +30,31 @@ SENSOR_TYPES = {
         "code": "fault",
         "name": "Fault Description",
         "icon": "mdi:alert-circle",
-        "conversion": (
-            "', '.join(n for b, n in ["
-            "(1,'Ambient Temp Sensor Fault'),(2,'Water Tank Temp Sensor Fault'),"
-            "(4,'Outlet Water Temp Sensor Fault'),(8,'Inlet Water Temp Sensor Fault'),"
-            "(16,'Inner Coil Temp Sensor Fault'),(32,'Discharge Temp Sensor Fault'),"
-            "(64,'Outer Coil Temp Sensor Fault'),(128,'Return Gas Temp Sensor Fault'),"
-            "(256,'Indoor Ambient Temp Sensor Fault'),(512,'Aux Valve Front Temp Sensor Fault'),"
-            "(1024,'Aux Valve Rear Temp Sensor Fault'),(2048,'Post-Throttle Temp Sensor Fault'),"
-            "(4096,'High Pressure Sensor Fault'),(8192,'Low Pressure Sensor Fault'),"
-            "(16384,'Reserved Fault 1'),(32768,'Reserved Fault 2'),"
-            "(65536,'Discharge Temp Too High'),(131072,'High Pressure Fault'),"
-            "(262144,'Low Pressure Fault'),(524288,'Water Flow Fault'),"
-            "(1048576,'Heating Outlet Temp Too High'),(2097152,'Cooling Outlet Temp Too Low'),"
-            "(4194304,'Water Temp Difference Too Large')"
-            "] if value & b) or 'OK'"
-        ),
+        "bitmap": {
+            0: "Ambient Temp Sensor Fault",
+            1: "Water Tank Temp Sensor Fault",
+            2: "Outlet Water Temp Sensor Fault",
+            3: "Inlet Water Temp Sensor Fault",
+            4: "Inner Coil Temp Sensor Fault",
+            5: "Discharge Temp Sensor Fault",
+            6: "Outer Coil Temp Sensor Fault",
+            7: "Return Gas Temp Sensor Fault",
+            8: "Indoor Ambient Temp Sensor Fault",
+            9: "Aux Valve Front Temp Sensor Fault",
+            10: "Aux Valve Rear Temp Sensor Fault",
+            11: "Post-Throttle Temp Sensor Fault",
+            12: "High Pressure Sensor Fault",
+            13: "Low Pressure Sensor Fault",
+            14: "Reserved Fault 1",
+            15: "Reserved Fault 2",
+            16: "Discharge Temp Too High",
+            17: "High Pressure Fault",
+            18: "Low Pressure Fault",
+            19: "Water Flow Fault",
+            20: "Heating Outlet Temp Too High",
+            21: "Cooling Outlet Temp Too Low",
+            22: "Water Temp Difference Too Large",
+        },
     },
 }
 
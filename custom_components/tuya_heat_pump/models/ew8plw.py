@@ -41,21 +41,19 @@ SENSOR_TYPES = {
         "code": "fault",
         "name": "Fault Description",
         "icon": "mdi:alert-circle",
-        "conversion": (
-            "', '.join(n for b, n in ["
-            "(1,'Heating Fault'),"
-            "(2,'NTC Sensor Fault'),"
-            "(4,'Blocked'),"
-            "(8,'Front Door Open'),"
-            "(16,'Brew Unit Misplaced'),"
-            "(32,'Water Empty'),"
-            "(64,'Trash Can Misplaced'),"
-            "(128,'Bean Container Empty'),"
-            "(256,'Residual Container Full'),"
-            "(512,'Milk Cup Missing'),"
-            "(1024,'Water Tank Misplaced')"
-            "] if value & b) or 'OK'"
-        ),
+        "bitmap": {
+            0: "Heating Fault",
+            1: "NTC Sensor Fault",
+            2: "Blocked",
+            3: "Front Door Open",
+            4: "Brew Unit Misplaced",
+            5: "Water Empty",
+            6: "Trash Can Misplaced",
+            7: "Bean Container Empty",
+            8: "Residual Container Full",
+            9: "Milk Cup Missing",
+            10: "Water Tank Misplaced",
+        },
     },
 }
 
@@ -77,77 +75,77 @@ BINARY_SENSOR_TYPES = {
         "code": "fault",
         "name": "Heating Fault",
         "device_class": "problem",
-        "conversion": "bool(value & 1)",
+        "bitmap_bit": 0,
     },
     "fault_ntc_fault": {
         "dp_id": 4,
         "code": "fault",
         "name": "NTC Sensor Fault",
         "device_class": "problem",
-        "conversion": "bool(value & 2)",
+        "bitmap_bit": 1,
     },
     "fault_blocking": {
         "dp_id": 4,
         "code": "fault",
         "name": "Blocked",
         "device_class": "problem",
-        "conversion": "bool(value & 4)",
+        "bitmap_bit": 2,
     },
     "fault_frontdoor_open": {
         "dp_id": 4,
         "code": "fault",
         "name": "Front Door Open",
         "device_class": "problem",
-        "conversion": "bool(value & 8)",
+        "bitmap_bit": 3,
     },
     "fault_bu_misplaced": {
         "dp_id": 4,
         "code": "fault",
         "name": "Brew Unit Misplaced",
         "device_class": "problem",
-        "conversion": "bool(value & 16)",
+        "bitmap_bit": 4,
     },
     "fault_water_empty": {
         "dp_id": 4,
         "code": "fault",
         "name": "Water Empty",
         "device_class": "problem",
-        "conversion": "bool(value & 32)",
+        "bitmap_bit": 5,
     },
     "fault_trashcan_misplaced": {
         "dp_id": 4,
         "code": "fault",
         "name": "Trash Can Misplaced",
         "device_class": "problem",
-        "conversion": "bool(value & 64)",
+        "bitmap_bit": 6,
     },
     "fault_beancontainer_empty": {
         "dp_id": 4,
         "code": "fault",
         "name": "Bean Container Empty",
         "device_class": "problem",
-        "conversion": "bool(value & 128)",
+        "bitmap_bit": 7,
     },
     "fault_residual_full": {
         "dp_id": 4,
         "code": "fault",
         "name": "Residual Container Full",
         "device_class": "problem",
-        "conversion": "bool(value & 256)",
+        "bitmap_bit": 8,
     },
     "fault_milkcup_missing": {
         "dp_id": 4,
         "code": "fault",
         "name": "Milk Cup Missing",
         "device_class": "problem",
-        "conversion": "bool(value & 512)",
+        "bitmap_bit": 9,
     },
     "fault_watertank_misplaced": {
         "dp_id": 4,
         "code": "fault",
         "name": "Water Tank Misplaced",
         "device_class": "problem",
-        "conversion": "bool(value & 1024)",
+        "bitmap_bit": 10,
     },
 }
 
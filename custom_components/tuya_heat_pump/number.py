@@ -10,7 +10,7 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.exceptions import HomeAssistantError
 
 from .const import DOMAIN
-from .conversion import Conversion
+from .conversion import api_conversion_for, conversion_for
 from .coordinator import TuyaScaleDataUpdateCoordinator
 from .raw_codec import decode_raw_field, resolve_raw_source, watch_pending_raw_entities
 
@@ -119,7 +119,7 @@ class TuyaHeatpumpNumber(NumberEntity):
             )
             if raw_value is None:
                 return None
-            conversion = Conversion(self._config.get('conversion', 'value'))
+            conversion = conversion_for(self._config)
             try:
                 result = conversion.convert(raw_value)
                 return float(result) if isinstance(result, (int, float)) else result
@@ -132,7 +132,7 @@ class TuyaHeatpumpNumber(NumberEntity):
             
         raw_value = self.coordinator.data[self._number_code]['value']
 
-        conversion = Conversion(self._config.get('conversion', 'value'))
+        conversion = conversion_for(self._config)
         try:
             result = conversion.convert(raw_value)
             return float(result) if isinstance(result, (int, float)) else result
@@ -146,8 +146,7 @@ class TuyaHeatpumpNumber(NumberEntity):
                     self._number_code, value, self._attr_native_unit_of_measurement)
         
         api_value = value
-        if (api_conversion := self._config.get('api_conversion')) is not None:
-            conversion = Conversion(api_conversion)
+        if (conversion := api_conversion_for(self._config)) is not None:
             try:
                 api_value = conversion.convert(value)
                 _LOGGER.debug("Converted HA value %s → API value %s", value, api_value)
@@ -171,7 +170,6 @@ class TuyaHeatpumpNumber(NumberEntity):
         
         if success:
             _LOGGER.info("✅ Successfully set %s to %s", self._number_code, value)
-            await self.coordinator.async_request_refresh()
         else:
             _LOGGER.warning("❌ Failed to set %s to %s", self._number_code, value)
             
@@ -199,6 +197,8 @@ class TuyaHeatpumpNumber(NumberEntity):
 
         if self.coordinator.model_id:
             attrs["tuya_model_id"] = self.coordinator.model_id
+        if self.coordinator.is_stale(attrs.get("tuya_code")):
+            attrs["stale"] = True
 
         if self._config and isinstance(self._config, dict):
             if "values" in self._config:
@@ -0,0 +1,133 @@
+"""Find a local device's protocol version by trying all of them at once.
+
+A wrong CONF_PROTOCOL used to mean a status() that runs into its full
+timeout, then the user guessing the next version by hand. Here every
+version in PROTOCOL_OPTIONS gets its own short-lived tinytuya.Device
+and status(), all started together with short socket timeouts. The
+first one that answers with `dps` wins, and the caller stops waiting
+for the others.
+
+Used by the config flow (initial setup and the local options step) and
+by the coordinator once the local connection has kept failing (e.g. a
+firmware update moved the unit from 3.3 to 3.4).
+
+Some units accept only one TCP client at a time, so the right version
+can lose the race to a wrong one holding the connection. Versions that
+failed to connect at all (rather than answering with a protocol error)
+are therefore retried once, one by one, if time is left.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+import tinytuya
+
+from .const import PROTOCOL_OPTIONS
+
+_LOGGER = logging.getLogger(__name__)
+
+PROBE_DEADLINE = 10
+PROBE_SOCKET_TIMEOUT = 2
+# tinytuya error codes meaning "couldn't even talk to it" (connect
+# failure, device offline / socket refused) — as opposed to a reply
+# that doesn't decrypt with this version.
+_CONNECT_ERRORS = {"901", "905"}
+
+Runner = Callable[..., Awaitable[Any]]
+
+
+def _probe(dev_id: str, ip: str, local_key: str, version: str) -> dict:
+    """Blocking: one status() with `version`; returns the raw response."""
+    try:
+        device = tinytuya.Device(
+            dev_id=dev_id, address=ip, local_key=local_key,
+            version=float(version), connection_timeout=PROBE_SOCKET_TIMEOUT,
+        )
+    except TypeError:
+        device = tinytuya.Device(
+            dev_id=dev_id, address=ip, local_key=local_key, version=float(version),
+        )
+    try:
+        device.set_socketTimeout(PROBE_SOCKET_TIMEOUT)
+        device.set_socketRetryLimit(1)
+    except Exception:
+        pass
+    try:
+        return device.status() or {}
+    finally:
+        try:
+            device.close()
+        except Exception:
+            pass
+
+
+def _connect_failed(response: Any) -> bool:
+    return isinstance(response, BaseException) or (
+        isinstance(response, dict) and str(response.get("Err")) in _CONNECT_ERRORS
+    )
+
+
+async def async_probe_protocol(
+    run: Runner,
+    dev_id: str,
+    ip: str,
+    local_key: str,
+    preferred: str | None = None,
+    deadline: float = PROBE_DEADLINE,
+) -> tuple[str, dict] | None:
+    """Return (version, status) of the first version that yields dps.
+
+    `run(func, *args)` runs a blocking call off the event loop —
+    hass.async_add_executor_job in the config flow, the device's own
+    executor in the coordinator. None if no version answered in time.
+    """
+    versions = list(PROTOCOL_OPTIONS)
+    if preferred in versions:
+        # Started first, so it wins a tie with an equally fast answer.
+        versions.remove(preferred)
+        versions.insert(0, preferred)
+    started = time.monotonic()
+    tasks = {
+        asyncio.ensure_future(run(_probe, dev_id, ip, local_key, version)): version
+        for version in versions
+    }
+    unreachable: list[str] = []
+    try:
+        pending = set(tasks)
+        while pending:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in sorted(done, key=lambda t: versions.index(tasks[t])):
+                response = task.exception() or task.result()
+                if isinstance(response, dict) and "dps" in response:
+                    _LOGGER.debug("Protocol probe %s: %s answers", ip, tasks[task])
+                    return tasks[task], response
+                if _connect_failed(response):
+                    unreachable.append(tasks[task])
+    finally:
+        for task in tasks:
+            # The thread itself can't be stopped; it ends with its
+            # short socket timeout and its result is dropped.
+            task.cancel()
+
+    for version in sorted(unreachable, key=versions.index):
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        try:
+            response = await asyncio.wait_for(
+                run(_probe, dev_id, ip, local_key, version), remaining
+            )
+        except Exception:
+            continue
+        if isinstance(response, dict) and "dps" in response:
+            _LOGGER.debug("Protocol probe %s: %s answers (retry)", ip, version)
+            return version, response
+    return None
@@ -82,6 +82,46 @@ def encode_raw_field(b64_string: str | None, field_index: int,
         return None
 
 
+def raw_field_span(field_index: int, encoding: str) -> tuple[int, int] | None:
+    """(byte offset, size) of a packed field, or None for an unknown encoding."""
+    fmt_size = _STRUCT_FORMAT.get(encoding)
+    if fmt_size is None:
+        return None
+    size = fmt_size[1]
+    return field_index * size, size
+
+
+def patch_raw_bytes(b64_string: str | None, fields: dict[int, bytes]) -> str | None:
+    """Overwrite byte ranges ({offset: bytes}) of a base64 payload.
+
+    Used to keep just-written fields stable against a stale echo while
+    every other byte of the payload comes from the device. None if the
+    payload is missing, undecodable or too short for a range.
+    """
+    if not b64_string:
+        return None
+    try:
+        payload = bytearray(base64.b64decode(b64_string))
+    except Exception:
+        return None
+    for offset, data in fields.items():
+        if offset + len(data) > len(payload):
+            return None
+        payload[offset:offset + len(data)] = data
+    return base64.b64encode(bytes(payload)).decode("ascii")
+
+
+def raw_bytes_match(b64_string: str | None, fields: dict[int, bytes]) -> bool:
+    """True if every byte range ({offset: bytes}) already holds these bytes."""
+    if not b64_string:
+        return False
+    try:
+        payload = base64.b64decode(b64_string)
+    except Exception:
+        return False
+    return all(payload[offset:offset + len(data)] == data for offset, data in fields.items())
+
+
 def resolve_raw_source(coordinator, config: dict) -> str | None:
     """Return the coordinator.data key that holds the raw payload for
     this entity. Uses explicit `raw_source` from the model if provided,
@@ -108,36 +148,58 @@ def watch_pending_raw_entities(config_entry, coordinator, async_add_entities,
     later over the persistent socket. Without this, an entity whose raw
     source wasn't ready on the first pass would be skipped forever.
 
-    This registers a coordinator listener that re-checks the pending
-    list on every update, adds any entity whose raw_source has since
-    become resolvable, and stops watching it once added. `pending` is a
-    plain list of (code, config) tuples, mutated in place so the caller
-    doesn't need to manage its own bookkeeping. `entity_class` must have
-    the same (coordinator, code, config) constructor signature used by
-    every entity class in this integration.
+    Pending entities are indexed by dp_id (and by explicit `raw_source`)
+    and subscribed to the coordinator's "raw source became available"
+    event, so each arrival only looks at the entities waiting for that
+    one source. The subscription is dropped as soon as nothing is
+    pending. `pending` is a plain list of (code, config) tuples, mutated
+    in place so the caller doesn't need to manage its own bookkeeping.
+    `entity_class` must have the same (coordinator, code, config)
+    constructor signature used by every entity class in this integration.
     """
     if not pending:
         return
 
-    def _check_pending():
-        if not pending:
+    by_dp_id: dict[int, list] = {}
+    by_source: dict[str, list] = {}
+    for code, config in pending:
+        explicit = config.get("raw_source")
+        if explicit:
+            by_source.setdefault(explicit, []).append((code, config))
+        elif config.get("dp_id") is not None:
+            by_dp_id.setdefault(config["dp_id"], []).append((code, config))
+        else:
+            logger.warning(
+                "Raw-field entity %s has neither dp_id nor raw_source, "
+                "it can never be resolved", code,
+            )
+
+    remove_listener = None
+
+    def _on_raw_source(dp_id: int, raw_source: str) -> None:
+        waiting = by_dp_id.pop(dp_id, []) + by_source.pop(raw_source, [])
+        if not waiting:
             return
         newly_ready = []
-        still_pending = []
-        for code, config in pending:
-            raw_source = resolve_raw_source(coordinator, config)
-            if raw_source and coordinator.data and raw_source in coordinator.data:
-                resolved_config = {**config, "raw_source": raw_source}
-                newly_ready.append(entity_class(coordinator, code, resolved_config))
-                logger.info(
-                    "Raw source now available, adding delayed entity: %s (%s)",
-                    resolved_config.get('name', code), code,
-                )
-            else:
-                still_pending.append((code, config))
-        pending[:] = still_pending
-        if newly_ready:
-            async_add_entities(newly_ready)
-
-    remove_listener = coordinator.async_add_listener(_check_pending)
+        for code, config in waiting:
+            resolved_config = {**config, "raw_source": config.get("raw_source") or raw_source}
+            newly_ready.append(entity_class(coordinator, code, resolved_config))
+            logger.info(
+                "Raw source now available, adding delayed entity: %s (%s)",
+                resolved_config.get('name', code), code,
+            )
+        resolved_codes = {code for code, _ in waiting}
+        pending[:] = [item for item in pending if item[0] not in resolved_codes]
+        async_add_entities(newly_ready)
+        if not by_dp_id and not by_source and remove_listener is not None:
+            remove_listener()
+
+    remove_listener = coordinator.async_add_raw_source_listener(_on_raw_source)
     config_entry.async_on_unload(remove_listener)
+
+    # The event fires once per raw DP; one that arrived between this
+    # platform computing `pending` and subscribing would otherwise be missed.
+    data = coordinator.data or {}
+    for dp_id, raw_source in list(coordinator.raw_code_by_dp_id.items()):
+        if raw_source in data:
+            _on_raw_source(dp_id, raw_source)
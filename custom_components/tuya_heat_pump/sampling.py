@@ -0,0 +1,127 @@
+"""State-write throttling for high-frequency sensors.
+
+With the persistent local socket, fast-changing DPs (temperatures,
+currents, compressor frequency) can change on every push, and every
+async_write_ha_state() is a row in the recorder. A model file can opt a
+sensor into any combination of:
+
+    "min_interval": 30,     # seconds between two state writes
+    "deadband": 0.5,        # only write when the value moved at least this much
+    "average_window": 60,   # publish the mean of the last N seconds of samples
+
+Changes held back by min_interval are not lost: a single trailing write
+is scheduled for when the interval expires. Changes held back by the
+deadband are dropped on purpose — that's what the deadband is for.
+Non-numeric values (labels, fault text) are never throttled, and
+binary sensors / switches don't use this at all, so alarms and controls
+keep updating immediately.
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Callable
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+SAMPLING_KEYS = ("min_interval", "deadband", "average_window")
+
+
+def sampling_configured(config: dict) -> bool:
+    return any(config.get(key) is not None for key in SAMPLING_KEYS)
+
+
+class StateSampler:
+    """Decides which value changes of one entity actually get written."""
+
+    def __init__(self, hass: HomeAssistant, config: dict,
+                 write_state: Callable[[], None]) -> None:
+        self._hass = hass
+        self._write_state = write_state
+        self.min_interval: float | None = config.get("min_interval")
+        self.deadband: float | None = config.get("deadband")
+        self.average_window: float | None = config.get("average_window")
+        self._samples: deque[tuple[float, float]] = deque()
+        self._published: Any = None
+        self._has_published = False
+        self._last_write = 0.0
+        self._pending: Any = None
+        self._trailing: CALLBACK_TYPE | None = None
+        self.suppressed = 0
+
+    @property
+    def value(self) -> Any:
+        """The value most recently handed to HA."""
+        return self._published
+
+    @callback
+    def seed(self, value: Any) -> None:
+        """Set the initial value without writing (HA writes on entity add)."""
+        now = time.monotonic()
+        self._published = self._candidate(value, now)
+        self._has_published = True
+        self._last_write = now
+
+    def _candidate(self, value: Any, now: float) -> Any:
+        if self.average_window is None or not isinstance(value, (int, float)) \
+                or isinstance(value, bool):
+            return value
+        self._samples.append((now, float(value)))
+        horizon = now - self.average_window
+        while self._samples and self._samples[0][0] < horizon:
+            self._samples.popleft()
+        return round(sum(v for _, v in self._samples) / len(self._samples), 3)
+
+    @callback
+    def offer(self, value: Any, force: bool = False) -> bool:
+        """Feed a freshly computed value. Returns True if it was written."""
+        now = time.monotonic()
+        candidate = self._candidate(value, now)
+        numeric = isinstance(candidate, (int, float)) and not isinstance(candidate, bool)
+        previous = self._published
+        if (
+            not force
+            and self._has_published
+            and numeric
+            and isinstance(previous, (int, float))
+        ):
+            if self.deadband is not None and abs(candidate - previous) < self.deadband:
+                # Back within the deadband of what HA shows: a pending
+                # trailing value is one the device has already left.
+                self._pending = None
+                self.cancel()
+                self.suppressed += 1
+                return False
+            if self.min_interval is not None:
+                wait = self._last_write + self.min_interval - now
+                if wait > 0:
+                    self.suppressed += 1
+                    self._pending = candidate
+                    if self._trailing is None:
+                        self._trailing = async_call_later(
+                            self._hass, wait, self._async_flush_trailing
+                        )
+                    return False
+        self._publish(candidate, now)
+        return True
+
+    def _publish(self, value: Any, now: float) -> None:
+        self.cancel()
+        self._pending = None
+        self._published = value
+        self._has_published = True
+        self._last_write = now
+        self._write_state()
+
+    @callback
+    def _async_flush_trailing(self, _now) -> None:
+        self._trailing = None
+        if self._pending is not None:
+            self._publish(self._pending, time.monotonic())
+
+    @callback
+    def cancel(self) -> None:
+        if self._trailing is not None:
+            self._trailing()
+            self._trailing = None
@@ -0,0 +1,112 @@
+"""Per-coordinator timer scheduler.
+
+A coordinator has several kinds of small, frequently re-armed deadlines:
+- the command queue's flush (per-DP debounce) and ack checks
+- the push coalescing window
+- cloud sent-value expiry
+- the follow-up refresh after a cloud write
+
+Before this scheduler each of these was an asyncio task or an event loop
+timer of its own, re-created on every command, and sent-value expiry
+was a scan of the whole cache on every update.
+
+All of them now live on one heap ordered by the loop's monotonic clock.
+Each timer has a key, and scheduling a key again replaces its previous
+deadline: the old heap entry is skipped when it comes up (lazy
+deletion). Schedule and cancel are O(log n) and O(1). The scheduler
+keeps at most one event loop timer armed, for the earliest deadline.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Any, Callable, Hashable
+
+from homeassistant.core import HomeAssistant, callback
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Keyed one-shot timers on a single heap."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._loop = hass.loop
+        self._heap: list[tuple[float, int, Hashable]] = []
+        # key → (deadline, seq, callback); a heap entry is live only if
+        # its seq matches.
+        self._timers: dict[Hashable, tuple[float, int, Callable[[], Any]]] = {}
+        self._seq = itertools.count()
+        self._handle: asyncio.TimerHandle | None = None
+        self._armed_for: float | None = None
+
+    @callback
+    def schedule(self, key: Hashable, delay: float, func: Callable[[], Any]) -> None:
+        """Run func() in `delay` s, replacing any timer with the same key."""
+        when = self._loop.time() + max(0.0, delay)
+        seq = next(self._seq)
+        self._timers[key] = (when, seq, func)
+        heapq.heappush(self._heap, (when, seq, key))
+        if len(self._heap) > 64 + 4 * len(self._timers):
+            # Mostly superseded entries (a slider re-arming one key):
+            # rebuild from the live timers.
+            self._heap = [(w, s, k) for k, (w, s, _) in self._timers.items()]
+            heapq.heapify(self._heap)
+        if self._armed_for is None or when < self._armed_for:
+            self._arm(when)
+
+    @callback
+    def schedule_earliest(self, key: Hashable, delay: float, func: Callable[[], Any]) -> None:
+        """Like schedule(), but never moves an existing timer later."""
+        current = self._timers.get(key)
+        if current is not None and current[0] <= self._loop.time() + delay:
+            return
+        self.schedule(key, delay, func)
+
+    @callback
+    def cancel(self, key: Hashable) -> None:
+        self._timers.pop(key, None)
+
+    def is_scheduled(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def _arm(self, when: float) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        self._armed_for = when
+        self._handle = self._loop.call_at(when, self._run)
+
+    @callback
+    def _run(self) -> None:
+        self._handle = None
+        self._armed_for = None
+        now = self._loop.time()
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, seq, key = heapq.heappop(heap)
+            timer = self._timers.get(key)
+            if timer is None or timer[1] != seq:
+                continue  # cancelled or rescheduled
+            del self._timers[key]
+            try:
+                timer[2]()
+            except Exception:
+                _LOGGER.exception("Scheduled callback %s failed", key)
+        # Drop cancelled entries at the top so they don't arm a wakeup.
+        while heap and (heap[0][2] not in self._timers or self._timers[heap[0][2]][1] != heap[0][1]):
+            heapq.heappop(heap)
+        if heap:
+            self._arm(heap[0][0])
+
+    def shutdown(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._armed_for = None
+        self._timers.clear()
+        self._heap.clear()
+
+    def __len__(self) -> int:
+        return len(self._timers)
@@ -10,7 +10,7 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.exceptions import HomeAssistantError
 
 from .const import DOMAIN
-from .conversion import Conversion
+from .conversion import Conversion, conversion_for
 from .coordinator import TuyaScaleDataUpdateCoordinator
 from .raw_codec import decode_raw_field, resolve_raw_source, watch_pending_raw_entities
 
@@ -154,7 +154,7 @@ class TuyaHeatpumpSelect(SelectEntity):
 
         raw_value = self.coordinator.data[self._select_code]['value']
 
-        conversion = Conversion(self._config.get('conversion', 'value'))
+        conversion = conversion_for(self._config)
         try:
             value = conversion.convert(raw_value)
         except Exception as err:
@@ -192,6 +192,8 @@ class TuyaHeatpumpSelect(SelectEntity):
 
         if self.coordinator.model_id:
             attrs["tuya_model_id"] = self.coordinator.model_id
+        if self.coordinator.is_stale(attrs.get("tuya_code")):
+            attrs["stale"] = True
 
         # Select için values bilgisi faydalı olur
         if self._config and isinstance(self._config, dict) and "values" in self._config:
@@ -223,6 +225,7 @@ class TuyaHeatpumpSelect(SelectEntity):
                 self._config['field_index'],
                 self._config.get('encoding', 'uint8'),
                 raw_value,
+                debounce=0,
             )
         else:
             api_value = key
@@ -234,11 +237,12 @@ class TuyaHeatpumpSelect(SelectEntity):
                 except Exception as err:
                     _LOGGER.warning("API conversion failed: %s", err)
 
-            success = await self.coordinator.send_command(self._select_code, api_value)
+            success = await self.coordinator.send_command(
+                self._select_code, api_value, debounce=0
+            )
 
         if success:
             _LOGGER.info("✅ Successfully changed %s to %s", self._select_code, option)
-            await self.coordinator.async_request_refresh()
         else:
             _LOGGER.warning("❌ Failed to change %s to %s", self._select_code, option)
             raise HomeAssistantError(
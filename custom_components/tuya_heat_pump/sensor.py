@@ -11,11 +11,13 @@ from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.util import dt as dt_util
 
 from .const import DOMAIN
-from .conversion import Conversion
+from .conversion import conversion_for
 from .coordinator import TuyaScaleDataUpdateCoordinator
+from .energy import DEFAULT_MAX_GAP, INTEGRATION_LEFT, EnergyAccumulator
 from .raw_codec import decode_raw_field as _decode_raw_field
 from .raw_codec import resolve_raw_source as _resolve_raw_source
 from .raw_codec import watch_pending_raw_entities
+from .sampling import StateSampler, sampling_configured
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -58,12 +60,12 @@ async def async_setup_entry(
                 )
             continue
 
-        if coordinator.data and sensor_code in coordinator.data:
-            sensors.append(TuyaHeatpumpSensor(coordinator, sensor_code, sensor_config))
-            _LOGGER.info("Adding sensor: %s (%s)", sensor_config.get('name', sensor_code), sensor_code)
-        elif sensor_code == "calculated_power":
+        if coordinator.is_derived(sensor_code):
             sensors.append(TuyaHeatpumpSensor(coordinator, sensor_code, sensor_config))
             _LOGGER.info("Adding calculated sensor: %s", sensor_config.get('name', sensor_code))
+        elif coordinator.data and sensor_code in coordinator.data:
+            sensors.append(TuyaHeatpumpSensor(coordinator, sensor_code, sensor_config))
+            _LOGGER.info("Adding sensor: %s (%s)", sensor_config.get('name', sensor_code), sensor_code)
         elif sensor_code == "total_energy":
             sensors.append(TuyaEnergySensor(coordinator, sensor_config))
             _LOGGER.info("Adding energy sensor: %s", sensor_config.get('name', sensor_code))
@@ -90,6 +92,9 @@ class TuyaHeatpumpSensor(SensorEntity):
         self.coordinator = coordinator
         self._sensor_code = sensor_code
         self._config = config
+        # Computed from other DPs by the coordinator's derived graph
+        # (derived.py) instead of read from a DP of its own.
+        self._is_derived = coordinator.is_derived(sensor_code)
         
         device_name_slug = coordinator.device_name.lower().replace(" ", "_").replace("-", "_")
         self._attr_unique_id = f"{device_name_slug}_{sensor_code}"
@@ -101,6 +106,12 @@ class TuyaHeatpumpSensor(SensorEntity):
         self._attr_state_class = config.get('state_class')
         self._attr_has_entity_name = True
         self._attr_device_info = coordinator.device_info
+        # Opt-in recorder-friendly throttling (min_interval / deadband /
+        # average_window in the model entry) — see sampling.py.
+        self._sampler: StateSampler | None = None
+        if sampling_configured(config):
+            self._sampler = StateSampler(coordinator.hass, config, self.async_write_ha_state)
+        self._last_available: bool | None = None
 
     @property
     def device_info(self):
@@ -110,8 +121,14 @@ class TuyaHeatpumpSensor(SensorEntity):
     @property
     def native_value(self) -> str | None:
         """Return the state of the sensor."""
-        if self._sensor_code == "calculated_power":
-            return self._calculate_power()
+        if self._sampler is not None:
+            return self._sampler.value
+        return self._compute_native_value()
+
+    def _compute_native_value(self) -> str | None:
+        """Current value straight from coordinator.data."""
+        if self._is_derived:
+            return self.coordinator.get_derived_value(self._sensor_code)
 
         # Raw-field sensor: decode from the raw payload DP
         if "field_index" in self._config:
@@ -148,8 +165,11 @@ class TuyaHeatpumpSensor(SensorEntity):
                     # unreachable one. Defaults to None, so models that do
                     # not set it keep the previous behaviour.
                     return self._config.get('guard_inactive_value')
-            # Optional conversion (scale/offset etc.)
-            conversion = Conversion(self._config.get('conversion', 'value'))
+            # Optional bitmap table, otherwise conversion (scale/offset etc.)
+            decoder = self._config.get('_bitmap_decoder')
+            if decoder is not None:
+                return decoder.describe(raw_value)
+            conversion = conversion_for(self._config)
             try:
                 result = conversion.convert(raw_value)
             except Exception as err:
@@ -166,49 +186,8 @@ class TuyaHeatpumpSensor(SensorEntity):
         if not self.coordinator.data or self._sensor_code not in self.coordinator.data:
             return None
 
-        raw_value = self.coordinator.data[self._sensor_code]['value']
-
-        conversion = Conversion(self._config.get('conversion', 'value'))
-        try:
-            result = conversion.convert(raw_value)
-            return float(result) if isinstance(result, (int, float)) else result
-        except Exception as err:
-            _LOGGER.warning("Conversion failed for %s: %s", self._sensor_code, err)
-            return raw_value
-
-    def _calculate_power(self) -> float | None:
-        """Güç hesaplama: P = V × I"""
-        if not self.coordinator.data:
-            return None
-            
-        voltage = None
-        current = None
-        
-        sensor_configs = self.coordinator.model_mapping.get("sensors", {})
-        
-        if 'ac_vol' in sensor_configs and 'ac_vol' in self.coordinator.data:
-            config = sensor_configs['ac_vol']
-            raw_voltage = self.coordinator.data['ac_vol']['value']
-            conversion = Conversion(config.get('conversion', 'value'))
-            try:
-                voltage = conversion.convert(raw_voltage)
-            except:
-                voltage = raw_voltage
-        
-        if 'ac_curr' in sensor_configs and 'ac_curr' in self.coordinator.data:
-            config = sensor_configs['ac_curr']
-            raw_current = self.coordinator.data['ac_curr']['value']
-            conversion = Conversion(config.get('conversion', 'value'))
-            try:
-                current = conversion.convert(raw_current)
-            except:
-                current = raw_current
-        
-        if voltage is not None and current is not None:
-            power = voltage * current
-            return round(power, 2)
-            
-        return None
+        result = self.coordinator.get_converted_value(self._sensor_code, self._config)
+        return float(result) if isinstance(result, (int, float)) else result
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
@@ -224,16 +203,22 @@ class TuyaHeatpumpSensor(SensorEntity):
         else:
             attrs["tuya_code"] = self._config.get("code", self._sensor_code)
             attrs["tuya_dp_id"] = self._config.get("dp_id")
+        if self._is_derived:
+            attrs["derived_from"] = self.coordinator.model_mapping["_derived_graph"].nodes[
+                self._sensor_code
+            ].expression
 
         if self.coordinator.model_id:
             attrs["tuya_model_id"] = self.coordinator.model_id
+        if self.coordinator.is_stale(attrs.get("tuya_code")):
+            attrs["stale"] = True
 
         return attrs
 
     @property
     def available(self) -> bool:
         """Return if entity is available."""
-        if self._sensor_code in ["calculated_power", "total_energy"]:
+        if self._is_derived:
             return self.coordinator.last_update_success
 
         if "field_index" in self._config:
@@ -254,13 +239,37 @@ class TuyaHeatpumpSensor(SensorEntity):
     async def async_added_to_hass(self) -> None:
         """When entity is added to hass."""
         await super().async_added_to_hass()
+        if self._sampler is None:
+            self.async_on_remove(
+                self.coordinator.async_add_listener(self.async_write_ha_state)
+            )
+            return
+        self._sampler.seed(self._compute_native_value())
+        self._last_available = self.available
+        self.async_on_remove(self._sampler.cancel)
         self.async_on_remove(
-            self.coordinator.async_add_listener(self.async_write_ha_state)
+            self.coordinator.async_add_listener(self._handle_sampled_update)
         )
 
+    def _handle_sampled_update(self) -> None:
+        """Coordinator update for a throttled sensor: let the sampler
+        decide whether this change is worth a state write. Availability
+        changes are always written straight away."""
+        available = self.available
+        force = available != self._last_available
+        self._last_available = available
+        self._sampler.offer(self._compute_native_value(), force=force)
+
 
 class TuyaEnergySensor(SensorEntity, RestoreEntity):
-    """Total Energy Sensor for Tuya Heatpump."""
+    """Total Energy Sensor for Tuya Heatpump.
+
+    The integral itself lives in energy.EnergyAccumulator; this entity
+    only feeds it power samples and publishes the total. Model files can
+    tune it with `integration_method` ("left" — the historical behaviour
+    — or "trapezoidal"), `max_gap` (seconds) and `power_source` (a
+    derived or plain sensor code in W, default "calculated_power").
+    """
     
     _attr_device_class = "energy"
     _attr_state_class = "total_increasing"
@@ -270,9 +279,13 @@ class TuyaEnergySensor(SensorEntity, RestoreEntity):
         """Initialize energy sensor."""
         self.coordinator = coordinator
         self._config = config
-        self._total_energy = 0.0
-        self._last_update = None
-        self._last_power = 0.0
+        self._power_source = config.get('power_source', 'calculated_power')
+        self._accumulator = EnergyAccumulator(
+            coordinator.hass,
+            coordinator.config_entry.entry_id,
+            method=config.get('integration_method', INTEGRATION_LEFT),
+            max_gap=config.get('max_gap', DEFAULT_MAX_GAP),
+        )
         
         device_name_slug = coordinator.device_name.lower().replace(" ", "_").replace("-", "_")
         self._attr_unique_id = f"{device_name_slug}_total_energy"
@@ -285,76 +298,58 @@ class TuyaEnergySensor(SensorEntity, RestoreEntity):
         """When entity is added to hass."""
         await super().async_added_to_hass()
         
-        if (last_state := await self.async_get_last_state()) is not None:
+        if await self._accumulator.async_load():
+            _LOGGER.info("Energy accumulator loaded from storage: %s Wh", self._accumulator.total_wh)
+        elif (last_state := await self.async_get_last_state()) is not None:
+            # Installs from before the accumulator had its own storage.
             try:
-                self._total_energy = float(last_state.state)
-                _LOGGER.info("Energy sensor state restored: %s Wh", self._total_energy)
+                self._accumulator.restore_total(float(last_state.state))
+                _LOGGER.info("Energy sensor state restored: %s Wh", self._accumulator.total_wh)
             except (ValueError, TypeError):
-                self._total_energy = 0.0
+                pass
         
-        self._last_power = self._get_current_power() or 0.0
-        self._last_update = dt_util.utcnow()
+        self._accumulator.add_sample(self._sample_power(), dt_util.utcnow())
         
         self.async_on_remove(
             self.coordinator.async_add_listener(self._handle_coordinator_update)
         )
 
+    async def async_will_remove_from_hass(self) -> None:
+        """Flush the accumulator before going away."""
+        await self._accumulator.async_save()
+        await super().async_will_remove_from_hass()
+
     def _handle_coordinator_update(self) -> None:
         """Handle coordinator update."""
-        current_power = self._get_current_power() or 0.0
-        current_time = dt_util.utcnow()
-        
-        if self._last_update is not None:
-            time_diff = (current_time - self._last_update).total_seconds() / 3600.0
-            
-            if time_diff > 0 and self._last_power > 0:
-                energy_increment = self._last_power * time_diff
-                self._total_energy += energy_increment
-                _LOGGER.debug("Energy added: %.6f Wh, Total: %.3f Wh", energy_increment, self._total_energy)
-        
-        self._last_power = current_power
-        self._last_update = current_time
+        increment = self._accumulator.add_sample(
+            self._sample_power(), dt_util.utcnow()
+        )
+        if increment:
+            _LOGGER.debug("Energy added: %.6f Wh, Total: %.3f Wh", increment, self._accumulator.total_wh)
+        self._accumulator.async_schedule_save()
         self.async_write_ha_state()
 
-    def _get_current_power(self) -> float | None:
-        """Get current power in watts."""
-        if not self.coordinator.data:
+    def _sample_power(self) -> float | None:
+        """Power to integrate; None (segment break) while the coordinator
+        still shows warm-start snapshot values instead of live data."""
+        if self.coordinator.stale:
             return None
-            
-        voltage = None
-        current = None
-        sensor_configs = self.coordinator.model_mapping.get("sensors", {})
-        
-        if 'ac_vol' in sensor_configs and 'ac_vol' in self.coordinator.data:
-            config = sensor_configs['ac_vol']
-            raw_voltage = self.coordinator.data['ac_vol']['value']
-            conversion = Conversion(config.get('conversion', 'value'))
-            try:
-                voltage = conversion.convert(raw_voltage)
-                if isinstance(voltage, (int, float)) and voltage > 0:
-                    voltage = float(voltage)
-            except:
-                voltage = None
-        
-        if 'ac_curr' in sensor_configs and 'ac_curr' in self.coordinator.data:
-            config = sensor_configs['ac_curr']
-            raw_current = self.coordinator.data['ac_curr']['value']
-            conversion = Conversion(config.get('conversion', 'value'))
-            try:
-                current = conversion.convert(raw_current)
-                if isinstance(current, (int, float)) and current > 0:
-                    current = float(current)
-            except:
-                current = None
-        
-        if voltage is not None and current is not None:
-            return voltage * current
-        return None
+        return self._current_power()
+
+    def _current_power(self) -> float | None:
+        """Power sample (W) from the derived graph or a plain sensor."""
+        if self.coordinator.is_derived(self._power_source):
+            power = self.coordinator.get_derived_value(self._power_source)
+        else:
+            power = self.coordinator.get_converted_value(self._power_source)
+        if isinstance(power, bool) or not isinstance(power, (int, float)):
+            return None
+        return float(power)
 
     @property
     def native_value(self) -> float:
         """Return the total energy in Wh."""
-        return round(self._total_energy, 3)
+        return round(self._accumulator.total_wh, 3)
 
     @property
     def available(self) -> bool:
@@ -372,6 +367,10 @@ class TuyaEnergySensor(SensorEntity, RestoreEntity):
         attrs: dict[str, Any] = {}
         attrs["tuya_code"] = "total_energy"
         attrs["tuya_dp_id"] = None
+        attrs["integration_method"] = self._accumulator.method
         if self.coordinator.model_id:
             attrs["tuya_model_id"] = self.coordinator.model_id
+        if self.coordinator.is_stale(attrs.get("tuya_code")):
+            attrs["stale"] = True
         return attrs
+
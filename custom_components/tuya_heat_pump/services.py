@@ -0,0 +1,127 @@
+"""Services for Tuya Heat Pump.
+
+export_history: dump a time window of the per-device DP history (see
+dp_history.py) to a JSON file in the config directory, and optionally
+return the records as the service response.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import device_registry as dr
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .coordinator import TuyaScaleDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_EXPORT_HISTORY = "export_history"
+
+ATTR_DEVICE_ID = "device_id"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_DP_IDS = "dp_ids"
+
+EXPORT_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DEVICE_ID): cv.string,
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_DP_IDS): vol.All(cv.ensure_list, [vol.Coerce(int)]),
+    }
+)
+
+
+def _to_timestamp(value: datetime | None) -> float | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return value.timestamp()
+
+
+def _find_coordinator(hass: HomeAssistant, device_id: str):
+    """HA device registry id (or the raw Tuya device id) → coordinator."""
+    tuya_id = device_id
+    device = dr.async_get(hass).async_get(device_id)
+    if device is not None:
+        tuya_id = next(
+            (ident for domain, ident in device.identifiers if domain == DOMAIN),
+            None,
+        )
+    for coordinator in hass.data.get(DOMAIN, {}).values():
+        # hass.data[DOMAIN] also holds shared objects (MQTT hubs).
+        if not isinstance(coordinator, TuyaScaleDataUpdateCoordinator):
+            continue
+        if coordinator.device_id == tuya_id:
+            return coordinator
+    raise HomeAssistantError(f"No Tuya Heat Pump device found for {device_id}")
+
+
+async def _async_export_history(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    coordinator = _find_coordinator(hass, call.data[ATTR_DEVICE_ID])
+    if coordinator.history is None:
+        raise HomeAssistantError(
+            f"DP history is not being recorded for {coordinator.device_id}"
+        )
+
+    query = coordinator.history.query_job(
+        _to_timestamp(call.data.get(ATTR_START)),
+        _to_timestamp(call.data.get(ATTR_END)),
+        call.data.get(ATTR_DP_IDS),
+    )
+    code_by_dp_id = coordinator.history_codes
+    path = hass.config.path(
+        f"{DOMAIN}_history_{coordinator.device_id}_{int(time.time())}.json"
+    )
+
+    def _export() -> list[dict[str, Any]]:
+        records = query()
+        for record in records:
+            record["code"] = code_by_dp_id.get(record["dp_id"])
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"device_id": coordinator.device_id, "records": records},
+                handle,
+                default=str,
+            )
+        return records
+
+    records = await hass.async_add_executor_job(_export)
+    _LOGGER.info("Exported %d DP history records to %s", len(records), path)
+
+    if not call.return_response:
+        return None
+    return {"path": path, "count": len(records), "records": records}
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register integration services (idempotent, shared by all entries)."""
+    if hass.services.has_service(DOMAIN, SERVICE_EXPORT_HISTORY):
+        return
+
+    async def _handle_export_history(call: ServiceCall) -> ServiceResponse:
+        return await _async_export_history(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_HISTORY,
+        _handle_export_history,
+        schema=EXPORT_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -17,11 +17,16 @@ Nasıl çalışır (özet):
      model dosyamızın ihtiyaç duyduğu DP kümesiyle karşılaştırılır:
        - Hepsi mevcutsa -> bu cihaz için periyodik poll DURAKLATILIR,
          gelen push verisi doğrudan uygulanır.
-       - Bir tanesi bile eksikse -> periyodik poll AYNEN DEVAM EDER,
-         gelen push sadece "değişti, hemen tazele" tetikleyicisi
-         olarak kullanılır (içeriğine bakılmaz).
+       - Bir kısmı eksikse (hibrit) -> MQTT'nin gördüğü kodların push
+         değerleri doğrudan uygulanır; periyodik poll sadece MQTT'nin
+         GÖREMEDİĞİ kodları ister (?codes=...) ve her push, yine sadece
+         o kodlar için hedefli bir sorgu tetikler.
+       - Hiçbiri yoksa -> periyodik poll AYNEN DEVAM EDER, gelen push
+         sadece "değişti, hemen tazele" tetikleyicisidir.
   3. MQTT bağlantısı koparsa, periyodik poll otomatik olarak eski
      haline döner — hiçbir zaman veri akışı tamamen kesilmez.
+  4. Aynı hesaptaki tüm cihazlar tek Manager'ı ve tek MQTT bağlantısını
+     paylaşır (SharingMQTTHub); push'lar device_id ile sahibine gider.
 
 Bu dosyadaki hiçbir şey, CONF_USER_CODE config_entry.data'da
 tanımlanmadığı sürece devreye girmez — yani mevcut kurulumların
@@ -31,11 +36,13 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from typing import Any
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 
 from .const import DOMAIN, TUYA_SHARING_CLIENT_ID, TUYA_SHARING_SCHEMA
+from .model_loader import collect_required_codes
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -114,50 +121,398 @@ class SharingQRLogin:
         return f"tuyaSmart--qrLogin?token={self._qr_token}"
 
 
-def _collect_required_codes(model_mapping: dict) -> set[str]:
-    """Model dosyasının GERÇEKTEN ihtiyaç duyduğu Tuya DP kodlarının
-    tam kümesini çıkarır (raw field'larda raw_source, düzlerde code/key).
-    dp_id'si olmayan (hesaplanmış/sanal) entry'ler hariç tutulur."""
-    codes: set[str] = set()
-    for entity_type in ("sensors", "binary_sensors", "switches", "numbers", "selects", "texts"):
-        for key, cfg in model_mapping.get(entity_type, {}).items():
-            if "dp_id" not in cfg:
-                continue
-            raw_source = cfg.get("raw_source")
-            if raw_source:
-                codes.add(raw_source)
-            else:
-                codes.add(cfg.get("code", key))
-    return codes
+def _timestamp_ms(value: Any) -> int | None:
+    """MQTT DP zaman damgası → ms (saniye olarak gelirse çevrilir)."""
+    try:
+        timestamp = float(value)
+    except (TypeError, ValueError):
+        return None
+    if timestamp <= 0:
+        return None
+    return int(timestamp * 1000 if timestamp < 1e12 else timestamp)
 
 
-def _device_covers_codes(device: Any, required_codes: set[str]) -> bool:
+def _device_codes(device: Any) -> set[str]:
     """tuya_sharing'in bir cihaz için gördüğü DP kümesi (Standard
-    Instruction Set'e kayıtlı olanlar), bizim ihtiyaç duyduğumuz TÜM
-    kodları kapsıyor mu? Tek bir eksik bile varsa False — o cihaz için
-    MQTT'ye güvenip periyodik poll'u kapatamayız."""
+    Instruction Set'e kayıtlı olanlar). Bunun dışındaki kodlar MQTT
+    push'larında hiç görünmez — onlar için poll'a muhtacız."""
     available: set[str] = set()
     function = getattr(device, "function", None) or {}
     status_range = getattr(device, "status_range", None) or {}
     available.update(function.keys())
     available.update(status_range.keys())
-    return required_codes.issubset(available)
+    return available
+
+
+DATA_MQTT_HUBS = "mqtt_hubs"
+# Aynı anda kurulan birkaç entry'nin cihazlarını tek refresh_mq()'da
+# toplamak için kısa bekleme (sn).
+MQ_REFRESH_COALESCE = 0.5
+# Bağlantı sağlığı (bkz. SharingMQTTHub "Sağlık takibi").
+WATCHDOG_INTERVAL = 30
+RECONNECT_BACKOFF_MIN = 5
+RECONNECT_BACKOFF_MAX = 300
+# "Bağlı ama sessiz" eşiği: ortalama mesaj aralığının SILENCE_FACTOR
+# katı, [SILENCE_MIN, SILENCE_MAX] aralığına kırpılmış. Yeterince mesaj
+# görülmeden (SILENCE_WARMUP) SILENCE_MAX kullanılıyor.
+SILENCE_FACTOR = 10
+SILENCE_MIN = 600
+SILENCE_MAX = 3600
+SILENCE_WARMUP = 5
+
+
+class SharingMQTTHub:
+    """Hesap (User Code + terminal_id) başına TEK tuya_sharing Manager'ı
+    ve TEK MQTT bağlantısı.
+
+    Eskiden User Code'lu her cloud entry kendi Manager'ını kuruyor,
+    update_device_cache() ile evdeki tüm cihaz listesini ayrı ayrı
+    çekiyor ve kendi MQTT bağlantısını açıyordu — her bağlantı hesaptaki
+    TÜM cihazların push'larını alıp biri hariç hepsini çöpe atıyordu.
+    Artık hub hass.data[DOMAIN][DATA_MQTT_HUBS] içinde hesap anahtarıyla
+    tutuluyor; N cihaz = bir bağlantı + bir cihaz listesi sorgusu.
+    Push'lar device_id → SharingMQTT tablosuyla sahibine yönlendiriliyor.
+    Son cihaz ayrılınca bağlantı kapanıp hub kayıttan siliniyor.
+
+    Sağlık takibi olay tabanlı: paho client'ının on_connect/on_disconnect
+    callback'leri sarılıp event loop'a aktarılıyor. Kopma anında bağlı
+    cihazlar hemen poll'a dönüyor (5 dakikalık kontrolü beklemeden),
+    yeniden bağlanma backoff ile (5 → 300 sn) ve sınırsız deneniyor.
+    Ayrıca mesaj hızı izleniyor: bağlantı "açık" görünüp alışılmış
+    aralığın çok üstünde sessiz kalırsa oturum kopmuş sayılıp yeniden
+    kuruluyor. tuya_sharing MQTT ayarı yenilenince yeni client
+    oluşturabildiği için watchdog her turda client'ı yeniden sarıyor.
+    """
+
+    def __init__(self, hass: HomeAssistant, key: tuple[str, str],
+                 user_code: str, token_info: dict) -> None:
+        self._hass = hass
+        self._key = key
+        self._user_code = user_code
+        self._token_info = token_info
+        self._manager = None
+        self._start_lock = asyncio.Lock()
+        # device_id → SharingMQTT
+        self._routes: dict[str, SharingMQTT] = {}
+        self._mq_dirty = False
+        self._mq_task: asyncio.Task | None = None
+        self._connected = False
+        self._stopped = False
+        # Sarılmış (callback'leri bize bağlı) paho client.
+        self._hooked_client = None
+        # Kendi refresh_mq() çağrımız sürerken eski client'ın
+        # disconnect'i kopma sayılmıyor.
+        self._refreshing = False
+        self._count_raw_messages = False
+        self._last_message = time.monotonic()
+        self._avg_gap: float | None = None
+        self._messages = 0
+        self._backoff = RECONNECT_BACKOFF_MIN
+        self._reconnect_handle: asyncio.TimerHandle | None = None
+        self._watchdog_handle: asyncio.TimerHandle | None = None
+        self.reconnects = 0
+
+    @classmethod
+    def async_get(cls, hass: HomeAssistant, user_code: str, token_info: dict) -> SharingMQTTHub:
+        hubs = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_MQTT_HUBS, {})
+        key = (user_code, token_info["terminal_id"])
+        hub = hubs.get(key)
+        if hub is None:
+            hub = hubs[key] = cls(hass, key, user_code, token_info)
+        return hub
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    def _client(self):
+        mq = getattr(self._manager, "mq", None) if self._manager else None
+        return getattr(mq, "client", None) if mq else None
+
+    async def _async_start(self) -> None:
+        """Manager'ı kurar ve hesabın cihaz listesini BİR KEZ çeker."""
+        from tuya_sharing import Manager
+
+        token_info = self._token_info
+        token_listener = _PersistTokenListener(self._hass, self)
+
+        def _build_manager():
+            return Manager(
+                TUYA_SHARING_CLIENT_ID,
+                self._user_code,
+                token_info["terminal_id"],
+                token_info["endpoint"],
+                token_info,
+                token_listener,
+            )
+
+        manager = await self._hass.async_add_executor_job(_build_manager)
+        manager.add_device_listener(_PushDeviceListener(self))
+        await self._hass.async_add_executor_job(manager.update_device_cache)
+        self._manager = manager
+
+    async def async_attach(self, device_id: str, owner: SharingMQTT):
+        """owner'ı device_id'nin push'larına bağlar; MQTT'nin gördüğü
+        (taze) cihaz nesnesini, cihaz hesapta yoksa None döndürür."""
+        async with self._start_lock:
+            if self._manager is None:
+                await self._async_start()
+        device = self._manager.device_map.get(device_id)
+        if device is None:
+            return None
+        self._routes[device_id] = owner
+
+        # refresh_mq() sadece set_up=True olan cihazları MQTT'ye
+        # kaydediyor — bazı hesap/cihaz kombinasyonlarında bu bayrak
+        # hiç True gelmiyor (canlı testte doğrulandı), o yüzden
+        # gerekirse elle zorluyoruz.
+        if not getattr(device, "set_up", False):
+            try:
+                device.set_up = True
+            except Exception:
+                pass
+            self._mq_dirty = True
+        if self._client() is None:
+            self._mq_dirty = True
+        await self._async_ensure_mq()
+
+        if self._watchdog_handle is None:
+            # Client var diye bağlı değil: paho CONNACK'i arka planda
+            # bekliyor olabilir. Gerçek durumdan başla, on_connect
+            # (ya da watchdog) True'ya çevirir.
+            client = self._client()
+            self._connected = client is not None and self._client_connected(client)
+            self._watchdog_handle = self._hass.loop.call_later(
+                WATCHDOG_INTERVAL, self._watchdog
+            )
+        return self._manager.device_map.get(device_id) or device
+
+    async def _async_ensure_mq(self) -> None:
+        """Bekleyen bir refresh_mq() varsa (ya da gerekiyorsa) bitmesini
+        bekler. Aynı anda bağlanan cihazlar tek yenilemeyi paylaşıyor."""
+        while self._mq_dirty or (self._mq_task is not None and not self._mq_task.done()):
+            if self._mq_task is None or self._mq_task.done():
+                self._mq_task = self._hass.async_create_task(self._async_refresh_mq())
+            await asyncio.shield(self._mq_task)
+
+    async def _async_refresh_mq(self) -> None:
+        await asyncio.sleep(MQ_REFRESH_COALESCE)
+        self._mq_dirty = False
+        await self._async_run_refresh_mq()
+        # Canlı testte gördük ki device.function/status_range
+        # refresh_mq'dan hemen sonra bazen henüz tam dolmuyor (örn. bir
+        # cihazda function'da temp_current eksikken birkaç saniye sonra
+        # status_range'de doğru şekilde görünüyordu) — kapsama kontrolü
+        # bu beklemeden SONRA yapılıyor.
+        await asyncio.sleep(3)
+
+    async def async_detach(self, device_id: str, owner: SharingMQTT) -> None:
+        if self._routes.get(device_id) is owner:
+            del self._routes[device_id]
+        if self._routes:
+            return
+        hubs = self._hass.data.get(DOMAIN, {}).get(DATA_MQTT_HUBS, {})
+        if hubs.get(self._key) is self:
+            del hubs[self._key]
+        self._stopped = True
+        for handle in (self._watchdog_handle, self._reconnect_handle):
+            if handle is not None:
+                handle.cancel()
+        self._watchdog_handle = self._reconnect_handle = None
+        self._connected = False
+        mq = getattr(self._manager, "mq", None) if self._manager else None
+        stop = getattr(mq, "stop", None) if mq else None
+        if callable(stop):
+            try:
+                await self._hass.async_add_executor_job(stop)
+            except Exception:
+                pass
+
+    def _set_connected(self, connected: bool) -> None:
+        if connected == self._connected:
+            return
+        self._connected = connected
+        for owner in list(self._routes.values()):
+            owner.async_connection_changed(connected)
+
+    async def _async_run_refresh_mq(self) -> None:
+        """refresh_mq() (yeni MQ + client) ve yeni client'ı sarma."""
+        self._refreshing = True
+        try:
+            await self._hass.async_add_executor_job(self._manager.refresh_mq)
+        finally:
+            self._refreshing = False
+        self._hook_client()
+        client = self._client()
+        if client is not None and self._client_connected(client):
+            # on_connect sarılmadan önce gelmiş olabilir.
+            self._async_client_event(client, True)
+
+    @staticmethod
+    def _client_connected(client) -> bool:
+        try:
+            return bool(client.is_connected())
+        except Exception:
+            return False
+
+    def _hook_client(self) -> None:
+        """paho callback'lerini sar: bağlantı olayları loop'a aktarılıyor,
+        gelen her mesaj sessizlik watchdog'u için sayılıyor."""
+        client = self._client()
+        if client is None or client is self._hooked_client:
+            return
+        self._hooked_client = client
+        loop = self._hass.loop
+        prev_connect = getattr(client, "on_connect", None)
+        prev_disconnect = getattr(client, "on_disconnect", None)
+        prev_message = getattr(client, "on_message", None)
+
+        def on_connect(*args) -> None:
+            if prev_connect is not None:
+                prev_connect(*args)
+            # (client, userdata, flags, rc[, properties]) — rc 0 başarı;
+            # paho 2.x ReasonCode da 0 ile karşılaştırılabiliyor.
+            ok = len(args) < 4 or args[3] == 0
+            loop.call_soon_threadsafe(self._async_client_event, client, ok)
+
+        def on_disconnect(*args) -> None:
+            if prev_disconnect is not None:
+                prev_disconnect(*args)
+            loop.call_soon_threadsafe(self._async_client_event, client, False)
+
+        def on_message(*args) -> None:
+            self._note_message()
+            prev_message(*args)
+
+        client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
+        self._count_raw_messages = prev_message is not None
+        if self._count_raw_messages:
+            client.on_message = on_message
+
+    def _note_message(self) -> None:
+        """MQTT thread'inden; tek tek float atamaları, kilit gerekmiyor."""
+        now = time.monotonic()
+        gap = now - self._last_message
+        self._last_message = now
+        self._avg_gap = gap if self._avg_gap is None else self._avg_gap * 0.8 + gap * 0.2
+        self._messages += 1
+
+    def _silence_limit(self) -> float:
+        if self._avg_gap is None or self._messages < SILENCE_WARMUP:
+            return SILENCE_MAX
+        return min(SILENCE_MAX, max(SILENCE_MIN, SILENCE_FACTOR * self._avg_gap))
+
+    @callback
+    def _async_client_event(self, client, connected: bool) -> None:
+        if self._stopped or client is not self._hooked_client:
+            return  # eski (değiştirilmiş) client
+        if connected:
+            if self._reconnect_handle is not None:
+                self._reconnect_handle.cancel()
+                self._reconnect_handle = None
+            self._backoff = RECONNECT_BACKOFF_MIN
+            self._last_message = time.monotonic()
+            if not self._connected:
+                _LOGGER.info("MQTT bağlandı.")
+            self._set_connected(True)
+        elif not self._refreshing:
+            self._async_lost("bağlantı koptu")
+
+    @callback
+    def _async_lost(self, reason: str) -> None:
+        """Cihazları hemen poll'a döndür, yeniden bağlanmayı planla."""
+        if self._connected:
+            _LOGGER.warning("MQTT: %s — periyodik poll'a dönülüyor.", reason)
+            self._set_connected(False)
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self) -> None:
+        if self._stopped or self._reconnect_handle is not None:
+            return
+        delay = self._backoff
+        self._backoff = min(self._backoff * 2, RECONNECT_BACKOFF_MAX)
+        _LOGGER.debug("MQTT: %d sn sonra yeniden bağlanma denenecek", delay)
+        self._reconnect_handle = self._hass.loop.call_later(
+            delay, lambda: self._hass.async_create_task(self._async_reconnect())
+        )
+
+    async def _async_reconnect(self) -> None:
+        self._reconnect_handle = None
+        if self._stopped or self._connected:
+            return  # bu arada paho kendisi bağlandı
+        self.reconnects += 1
+        _LOGGER.info("MQTT: yeniden bağlanma deneniyor...")
+        try:
+            await self._async_run_refresh_mq()
+        except Exception as err:
+            _LOGGER.warning("MQTT: yeniden bağlanma denemesi başarısız (%s).", err)
+        if not self._connected:
+            # Bağlantı asenkron kuruluyor; on_connect gelirse bu iptal olur.
+            self._schedule_reconnect()
+
+    @callback
+    def _watchdog(self) -> None:
+        self._watchdog_handle = self._hass.loop.call_later(WATCHDOG_INTERVAL, self._watchdog)
+        if self._refreshing or self._reconnect_handle is not None:
+            return
+        self._hook_client()
+        client = self._client()
+        if client is None or not self._client_connected(client):
+            if self._connected:
+                self._async_lost("bağlantı yok")
+            else:
+                self._schedule_reconnect()
+            return
+        silent = time.monotonic() - self._last_message
+        if silent > self._silence_limit():
+            self._async_lost(f"{silent:.0f} sn'dir mesaj yok (bağlı ama sessiz)")
+            # Olay gelmeyecek (client "bağlı"); oturumu yeniden kur.
+            self._last_message = time.monotonic()
+        elif not self._connected:
+            self._async_client_event(client, True)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connected": self._connected,
+            "devices": len(self._routes),
+            "messages": self._messages,
+            "avg_message_gap": round(self._avg_gap, 1) if self._avg_gap is not None else None,
+            "silence_limit": round(self._silence_limit()),
+            "reconnects": self.reconnects,
+        }
+
+    def _on_push(self, device, updated_status_properties: list[str],
+                 dp_timestamps: dict | None = None) -> None:
+        """tuya_sharing'in arka plan thread'inden — hesap tüm cihazları
+        dinliyor, push sadece o cihazın sahibine iletiliyor."""
+        if not self._count_raw_messages:
+            self._note_message()
+        owner = self._routes.get(device.id)
+        if owner is not None:
+            owner._on_push(device, updated_status_properties, dp_timestamps)
+
+    def owners(self) -> list[SharingMQTT]:
+        return list(self._routes.values())
 
 
 class SharingMQTT:
-    """Kurulum tamamlandıktan sonra (coordinator içinde) MQTT dinlemesini
-    yöneten asıl sınıf. Token zaten config_entry.data'da mevcut olmalı
-    (CONF_SHARING_TOKEN_INFO) — bu sınıf QR akışıyla ilgilenmez, sadece
-    zaten onaylanmış bir girişi kullanır."""
+    """Kurulum tamamlandıktan sonra (coordinator içinde) bu cihazın
+    MQTT dinlemesini yöneten sınıf. Token zaten config_entry.data'da
+    mevcut olmalı (CONF_SHARING_TOKEN_INFO) — bu sınıf QR akışıyla
+    ilgilenmez, sadece zaten onaylanmış bir girişi kullanır. Bağlantının
+    kendisi hesap düzeyindeki SharingMQTTHub'da."""
 
     def __init__(self, hass: HomeAssistant, coordinator) -> None:
         self._hass = hass
         self._coordinator = coordinator
-        self._manager = None
+        self._hub: SharingMQTTHub | None = None
         self._sufficient = False
+        # Modelin ihtiyaç duyduğu kodlardan MQTT'nin gördükleri/görmedikleri.
+        self._covered: frozenset[str] = frozenset()
+        self._uncovered: frozenset[str] = frozenset()
         self._connected = False
-        self._reconnect_attempted = False
-        self._health_check_task: asyncio.Task | None = None
 
     @property
     def connected(self) -> bool:
@@ -171,13 +526,23 @@ class SharingMQTT:
         kullanılır, poll bağımsız çalışmaya devam etmeli."""
         return self._sufficient
 
+    @property
+    def covered_codes(self) -> frozenset[str]:
+        """Push değeri doğrudan uygulanan kodlar (poll'dan çıkarılır)."""
+        return self._covered
+
+    @property
+    def uncovered_codes(self) -> frozenset[str]:
+        return self._uncovered
+
+    @property
+    def stats(self) -> dict[str, Any] | None:
+        return self._hub.stats if self._hub is not None else None
+
     async def async_start(self) -> bool:
         """Bağlantıyı kurmayı dener. Başarısız olursa False döner —
         coordinator bunu "MQTT yok, periyodik poll'a devam" olarak
-        yorumlamalı. Sonsuz backoff YOK, tek deneme (local moddaki
-        _listen_loop ile aynı felsefe)."""
-        from tuya_sharing import Manager
-
+        yorumlamalı. Sonsuz backoff YOK, tek deneme."""
         from .const import CONF_SHARING_TOKEN_INFO, CONF_USER_CODE
 
         token_info = self._coordinator.config_entry.data.get(CONF_SHARING_TOKEN_INFO)
@@ -213,145 +578,98 @@ class SharingMQTT:
         ir.async_delete_issue(self._hass, DOMAIN, ISSUE_ID_TOKEN_INVALID)
 
         try:
-            listener = _PushDeviceListener(self)
-            token_listener = _PersistTokenListener(self._hass, self._coordinator)
-
-            def _build_manager():
-                return Manager(
-                    TUYA_SHARING_CLIENT_ID,
-                    user_code,
-                    token_info["terminal_id"],
-                    token_info["endpoint"],
-                    token_info,
-                    token_listener,
-                )
-
-            self._manager = await self._hass.async_add_executor_job(_build_manager)
-            self._manager.add_device_listener(listener)
-
-            await self._hass.async_add_executor_job(self._manager.update_device_cache)
-
-            device = self._manager.device_map.get(self._coordinator.device_id)
+            self._hub = SharingMQTTHub.async_get(self._hass, user_code, token_info)
+            device = await self._hub.async_attach(self._coordinator.device_id, self)
             if device is None:
                 _LOGGER.warning(
                     "MQTT: cihaz (%s) tuya_sharing hesabında bulunamadı — "
                     "muhtemelen bu hesapla paylaşılmamış. Periyodik poll ile devam.",
                     self._coordinator.device_id,
                 )
+                await self._async_detach()
                 return False
 
-            # refresh_mq() sadece set_up=True olan cihazları MQTT'ye
-            # kaydediyor — bazı hesap/cihaz kombinasyonlarında bu bayrak
-            # hiç True gelmiyor (canlı testte doğrulandı), o yüzden
-            # gerekirse elle zorluyoruz.
-            if not getattr(device, "set_up", False):
-                try:
-                    device.set_up = True
-                except Exception:
-                    pass
-
-            await self._hass.async_add_executor_job(self._manager.refresh_mq)
-            await asyncio.sleep(3)
-
-            # Yeterlilik kontrolünü BURAYA (refresh_mq + bekleme sonrasına)
-            # taşıdık — canlı testte gördük ki update_device_cache()'in
-            # hemen ardından device.function/status_range bazen henüz
-            # tam dolmuyor (örn. bir cihazda function'da temp_current
-            # eksikken birkaç saniye sonra status_range'de doğru şekilde
-            # görünüyordu). Cihaz nesnesini de device_map'ten TAZE
-            # tekrar çekiyoruz, ihtimal dahilinde daha guncel bir
-            # snapshot icin.
-            device = self._manager.device_map.get(self._coordinator.device_id) or device
-            self._sufficient = _device_covers_codes(
-                device, _collect_required_codes(self._coordinator.model_mapping)
+            required = collect_required_codes(
+                self._coordinator.model_mapping, self._coordinator.raw_code_by_dp_id
             )
+            available = _device_codes(device)
+            self._covered = frozenset(required & available)
+            self._uncovered = frozenset(required - available)
+            self._sufficient = not self._uncovered
+            if self._sufficient:
+                coverage = "yeterli (poll duraklatılacak)"
+            elif self._covered:
+                coverage = (
+                    f"hibrit ({len(self._covered)}/{len(required)} kod push ile, "
+                    f"poll sadece kalan {len(self._uncovered)} kodu isteyecek)"
+                )
+            else:
+                coverage = "yetersiz (poll devam edecek, push sadece tetikleyici)"
             _LOGGER.info(
                 "MQTT: cihaz %s için DP kapsama durumu: %s",
-                self._coordinator.device_id,
-                "yeterli (poll duraklatılacak)" if self._sufficient else "yetersiz (poll devam edecek, push sadece tetikleyici)",
+                self._coordinator.device_id, coverage,
             )
-
-            mq = getattr(self._manager, "mq", None)
-            client = getattr(mq, "client", None) if mq else None
-            if client is None:
-                _LOGGER.warning("MQTT bağlantısı kurulamadı. Periyodik poll ile devam.")
-                return False
-
-            self._connected = True
-            self._health_check_task = self._hass.loop.create_task(self._health_check_loop())
+            _LOGGER.debug("MQTT: push ile gelmeyen kodlar: %s", sorted(self._uncovered))
+
+            self._connected = self._hub.connected
+            if not self._connected:
+                # Bağlı kalıyoruz: bağlantı kurulunca hub
+                # async_connection_changed(True) çağırıyor.
+                _LOGGER.info(
+                    "MQTT bağlantısı henüz kurulmadı — bağlanınca push devreye "
+                    "girecek, o zamana kadar periyodik poll ile devam."
+                )
             return True
 
         except Exception as err:
             _LOGGER.warning("MQTT başlatılamadı (%s). Periyodik poll ile devam.", err)
+            await self._async_detach()
             return False
 
-    async def _health_check_loop(self) -> None:
-        """Hafif, seyrek bir bağlantı kontrolü — agresif değil (bugün
-        local modda öğrendiğimiz dersle tutarlı: sık kontrol gereksiz
-        yük). Kopma tespit edilirse BİR KEZ yeniden bağlanmayı dener,
-        olmazsa pes edip coordinator'a "MQTT yok" der."""
-        while True:
-            await asyncio.sleep(300)  # 5 dakikada bir kontrol
-            mq = getattr(self._manager, "mq", None)
-            client = getattr(mq, "client", None) if mq else None
-            is_connected = bool(client and getattr(client, "is_connected", lambda: False)())
-
-            if is_connected:
-                self._reconnect_attempted = False
-                continue
+    @callback
+    def async_connection_changed(self, connected: bool) -> None:
+        """Hub'ın sağlık kontrolü bağlantının koptuğunu/geri geldiğini
+        gördüğünde çağırır."""
+        if connected == self._connected:
+            return
+        self._connected = connected
+        if self._sufficient:
+            self._coordinator._mqtt_set_active(connected)
 
-            if self._connected:
-                _LOGGER.warning("MQTT bağlantısı koptu tespit edildi.")
-                self._connected = False
-                if self._sufficient:
-                    self._coordinator._mqtt_set_active(False)
-
-            if not self._reconnect_attempted:
-                self._reconnect_attempted = True
-                _LOGGER.info("MQTT: bir kez yeniden bağlanma deneniyor...")
-                try:
-                    await self._hass.async_add_executor_job(self._manager.refresh_mq)
-                    await asyncio.sleep(3)
-                    mq = getattr(self._manager, "mq", None)
-                    client = getattr(mq, "client", None) if mq else None
-                    if client:
-                        self._connected = True
-                        if self._sufficient:
-                            self._coordinator._mqtt_set_active(True)
-                        _LOGGER.info("MQTT: yeniden bağlanma başarılı.")
-                except Exception as err:
-                    _LOGGER.warning("MQTT: yeniden bağlanma denemesi başarısız (%s).", err)
+    async def _async_detach(self) -> None:
+        if self._hub is not None:
+            hub, self._hub = self._hub, None
+            await hub.async_detach(self._coordinator.device_id, self)
 
     async def async_stop(self) -> None:
-        if self._health_check_task:
-            self._health_check_task.cancel()
-        mq = getattr(self._manager, "mq", None) if self._manager else None
-        stop = getattr(mq, "stop", None) if mq else None
-        if callable(stop):
-            try:
-                await self._hass.async_add_executor_job(stop)
-            except Exception:
-                pass
+        self._connected = False
+        await self._async_detach()
 
-    def _on_push(self, device, updated_status_properties: list[str]) -> None:
+    def _on_push(self, device, updated_status_properties: list[str],
+                 dp_timestamps: dict | None = None) -> None:
         """tuya_sharing'in ARKA PLAN THREAD'İNDEN çağrılıyor — HA event
         loop'una güvenli geçiş şart (call_soon_threadsafe /
         run_coroutine_threadsafe kullanmadan coordinator'a dokunmak
-        thread-safety ihlali olur)."""
-        if device.id != self._coordinator.device_id:
-            return  # Manager tum hesabi dinliyor, bizi ilgilendirmeyen cihaz
-
-        if self._sufficient:
-            new_data = {
-                code: {"value": device.status[code]}
-                for code in updated_status_properties
-                if code in device.status
+        thread-safety ihlali olur). Hub sadece bu cihazın push'larını
+        iletiyor."""
+        # Kapsanan kodların değerine doğrudan güveniyoruz; kapsanmayanlar
+        # için push sadece "bir şey değişti" sinyali — hedefli sorgu.
+        # Cihazın DP zaman damgası kayda giriyor; coordinator bununla
+        # geç gelen (eski) push'ları ayıklıyor.
+        dp_timestamps = dp_timestamps or {}
+        new_data = {
+            code: {
+                "value": device.status[code],
+                "timestamp": _timestamp_ms(dp_timestamps.get(code)),
             }
-            if new_data:
-                self._hass.loop.call_soon_threadsafe(
-                    self._coordinator._mqtt_apply_push, new_data
-                )
-        else:
+            for code in updated_status_properties
+            if code in self._covered and code in device.status
+        }
+        if new_data:
+            self._hass.loop.call_soon_threadsafe(
+                self._coordinator._mqtt_apply_push, new_data
+            )
+        if not self._sufficient:
             asyncio.run_coroutine_threadsafe(
                 self._coordinator._mqtt_trigger_refresh(), self._hass.loop
             )
@@ -363,13 +681,13 @@ class _PushDeviceListener:
     içinde dinamik import ediyoruz — bu sınıf onun somut halini
     çalışma zamanında oluşturuyor."""
 
-    def __new__(cls, owner: "SharingMQTT"):
+    def __new__(cls, owner: "SharingMQTTHub"):
         from tuya_sharing import SharingDeviceListener
 
         class _Impl(SharingDeviceListener):
             def update_device(self, device, updated_status_properties=None, dp_timestamps=None) -> None:
                 if updated_status_properties:
-                    owner._on_push(device, updated_status_properties)
+                    owner._on_push(device, updated_status_properties, dp_timestamps)
 
             def add_device(self, device) -> None:
                 pass
@@ -383,9 +701,10 @@ class _PushDeviceListener:
 class _PersistTokenListener:
     """Token yenilenince (tuya_sharing kendi içinde otomatik yapıyor)
     config_entry.data'ya kalıcı olarak yazar — yoksa HA her restart'ta
-    kullanıcı tekrar QR okutmak zorunda kalır."""
+    kullanıcı tekrar QR okutmak zorunda kalır. Hesap hub'ı paylaşıldığı
+    için token o an hub'a bağlı TÜM entry'lere yazılıyor."""
 
-    def __new__(cls, hass: HomeAssistant, coordinator):
+    def __new__(cls, hass: HomeAssistant, hub: SharingMQTTHub):
         from tuya_sharing import SharingTokenListener
         from .const import CONF_SHARING_TOKEN_INFO
 
@@ -396,10 +715,14 @@ class _PersistTokenListener:
         # config_entry nesne referansını kullanıp güncel veriyi
         # kaçırma riski oluyordu — canlı ortamda "terminal_id kayboldu"
         # olarak gözlemlendi. Her yazmada HA'dan TAZE entry çekerek bu
-        # riski tamamen ortadan kaldırıyoruz.
-        entry_id = coordinator.config_entry.entry_id
-
+        # riski tamamen ortadan kaldırıyoruz; hub'dan ayrılmış eski
+        # örnekler zaten owners() listesinde değil.
         def _persist(token_info: dict) -> None:
+            for owner in hub.owners():
+                _persist_entry(owner._coordinator, token_info)
+
+        def _persist_entry(coordinator, token_info: dict) -> None:
+            entry_id = coordinator.config_entry.entry_id
             entry = hass.config_entries.async_get_entry(entry_id)
             if entry is None:
                 _LOGGER.debug(
@@ -0,0 +1,113 @@
+"""Last-known DP snapshot for warm startup.
+
+Without it, every HA restart waits for get_device_info, get_device_model
+and the first refresh (up to SETUP_TIMEOUT in __init__.py) before any
+entity exists, and entities whose DP isn't in that first poll are
+skipped. A slow cloud or a device that is still booting turns into a
+ConfigEntryNotReady retry loop with no entities at all.
+
+The coordinator now keeps a compact copy of what it last knew in HA
+storage: DP values (value, timestamp, type per code), raw_code_by_dp_id
+and the device metadata entities are built from (name, product model,
+model id). Writes are throttled like the energy accumulator's
+(energy.py): an update schedules a write SAVE_DELAY out unless one is
+already pending, so a busy device costs at most one write per
+SAVE_DELAY and is still saved periodically; the entry also saves once
+more on unload.
+
+On startup, if a snapshot for this device exists and the model id is
+cached in the entry, the coordinator is seeded from it and entities are
+created right away, marked stale. The live setup (device info, first
+refresh, MQTT) then runs in the background and clears the stale flag.
+Codes the first refresh didn't include (raw or push-only DPs) keep
+their snapshot value, marked stale per entity, until the device reports
+them; those still unreported after a grace period are dropped.
+
+The snapshot is deleted with the config entry (async_remove_snapshot).
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 300
+
+
+class DpSnapshot:
+    """Persisted last-known coordinator state of one config entry."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store: Store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.snapshot.{entry_id}")
+        self._save_pending = False
+
+    async def async_load(self) -> dict[str, Any] | None:
+        """The stored snapshot, or None if there is none (or it's unreadable)."""
+        try:
+            stored = await self._store.async_load()
+        except Exception as err:  # corrupt file: start cold
+            _LOGGER.warning("Ignoring unreadable DP snapshot: %s", err)
+            return None
+        if not isinstance(stored, dict) or not isinstance(stored.get("data"), dict):
+            return None
+        return stored
+
+    def async_schedule_save(self, data_func: Callable[[], dict[str, Any]]) -> None:
+        """Persist within SAVE_DELAY; calls while a write is pending are no-ops.
+
+        Re-arming Store.async_delay_save on every update would push the
+        write back forever on a device that updates more often than that.
+        """
+        if self._save_pending:
+            return
+        self._save_pending = True
+
+        def _data() -> dict[str, Any]:
+            self._save_pending = False
+            return data_func()
+
+        self._store.async_delay_save(_data, SAVE_DELAY)
+
+    async def async_save(self, data: dict[str, Any]) -> None:
+        """Persist immediately (unload)."""
+        # async_save cancels a pending delayed write.
+        self._save_pending = False
+        await self._store.async_save(data)
+
+
+async def async_remove_snapshot(hass: HomeAssistant, entry_id: str) -> None:
+    """Delete the stored snapshot of a removed config entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.snapshot.{entry_id}").async_remove()
+
+
+def pack_records(data: dict[str, dict]) -> dict[str, list]:
+    """coordinator.data → {code: [value, timestamp, type]}."""
+    return {
+        code: [record.get("value"), record.get("timestamp", 0), record.get("type", "")]
+        for code, record in data.items()
+    }
+
+
+def unpack_records(packed: dict[str, list], last_update: Callable[[int], str]) -> dict[str, dict]:
+    """Inverse of pack_records; malformed entries are skipped."""
+    data = {}
+    for code, item in packed.items():
+        try:
+            value, timestamp, dp_type = item
+            timestamp = int(timestamp or 0)
+        except (TypeError, ValueError):
+            continue
+        data[code] = {
+            "value": value,
+            "timestamp": timestamp,
+            "type": dp_type,
+            "last_update": last_update(timestamp),
+        }
+    return data
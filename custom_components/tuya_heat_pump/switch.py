@@ -10,7 +10,7 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.exceptions import HomeAssistantError
 
 from .const import DOMAIN
-from .conversion import Conversion
+from .conversion import Conversion, conversion_for
 from .coordinator import TuyaScaleDataUpdateCoordinator
 from .raw_codec import decode_raw_field, resolve_raw_source, watch_pending_raw_entities
 
@@ -123,7 +123,7 @@ class TuyaHeatpumpSwitch(SwitchEntity):
             
         raw_value = self.coordinator.data[self._switch_code]['value']
 
-        conversion = Conversion(self._config.get('conversion', 'bool(value)'))
+        conversion = conversion_for(self._config, 'bool(value)')
         try:
             result = conversion.convert(raw_value)
             return bool(result)
@@ -158,6 +158,8 @@ class TuyaHeatpumpSwitch(SwitchEntity):
 
         if self.coordinator.model_id:
             attrs["tuya_model_id"] = self.coordinator.model_id
+        if self.coordinator.is_stale(attrs.get("tuya_code")):
+            attrs["stale"] = True
 
         return attrs
 
@@ -176,6 +178,7 @@ class TuyaHeatpumpSwitch(SwitchEntity):
                 self._config['field_index'],
                 self._config.get('encoding', 'uint8'),
                 1,
+                debounce=0,
             )
         else:
             api_value = True
@@ -187,11 +190,12 @@ class TuyaHeatpumpSwitch(SwitchEntity):
                 except Exception as err:
                     _LOGGER.warning("API conversion failed: %s", err)
 
-            success = await self.coordinator.send_command(self._switch_code, api_value)
+            success = await self.coordinator.send_command(
+                self._switch_code, api_value, debounce=0
+            )
         
         if success:
             _LOGGER.info("✅ Successfully turned ON %s", self._switch_code)
-            await self.coordinator.async_request_refresh()
         else:
             _LOGGER.warning("❌ Failed to turn ON %s", self._switch_code)
             raise HomeAssistantError(
@@ -213,6 +217,7 @@ class TuyaHeatpumpSwitch(SwitchEntity):
                 self._config['field_index'],
                 self._config.get('encoding', 'uint8'),
                 0,
+                debounce=0,
             )
         else:
             api_value = False
@@ -224,11 +229,12 @@ class TuyaHeatpumpSwitch(SwitchEntity):
                 except Exception as err:
                     _LOGGER.warning("API conversion failed: %s", err)
 
-            success = await self.coordinator.send_command(self._switch_code, api_value)
+            success = await self.coordinator.send_command(
+                self._switch_code, api_value, debounce=0
+            )
         
         if success:
             _LOGGER.info("✅ Successfully turned OFF %s", self._switch_code)
-            await self.coordinator.async_request_refresh()
         else:
             _LOGGER.warning("❌ Failed to turn OFF %s", self._switch_code)
             raise HomeAssistantError(
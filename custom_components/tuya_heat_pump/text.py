@@ -148,7 +148,6 @@ class TuyaHeatpumpText(TextEntity):
 
         if success:
             _LOGGER.info("✅ Successfully set %s to %s", self._text_code, value)
-            await self.coordinator.async_request_refresh()
         else:
             _LOGGER.warning("❌ Failed to set %s", self._text_code)
             raise HomeAssistantError(
@@ -167,6 +166,8 @@ class TuyaHeatpumpText(TextEntity):
 
         if self.coordinator.model_id:
             attrs["tuya_model_id"] = self.coordinator.model_id
+        if self.coordinator.is_stale(attrs.get("tuya_code")):
+            attrs["stale"] = True
 
         return attrs
 